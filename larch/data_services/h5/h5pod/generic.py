@@ -1,5 +1,7 @@
 
 import os
+import threading
+from contextlib import nullcontext
 from pathlib import Path
 import tables as tb
 import numpy
@@ -13,6 +15,50 @@ from ...pod import Pod
 from ...general import _sqz_same, selector_len_for
 from .... import warning
 
+
+# PyTables objects must not be used by more than one thread at a time.  If the
+# HDF5 library is built thread-safe, reads from an `H5Pod` on any thread other
+# than the main thread go through a read-only handle on the file that belongs
+# to that thread, so loader threads (see
+# `larch.data_services.io_scheduler.IOScheduler`) read concurrently and without
+# locking.  All other reads, including those on the main thread, use the pod's
+# own handle while holding `_shared_handle_lock`, which also guards the
+# metadata of the pod's own handle.  This is the case for every read if the
+# library is not thread-safe, or for files that cannot be reopened that way,
+# because they are open for writing or held only in memory.
+_shared_handle_lock = threading.RLock()
+_thread_handles = threading.local()
+
+
+def _hdf5_is_threadsafe():
+	"""Check if the HDF5 library used by PyTables is built thread-safe."""
+	try:
+		import ctypes
+		from tables import utilsextension
+		is_threadsafe = ctypes.PyDLL(utilsextension.__file__).H5is_library_threadsafe
+	except (ImportError, OSError, AttributeError):
+		# not found, or HDF5 older than 1.10 which cannot tell
+		return False
+	result = ctypes.c_uint(0)
+	if is_threadsafe(ctypes.byref(result)) < 0:
+		return False
+	return bool(result.value)
+
+
+_HDF5_THREADSAFE = _hdf5_is_threadsafe()
+
+
+class _ThreadHandles(dict):
+	"""Read-only file handles opened by one thread, closed when the thread ends."""
+
+	def __del__(self):
+		for h5f in self.values():
+			try:
+				h5f.close()
+			except Exception:
+				pass
+
+
 class IncompatibleShape(ValueError):
 	pass
 
@@ -727,7 +773,7 @@ class H5Pod(Pod):
 		for toknum, tokval, _, _, _ in g:
 			if toknum == NAME and tokval in self._groupnode:
 				# replace NAME tokens
-				partial = [(NAME, 'self'), DOT, (NAME, '_groupnode'), DOT, (NAME, tokval), OBRAC, ]
+				partial = [(NAME, '_groupnode'), DOT, (NAME, tokval), OBRAC, ]
 				partial += screen_tokens
 				if len(self._groupnode._v_children[tokval].shape)>1:
 					partial += [COMMA, COLON, ]
@@ -748,17 +794,83 @@ class H5Pod(Pod):
 		return asterize(ret, mode="exec" if receiver is not None else "eval"), ret
 
 
+	def _cached_remake_command(self, cmd, selector=None, receiver=None):
+		"""
+		Cached version of `_remake_command`.
+
+		The rewritten command depends on which names in the command are arrays
+		in this pod, and on their dimensions, so a cached entry is reused only
+		while those are unchanged.
+		"""
+		cache = self.__dict__.setdefault('_remake_command_cache', {})
+		children = self._groupnode._v_children
+		key = (str(cmd), selector is None, receiver)
+		entry = cache.get(key)
+		if entry is not None:
+			result, deps = entry
+			if all(
+				(len(children[name].shape) if name in children else None) == ndim
+				for name, ndim in deps
+			):
+				return result
+		result = self._remake_command(cmd, selector=selector, receiver=receiver)
+		from tokenize import tokenize, NAME
+		from io import BytesIO
+		deps = tuple(
+			(tokval, len(children[tokval].shape) if tokval in children else None)
+			for toknum, tokval, _, _, _ in tokenize(BytesIO(str(cmd).encode('utf-8')).readline)
+			if toknum == NAME
+		)
+		cache[key] = (result, deps)
+		return result
+
+	def _reading_groupnode(self):
+		"""
+		The group node to read from on the current thread.
+
+		Returns
+		-------
+		tables.Group
+			The group node of this pod, or on a thread other than the
+			main thread when the HDF5 library is thread-safe, the same
+			node in a read-only handle on the file that belongs to that
+			thread.
+		context manager
+			To hold while reading, which locks the group node if it is
+			shared between threads.
+		"""
+		h5f = self._h5f
+		filename = h5f.filename
+		if (
+				not _HDF5_THREADSAFE
+				or threading.current_thread() is threading.main_thread()
+				or h5f.mode != 'r'
+				or not os.path.isfile(filename)
+		):
+			return self._groupnode, _shared_handle_lock
+		handles = getattr(_thread_handles, 'handles', None)
+		if handles is None:
+			handles = _thread_handles.handles = _ThreadHandles()
+		thread_h5f = handles.get(filename)
+		if thread_h5f is None or not thread_h5f.isopen:
+			thread_h5f = handles[filename] = tb.open_file(filename, 'r')
+		return thread_h5f.get_node(self._groupnode._v_pathname), nullcontext()
+
 	def _evaluate_single_item(self, cmd, selector=None, receiver=None):
-		j, j_plain = self._remake_command(cmd, selector=selector, receiver='receiver' if receiver is not None else None)
+		with _shared_handle_lock:
+			# rewriting the command reads metadata through the pod's own handle
+			j, j_plain = self._cached_remake_command(cmd, selector=selector, receiver='receiver' if receiver is not None else None)
+			_groupnode, lock = self._reading_groupnode()
 		# important globals
 		from ....util.aster import inXd
 		from numpy import log, exp, log1p, absolute, fabs, sqrt, isnan, isfinite, logaddexp, fmin, fmax, nan_to_num, sin, cos, pi
 		from ....util.common_functions import piece, normalize, boolean
 		try:
-			if receiver is not None:
-				exec(j)
-			else:
-				return eval(j)
+			with lock:
+				if receiver is not None:
+					exec(j)
+				else:
+					return eval(j)
 		except Exception as exc:
 			args = exc.args
 			if not args:
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+from ..log import logger_name
+logger = logging.getLogger(logger_name+'.data')
+
+
+_default_io_threads = 1
+
+
+def get_io_threads():
+	"""int : The default number of threads used to load data from pods."""
+	return _default_io_threads
+
+
+def set_io_threads(n):
+	"""
+	Set the default number of threads used to load data from pods.
+
+	Parameters
+	----------
+	n : int
+		The number of threads.  Values less than 1 use one thread per
+		available CPU.
+	"""
+	global _default_io_threads
+	if n is None or n < 1:
+		import multiprocessing
+		n = multiprocessing.cpu_count()
+	_default_io_threads = int(n)
+
+
+class IOScheduler:
+	"""
+	Run data loading tasks on a pool of background threads.
+
+	Parameters
+	----------
+	max_workers : int, optional
+		The number of threads, defaulting to `get_io_threads()`.
+
+	Notes
+	-----
+	If the HDF5 library is built thread-safe, each thread reads from HDF5 pods
+	through its own read-only handle on the file (see `H5Pod`), so several
+	variables can be read from the same HDF5 file concurrently.  Otherwise
+	reads from HDF5 pods take turns.  Either way, reading overlaps other
+	work, such as computing the log likelihood on the previous chunk of cases.
+	"""
+
+	def __init__(self, max_workers=None):
+		if max_workers is None:
+			max_workers = get_io_threads()
+		self.max_workers = max(int(max_workers), 1)
+		self._executor = None
+
+	@property
+	def executor(self):
+		if self._executor is None:
+			self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+		return self._executor
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.shutdown()
+
+	def shutdown(self, wait=True):
+		if self._executor is not None:
+			self._executor.shutdown(wait=wait)
+			self._executor = None
+
+	def submit(self, fn, *args, **kwargs):
+		"""Schedule `fn(*args, **kwargs)` to run on a background thread."""
+		return self.executor.submit(fn, *args, **kwargs)
+
+	def load_items(self, load_item, names, result, selector=None, skip=None):
+		"""
+		Load a set of variables into the trailing dimension of an array.
+
+		Parameters
+		----------
+		load_item : callable
+			Called as `load_item(name, result[...,i], selector=selector)`
+			to load each variable, e.g. the `load_data_item` method of a
+			pod.  Each call writes to a different part of `result`, so the
+			calls can run concurrently.
+		names : sequence of str
+			The variables to load.
+		result : ndarray
+			The array to load into.
+		selector : slice or array-like, optional
+			Passed through to `load_item`.
+		skip : sequence of bool, optional
+			Variables to skip.
+
+		Returns
+		-------
+		ndarray
+			The `result` array.
+		"""
+		def _load_one(i, name):
+			logger.info(f' - loading {name}')
+			load_item(name, result[...,i], selector=selector)
+
+		futures = [
+			self.submit(_load_one, i, name)
+			for i, name in enumerate(names)
+			if skip is None or not skip[i]
+		]
+		for f in futures:
+			# re-raises the first exception from a loader, if any
+			f.result()
+		return result
+
+	def prefetch(self, loaders):
+		"""
+		Iterate over the results of loaders, running the next one in the background.
+
+		This is double buffering: while the caller works with the result of
+		one loader, the next loader is already running, so at most two
+		results are held at once.
+
+		Parameters
+		----------
+		loaders : iterable of callable
+			Each is called with no arguments, on a background thread.
+
+		Yields
+		------
+		Any
+			The result of each loader, in order.
+		"""
+		loaders = iter(loaders)
+		loader = next(loaders, None)
+		future = None if loader is None else self.submit(loader)
+		while future is not None:
+			current = future.result()
+			loader = next(loaders, None)
+			future = None if loader is None else self.submit(loader)
+			yield current
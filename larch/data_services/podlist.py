@@ -327,7 +327,7 @@ class Pods(MutableSequence):
 				exc.args = (arg0,) + args[1:]
 				raise
 
-	def get_data_items(self, names, *arg, selector=None, dtype=None):
+	def get_data_items(self, names, *arg, selector=None, dtype=None, n_threads=None):
 		"""
 
 		Parameters
@@ -340,6 +340,9 @@ class Pods(MutableSequence):
 		dtype : dtype, optional
 			The dtype for the array to return. If the dtype is not given,
 			float64 will be used.
+		n_threads : int, optional
+			The number of threads used to load the variables, see
+			`load_data_items`.
 
 		Returns
 		-------
@@ -366,12 +369,26 @@ class Pods(MutableSequence):
 		except ValueError as err:
 			err.args = (err.args[0]+ f', result_shape={result_shape}',) + err.args[1:]
 			raise
-		for i,name in enumerate(names):
-			logger.info(f' - loading {name} ...')
-			self.load_data_item(name, result[...,i], selector=selector)
+		if self._io_threads(n_threads, len(names)) > 1:
+			self._load_data_items_threaded(names, result, selector, n_threads)
+		else:
+			for i,name in enumerate(names):
+				logger.info(f' - loading {name} ...')
+				self.load_data_item(name, result[...,i], selector=selector)
 		logger.debug(f'Completed loading data from HDF5.')
 		return result
 
+	def _io_threads(self, n_threads, n_items):
+		if n_threads is None:
+			from .io_scheduler import get_io_threads
+			n_threads = get_io_threads()
+		return min(n_threads, n_items)
+
+	def _load_data_items_threaded(self, names, result, selector, n_threads, skip=None):
+		from .io_scheduler import IOScheduler
+		with IOScheduler(self._io_threads(n_threads, len(names))) as io:
+			io.load_items(self.load_data_item, names, result, selector=selector, skip=skip)
+
 	def get_data_masks(self, names):
 		return [self.get_data_mask(i) for i in names]
 
@@ -394,7 +411,7 @@ class Pods(MutableSequence):
 					len(names),
 				)
 
-	def load_data_items(self, names, *arg, result=None, selector=None, dtype=numpy.float64, mask_pattern=0, mask_names=None, log=None, use_metashape=False):
+	def load_data_items(self, names, *arg, result=None, selector=None, dtype=numpy.float64, mask_pattern=0, mask_names=None, log=None, use_metashape=False, n_threads=None):
 		"""
 
 		Parameters
@@ -415,6 +432,10 @@ class Pods(MutableSequence):
 			even if mask_names is given, everything will be loaded unless the the mask_pattern
 			is set to some other value. This is an optimization tool
 			for reloading data that may not have changed (e.g. for logsum generation).
+		n_threads : int, optional
+			The number of threads used to load the variables, defaulting to
+			`larch.data_services.io_scheduler.get_io_threads()`.  Variables
+			are loaded concurrently on an `IOScheduler`.
 
 		Returns
 		-------
@@ -440,7 +461,12 @@ class Pods(MutableSequence):
 			except NotSameShapeError:
 				if (result.shape[0] != output_shape[0]) or (result.shape[1] < output_shape[1]):
 					raise
-		if mask_names is None:
+		if self._io_threads(n_threads, len(names)) > 1:
+			skip = None
+			if mask_names is not None:
+				skip = [bool(mask_names[i] & mask_pattern) for i in range(len(names))]
+			self._load_data_items_threaded(names, result, selector, n_threads, skip=skip)
+		elif mask_names is None:
 			for i,name in enumerate(names):
 				logger.info(f' - loading {name}')
 				self.load_data_item(name, result[...,i], selector=selector)
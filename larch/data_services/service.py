@@ -629,8 +629,12 @@ class DataService():
 			If given, the selector filters the cases. This argument can only be given
 			as a keyword argument.
 		float_dtype : dtype, default float64
-			The dtype to use for all float-type arrays.  Note that the availability
-			arrays are always returned as int8 regardless of the float type.
+			The dtype to use for the idca and idco data arrays.  Setting this to
+			float32 halves the memory used by the data, which is then kept in single
+			precision for computation, although the log likelihood and its derivatives
+			are still accumulated in double precision.  Note that the availability
+			arrays are always returned as int8, and the choice and weight arrays
+			as double precision, regardless of the float type.
 			This argument can only be given
 			as a keyword argument.
 		log_warnings : bool, default True
@@ -661,26 +665,26 @@ class DataService():
 
 		if 'choice_ca' in req_data:
 			logger.info("Loading `choice_ca` data...")
-			df_ch = self.dataframe_idca(req_data['choice_ca'], dtype=float_dtype, selector=selector)
+			df_ch = self.dataframe_idca(req_data['choice_ca'], dtype=numpy.float64, selector=selector)
 		elif 'choice_co' in req_data:
 			logger.info("Loading `choice_co` data...")
 			alts = self.alternative_codes()
 			cols = [req_data['choice_co'].get(a, '0') for a in alts]
-			df_ch = self.dataframe_idco(*cols, dtype=float_dtype, selector=selector)
+			df_ch = self.dataframe_idco(*cols, dtype=numpy.float64, selector=selector)
 			df_ch.columns = alts
 		elif 'choice_co_code' in req_data:
 			logger.info("Loading `choice_co_code` data...")
 			alts = self.alternative_codes()
 			df_ch_code = self.dataframe_idco(req_data['choice_co_code'], dtype=int, selector=selector)
-			df_ch = pandas.DataFrame(0, columns=alts, index=df_ch_code.index, dtype=float_dtype)
+			df_ch = pandas.DataFrame(0, columns=alts, index=df_ch_code.index, dtype=numpy.float64)
 			for c in df_ch.columns:
-				df_ch.loc[:,c] = (df_ch_code==c).astype(float_dtype)
+				df_ch.loc[:,c] = (df_ch_code==c).astype(numpy.float64)
 		else:
 			df_ch = None
 
 		if 'weight_co' in req_data:
 			logger.info("Loading `weight_co` data...")
-			df_wt = self.dataframe_idco(req_data['weight_co'], dtype=float_dtype, selector=selector)
+			df_wt = self.dataframe_idco(req_data['weight_co'], dtype=numpy.float64, selector=selector)
 		else:
 			df_wt = None
 
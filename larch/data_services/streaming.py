@@ -0,0 +1,116 @@
+import numpy
+
+import logging
+from ..log import logger_name
+logger = logging.getLogger(logger_name+'.data')
+
+
+def chunk_selectors(n_cases, chunk_size, base_selector=None):
+	"""
+	Generate selectors for consecutive chunks of cases.
+
+	Parameters
+	----------
+	n_cases : int
+		The total number of cases in the (unselected) data.
+	chunk_size : int
+		The number of cases in each chunk.  If `base_selector` is a boolean
+		mask, this counts unselected positions, so chunks may hold fewer
+		cases.
+	base_selector : None, slice, or array-like[bool], optional
+		A selector already applied to the data, such as the default
+		selector of a DataService.  Each chunk selects the intersection of
+		this selector with a contiguous range of cases.
+
+	Yields
+	------
+	slice or ndarray[bool]
+	"""
+	if chunk_size <= 0:
+		raise ValueError('chunk_size must be positive')
+	if isinstance(base_selector, slice):
+		start, stop, step = base_selector.indices(n_cases)
+		if step != 1:
+			base_selector = numpy.zeros(n_cases, dtype=bool)
+			base_selector[start:stop:step] = True
+		else:
+			for i in range(start, stop, chunk_size):
+				yield slice(i, min(i+chunk_size, stop))
+			return
+	if base_selector is None:
+		for i in range(0, n_cases, chunk_size):
+			yield slice(i, min(i+chunk_size, n_cases))
+		return
+	base_selector = numpy.asarray(base_selector)
+	if base_selector.dtype != bool:
+		raise TypeError('base_selector must be None or slice or a bool array')
+	for i in range(0, n_cases, chunk_size):
+		if not base_selector[i:i+chunk_size].any():
+			continue
+		s = numpy.zeros_like(base_selector)
+		s[i:i+chunk_size] = base_selector[i:i+chunk_size]
+		yield s
+
+
+def iter_dataframes(source, req_data, chunk_size=100_000, *, float_dtype=numpy.float64, prefetch=True):
+	"""
+	Iterate over DataFrames for consecutive chunks of cases.
+
+	Only one chunk (two, when prefetching) is held in memory at a time, so
+	this can be used to compute over data that is larger than memory.
+
+	Parameters
+	----------
+	source : DataService or DataFrames
+		The source of the data.  It must implement `make_dataframes` with
+		support for the `selector` argument, as `DataService` does for
+		HDF5 pods, and `DataFrames` does for slices (which read only the
+		selected cases from memory-mapped storage).
+	req_data : Dict or str
+		The requested data, see `DataService.make_dataframes`.  Requests
+		to standardize the data are not supported, as the statistics for
+		standardizing must come from all the cases.
+	chunk_size : int, default 100_000
+		The number of cases in each chunk.
+	float_dtype : dtype, default float64
+		The dtype to use for the idca and idco data arrays.
+	prefetch : bool, default True
+		Load the next chunk on a background thread while the current
+		chunk is being used.
+
+	Yields
+	------
+	DataFrames
+	"""
+	if isinstance(req_data, str):
+		from ..util import Dict
+		import textwrap
+		req_data = Dict.load(textwrap.dedent(req_data))
+
+	if 'standardize' in req_data and req_data['standardize']:
+		raise NotImplementedError('standardize is not supported for chunked data')
+
+	base_selector = getattr(source, 'selector', None)
+	if callable(base_selector):
+		base_selector = None
+	n_cases = source.n_cases
+	if callable(n_cases):
+		n_cases = n_cases()
+
+	def _load(selector):
+		logger.debug(f'loading chunk {selector if isinstance(selector, slice) else "mask"}')
+		return source.make_dataframes(req_data, selector=selector, float_dtype=float_dtype, log_warnings=False)
+
+	selectors = chunk_selectors(n_cases, chunk_size, base_selector)
+
+	if not prefetch:
+		for selector in selectors:
+			yield _load(selector)
+		return
+
+	from .io_scheduler import IOScheduler
+	with IOScheduler(max_workers=1) as io:
+		yield from io.prefetch(
+			(lambda selector=selector: _load(selector))
+			for selector in selectors
+		)
@@ -20,12 +20,26 @@ cdef class DataFrames:
 		# Internal array references
 		l4_float_t[:,:]   _array_co
 		l4_float_t[:,:,:] _array_ca
+		# Single precision storage, used when data_co or data_ca is float32
+		float[:,:]        _array_co_f32
+		float[:,:,:]      _array_ca_f32
+		bint              _float32_co
+		bint              _float32_ca
 		l4_float_t[:,:]   _array_ce
 		object            _array_ce_caseindexes
 		object            _array_ce_altindexes
 		int64_t[:,:]      _array_ce_reversemap
+		int64_t[:]        _array_ce_caseptr
+		int64_t[:]        _array_ce_altpos
+		# Sampling of alternatives correction, added to utility of each ce row
+		object            _data_ce_sampling_correction
+		l4_float_t[:]     _array_ce_sampling_correction
 		int8_t    [:,:]   _array_av
 		l4_float_t[:,:]   _array_ch
+		# Availability and choice stored per data_ce row, used instead of
+		# the dense arrays above when the data is idce only
+		int8_t    [:]     _array_ce_av
+		l4_float_t[:]     _array_ce_ch
 		l4_float_t[:]     _array_wt
 		# Model position mappings
 		int[:] model_utility_ca_param
@@ -71,6 +85,13 @@ cdef class DataFrames:
 		object _caseindex_name
 		object _altindex_name
 
+		# Incremental utility cache, see `_update_utility_cache`
+		object _utility_cache
+		object _utility_cache_coef_ca
+		object _utility_cache_coef_co
+
+	cdef readonly int _utility_cache_updates
+
 	# cdef void _compute_utility_onecase(
 	# 		self,
 	# 		int c,
@@ -92,6 +113,41 @@ cdef class DataFrames:
 			int n_alts,
 	) nogil
 
+	cdef void _compute_utility_onecase_unshifted(
+			self,
+			int c,
+			l4_float_t[:] U,
+			int n_alts,
+	) nogil
+
+	cdef int _compute_d_utility_onecase_ce(
+			self,
+			int c,
+			l4_float_t[:] U,
+			l4_float_t[:,:] dU,
+			bint return_dU,
+	) nogil
+
+	cdef int64_t _ce_row(
+			self,
+			int c,
+			int j,
+	) nogil
+
+
+	cdef int8_t _is_available(
+			self,
+			int c,
+			int j,
+			int64_t row,
+	) nogil
+
+	cdef l4_float_t _get_choice_onecase_onealt(
+			self,
+			int c,
+			int j,
+			int64_t row,
+	) nogil
 
 	cdef l4_float_t[:] _get_choice_onecase(
 			self,
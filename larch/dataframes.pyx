@@ -21,6 +21,7 @@ logger = logging.getLogger(logger_name)
 from .model.controller cimport Model5c
 from numpy.math cimport expf, logf
 from libc.math cimport exp, log
+from cython.parallel cimport prange, parallel
 
 from .util.dataframe import columnize
 from .util.multiindex import remove_unused_level
@@ -48,12 +49,31 @@ def _check_dataframe_of_dtype(df, dtype):
 	return True
 
 
+def _reusable_columns(df, columns, dtype):
+	"""
+	Check if `df` already holds exactly the requested columns, in order and of `dtype`.
+
+	Such a frame can be used as is instead of being rebuilt, which keeps
+	memory-mapped data (see `DataFrames.load_mmap`) mapped instead of copying it.
+	"""
+	if not _check_dataframe_of_dtype(df, dtype):
+		return False
+	return [str(c) for c in columns] == [str(c) for c in df.columns]
+
+
 def _ensure_dataframe_of_dtype(df, dtype, label, warn_on_convert=True):
 	if df is None:
 		return df
 	if not isinstance(df, pandas.DataFrame):
 		raise TypeError(f'{label} must be a DataFrame')
-	if not all(df.dtypes == dtype):
+	if df.shape[1] == 0 and df.values.dtype != dtype:
+		# a DataFrame with no columns has no dtypes to check
+		df = pandas.DataFrame(
+			data=df.values.astype(dtype),
+			columns=df.columns,
+			index=df.index,
+		)
+	elif not all(df.dtypes == dtype):
 		if warn_on_convert:
 			logger.warning(f'converting {label} to {dtype}')
 		df = pandas.DataFrame(
@@ -384,6 +404,10 @@ cdef class DataFrames:
 		the `wt` argument if possible.  If the `wt` argument is not given but a
 		name is specified, then that named column is found in the `co`, `ca`, or `ce`
 		arguments and used as the weight.
+	sampling_correction : pandas.Series, optional
+		A correction term for sampled alternatives, with the same index as `ce`,
+		which is added to the utility of each row of `ce`.  This is typically
+		created by `DataFrames.sample_alternatives`.
 	"""
 
 	def __init__(
@@ -421,6 +445,8 @@ cdef class DataFrames:
 
 			caseindex_name = '_caseid_',
 			altindex_name = '_altid_',
+
+			sampling_correction = None,
 	):
 
 		try:
@@ -430,6 +456,9 @@ cdef class DataFrames:
 			self._data_ch = None
 			self._data_wt = None
 			self._data_av = None
+			self._data_ce_sampling_correction = None
+			self._utility_cache = None
+			self._utility_cache_updates = 0
 
 			co = co if co is not None else data_co
 			ca = ca if ca is not None else data_ca
@@ -489,14 +518,11 @@ cdef class DataFrames:
 
 			if ch is None and ch_as_ce is not None and ce is not None:
 				logger.debug(" DataFrames ~ building ch_as_ce")
-				_ch_temp = pandas.DataFrame(numpy.asarray(ch_as_ce), index=ce.index, columns=['choice'])
-				ch = _ch_temp.unstack().fillna(0)
-				ch.columns = ch.columns.droplevel(0)
+				ch = pandas.DataFrame(numpy.asarray(ch_as_ce), index=ce.index, columns=['choice'])
 
 			if ch is None and ch_name is not None and ce is not None and ch_name in ce.columns:
 				logger.debug(" DataFrames ~ pulling ch from ce")
-				_ch_temp = ce[ch_name]
-				ch = _ch_temp.unstack().fillna(0)
+				ch = ce[ch_name]
 
 			if ch is None and ch_name is not None and ca is not None and ch_name in ca.columns:
 				logger.debug(" DataFrames ~ pulling ch from ca")
@@ -505,9 +531,7 @@ cdef class DataFrames:
 
 			if av is None and av_as_ce is not None and ce is not None:
 				logger.debug(" DataFrames ~ building av_as_ce")
-				_av_temp = pandas.DataFrame(numpy.asarray(av_as_ce), index=ce.index, columns=['avail'])
-				av = _av_temp.unstack().fillna(0)
-				av.columns = av.columns.droplevel(0)
+				av = pandas.DataFrame(numpy.asarray(av_as_ce), index=ce.index, columns=['avail'])
 
 			if wt_name is not None and wt is None:
 				if co is not None and wt_name in co.columns:
@@ -546,10 +570,12 @@ cdef class DataFrames:
 			self.data_co = co
 			self.data_ca = ca
 			self.data_ce = ce
-			if isinstance(ch, pandas.DataFrame) and isinstance(ch.index, pandas.MultiIndex) and len(ch.index.levels)==2 and ch.shape[1]==1:
+			self.sampling_correction = sampling_correction
+			# with data_ce, idce format choices are kept as they are, one per row
+			if self._data_ce is None and isinstance(ch, pandas.DataFrame) and isinstance(ch.index, pandas.MultiIndex) and len(ch.index.levels)==2 and ch.shape[1]==1:
 				logger.debug(" DataFrames ~ change ch to Series")
 				ch = ch.iloc[:,0]
-			if isinstance(ch, pandas.Series) and isinstance(ch.index, pandas.MultiIndex) and len(ch.index.levels)==2:
+			if self._data_ce is None and isinstance(ch, pandas.Series) and isinstance(ch.index, pandas.MultiIndex) and len(ch.index.levels)==2:
 				if self.data_ca is not None and _fast_check_multiindex_equality(self.data_ca.index, ch.index):
 					logger.debug(" DataFrames ~ unstack ch (fast)")
 					ch = pandas.DataFrame(
@@ -561,7 +587,7 @@ cdef class DataFrames:
 					logger.debug(" DataFrames ~ unstack ch (slow)")
 					ch = ch.unstack()
 
-			if ch is not None:
+			if ch is not None and not isinstance(ch.index, pandas.MultiIndex):
 				self._ensure_consistent_alternative_codes(ch.columns)
 			if self._alternative_codes is None:
 				self._alternative_codes = pandas.Index([])
@@ -571,17 +597,25 @@ cdef class DataFrames:
 			self.data_wt = wt
 			if av is None and self.data_ce is not None:
 				logger.debug(" DataFrames ~ build av from ce")
-				av = pandas.DataFrame(data=(self._array_ce_reversemap.base>=0), columns=self.alternative_codes(), index=self.caseindex)
+				av = True
 			if av is True or (isinstance(av, (int, float)) and av==1):
 				if self.n_alts == 0:
 					raise ValueError('cannot declare all alternatives are available without defining alternative codes')
-				logger.debug(" DataFrames ~ initialize av as 1")
-				self.data_av = pandas.DataFrame(data=1, columns=self.alternative_codes(), index=self.caseindex, dtype=numpy.int8)
+				if self._data_ce is not None:
+					logger.debug(" DataFrames ~ initialize av as 1 on data_ce rows")
+					self.data_av = pandas.DataFrame(
+						data=numpy.ones(len(self._data_ce), dtype=numpy.int8),
+						index=self._data_ce.index,
+						columns=['avail'],
+					)
+				else:
+					logger.debug(" DataFrames ~ initialize av as 1")
+					self.data_av = pandas.DataFrame(data=1, columns=self.alternative_codes(), index=self.caseindex, dtype=numpy.int8)
 			else:
-				if isinstance(av, pandas.DataFrame) and isinstance(av.index, pandas.MultiIndex) and len(av.index.levels)==2 and av.shape[1]==1:
+				if self._data_ce is None and isinstance(av, pandas.DataFrame) and isinstance(av.index, pandas.MultiIndex) and len(av.index.levels)==2 and av.shape[1]==1:
 					logger.debug(" DataFrames ~ change av to Series")
 					av = av.iloc[:,0]
-				if isinstance(av, pandas.Series) and isinstance(av.index, pandas.MultiIndex) and len(av.index.levels)==2:
+				if self._data_ce is None and isinstance(av, pandas.Series) and isinstance(av.index, pandas.MultiIndex) and len(av.index.levels)==2:
 					if self.data_ca is not None and _fast_check_multiindex_equality(self.data_ca.index, av.index):
 						logger.debug(" DataFrames ~ unstack av (fast)")
 						av = pandas.DataFrame(
@@ -743,16 +777,20 @@ cdef class DataFrames:
 			return True
 		with gil:
 			if self._data_ca is not None:
-				if not _check_dataframe_of_dtype(self._data_ca, l4_float_dtype):
+				if not _check_dataframe_of_dtype(self._data_ca, l4_float_dtype) \
+						and not _check_dataframe_of_dtype(self._data_ca, numpy.float32):
 					return False
 			if self._data_ce is not None:
 				if not _check_dataframe_of_dtype(self._data_ce, l4_float_dtype):
 					return False
 			if self._data_co is not None:
-				if not _check_dataframe_of_dtype(self._data_co, l4_float_dtype):
+				if not _check_dataframe_of_dtype(self._data_co, l4_float_dtype) \
+						and not _check_dataframe_of_dtype(self._data_co, numpy.float32):
 					return False
 		if activate:
-			self._computational = True
+			with gil:
+				# the setter also builds the internal arrays
+				self.computational = True
 		return True
 
 	def is_computational_ready(self, bint activate=False):
@@ -995,7 +1033,7 @@ cdef class DataFrames:
 		elif self._data_ca is not None:
 			return len(self.data_ca) / self.n_alts
 		elif self._data_ce is not None:
-			return self._array_ce_reversemap.shape[0]
+			return self._array_ce_caseptr.shape[0] - 1
 		elif self._data_ch is not None:
 			return len(self.data_ch)
 		elif self._data_av is not None:
@@ -1011,6 +1049,9 @@ cdef class DataFrames:
 		"""
 		if self._data_co is not None:
 			return self.data_co.index
+		elif self._data_ce is not None:
+			# data_ch and data_av may be stored by data_ce row
+			return self._data_ce.index.levels[0][numpy.unique(self._data_ce.index.codes[0])]
 		elif self._data_ch is not None:
 			return self.data_ch.index
 		elif self._data_wt is not None:
@@ -1019,8 +1060,6 @@ cdef class DataFrames:
 			return self.data_av.index
 		elif self._data_ca is not None:
 			return self._data_ca.index.levels[0][numpy.unique(self._data_ca.index.codes[0])]
-		elif self._data_ce is not None:
-			return self._data_ce.index.levels[0][numpy.unique(self._data_ce.index.codes[0])]
 		else:
 			return 0
 
@@ -1037,9 +1076,12 @@ cdef class DataFrames:
 
 	@data_ca.setter
 	def data_ca(self, df:pandas.DataFrame):
+		self._utility_cache = None
 		if df is None:
 			self._data_ca = None
 			self._array_ca = None
+			self._array_ca_f32 = None
+			self._float32_ca = False
 		else:
 			if isinstance(df, pandas.Series):
 				df = pandas.DataFrame(df)
@@ -1058,12 +1100,20 @@ cdef class DataFrames:
 			altindex_name = self._altindex_name or df.index.names[1]
 			df.index.names = [caseindex_name, altindex_name]
 
+			self._array_ca = None
+			self._array_ca_f32 = None
+			self._float32_ca = False
 			if self._computational:
-				self._data_ca = _ensure_dataframe_of_dtype(df, l4_float_dtype, 'data_ca')
-				self._array_ca = _df_values(self.data_ca, (self.n_cases, self.n_alts, -1))
+				if df.shape[1] and _check_dataframe_of_dtype(df, numpy.float32):
+					# keep single precision storage, computations still accumulate in double
+					self._data_ca = df
+					self._array_ca_f32 = _df_values(self.data_ca, (self.n_cases, self.n_alts, -1))
+					self._float32_ca = True
+				else:
+					self._data_ca = _ensure_dataframe_of_dtype(df, l4_float_dtype, 'data_ca')
+					self._array_ca = _df_values(self.data_ca, (self.n_cases, self.n_alts, -1))
 			else:
 				self._data_ca = df
-				self._array_ca = None
 			if self._alternative_codes is None and self._data_ca is not None:
 				self._alternative_codes = self._data_ca.index.levels[1]
 
@@ -1101,9 +1151,12 @@ cdef class DataFrames:
 
 	@data_co.setter
 	def data_co(self, df:pandas.DataFrame):
+		self._utility_cache = None
 		if df is None:
 			self._data_co = None
 			self._array_co = None
+			self._array_co_f32 = None
+			self._float32_co = False
 		else:
 			if isinstance(df, pandas.Series):
 				df = pandas.DataFrame(df)
@@ -1115,12 +1168,20 @@ cdef class DataFrames:
 			caseindex_name = self._caseindex_name or df.index.names[0]
 			df.index.name = caseindex_name
 
+			self._array_co = None
+			self._array_co_f32 = None
+			self._float32_co = False
 			if self._computational:
-				self._data_co = _ensure_dataframe_of_dtype(df, l4_float_dtype, 'data_co')
-				self._array_co = _df_values(self.data_co)
+				if df.shape[1] and _check_dataframe_of_dtype(df, numpy.float32):
+					# keep single precision storage, computations still accumulate in double
+					self._data_co = df
+					self._array_co_f32 = _df_values(self.data_co)
+					self._float32_co = True
+				else:
+					self._data_co = _ensure_dataframe_of_dtype(df, l4_float_dtype, 'data_co')
+					self._array_co = _df_values(self.data_co)
 			else:
 				self._data_co = df
-				self._array_co = None
 
 	def data_co_as_ce(self):
 		"""
@@ -1138,14 +1199,14 @@ cdef class DataFrames:
 		if self.data_co is None:
 			return None
 		cdef int c,a,v,row,n_vars
-		n_vars = self._array_co.shape[1]
+		array_co = self.data_co.values
+		n_vars = array_co.shape[1]
 		arr = numpy.zeros( [len(self.data_ce), n_vars], dtype=l4_float_dtype )
-		for c in range(self._array_ce_reversemap.shape[0]):
-			for a in range(self._array_ce_reversemap.shape[1]):
-				row = self._array_ce_reversemap[c,a]
-				if row >= 0:
-					for v in range(n_vars):
-						arr[row,v] = self._array_co[c,v]
+		for c in range(self._array_ce_caseptr.shape[0]-1):
+			for row in range(self._array_ce_caseptr[c], self._array_ce_caseptr[c+1]):
+				a = self._array_ce_altpos[row]
+				for v in range(n_vars):
+					arr[row,v] = array_co[c,v]
 		return pandas.DataFrame(arr, index=self.data_ce.index, columns=['weight'])
 
 	@property
@@ -1155,12 +1216,28 @@ cdef class DataFrames:
 	@data_ce.setter
 	def data_ce(self, df:pandas.DataFrame):
 		cdef int64_t i, c, a, min_case_x
+		self._utility_cache = None
+		# availability and choices are realigned to the new rows below
+		if df is None and self._data_ce is not None:
+			av, ch = self.data_av, self.data_ch
+		else:
+			av, ch = self._data_av, self._data_ch
+		self._data_av = None
+		self._array_av = None
+		self._array_ce_av = None
+		self._data_ch = None
+		self._array_ch = None
+		self._array_ce_ch = None
 		if df is None:
 			self._data_ce = None
 			self._array_ce = None
 			self._array_ce_caseindexes = None
 			self._array_ce_altindexes = None
 			self._array_ce_reversemap = None
+			self._array_ce_caseptr = None
+			self._array_ce_altpos = None
+			self._data_ce_sampling_correction = None
+			self._array_ce_sampling_correction = None
 		else:
 			if isinstance(df, pandas.Series):
 				df = pandas.DataFrame(df)
@@ -1181,6 +1258,18 @@ cdef class DataFrames:
 
 			if not df.index.is_monotonic_increasing:
 				df = df.sort_index()
+
+			# The rows for each case must be contiguous, with alternatives in
+			# ascending position, so each case is a slice of rows (CSR layout).
+			unique_labels, new_labels = numpy.unique(df.index.codes[0], return_inverse=True)
+			altpos = numpy.asarray(df.index.codes[1], dtype=numpy.int64)
+			if len(new_labels) > 1:
+				if numpy.any((numpy.diff(new_labels) < 0) | ((numpy.diff(new_labels) == 0) & (numpy.diff(altpos) <= 0))):
+					order = numpy.lexsort((altpos, new_labels))
+					df = df.iloc[order]
+					new_labels = new_labels[order]
+					altpos = altpos[order]
+
 			if self._computational:
 				self._data_ce = _ensure_dataframe_of_dtype(df, l4_float_dtype, 'data_ce')
 				self._array_ce = _df_values(self.data_ce)
@@ -1188,30 +1277,137 @@ cdef class DataFrames:
 				self._data_ce = df
 				self._array_ce = None
 
-			unique_labels, new_labels =numpy.unique(self.data_ce.index.codes[0], return_inverse=True)
 			self._array_ce_caseindexes = new_labels
-
-			# min_case_x = self.data_ce.index.labels[0].min()
-			# if min_case_x == 0:
-			# 	self._array_ce_caseindexes = self.data_ce.index.labels[0]
-			# else:
-			# 	self._array_ce_caseindexes = self.data_ce.index.labels[0] - min_case_x
 			self._array_ce_altindexes  = self.data_ce.index.codes[1]
-			self._array_ce_reversemap = numpy.full([self._array_ce_caseindexes.max()+1, self._array_ce_altindexes.max()+1], -1, dtype=numpy.int64)
-			for i in range(len(self._array_ce_caseindexes)):
-				c = self._array_ce_caseindexes[i]
-				a = self._array_ce_altindexes[i]
-				self._array_ce_reversemap[c, a] = i
-			#self._array_ce_reversemap[self._array_ce_caseindexes, self._array_ce_altindexes] = numpy.arange(len(self._array_ce_caseindexes), dtype=numpy.int64)
+			self._array_ce_altpos = altpos
+			caseptr = numpy.zeros([len(unique_labels)+1], dtype=numpy.int64)
+			caseptr[1:] = numpy.cumsum(numpy.bincount(new_labels, minlength=len(unique_labels)))
+			self._array_ce_caseptr = caseptr
+			# the dense reverse map is only built on demand, see `array_ce_reversemap`
+			self._array_ce_reversemap = None
+			if self._data_ce_sampling_correction is not None:
+				self.sampling_correction = self._data_ce_sampling_correction
+		if av is not None:
+			self.data_av = av
+		if ch is not None:
+			self.data_ch = ch
+
+	@property
+	def sampling_correction(self):
+		"""
+		pandas.Series : Correction for sampled alternatives, added to the utility of each `data_ce` row.
+
+		When alternatives are sampled with probabilities other than uniform, the
+		choice model estimated on the sampled choice sets is only consistent if
+		the utility of each sampled alternative `j` is adjusted by `-log(q_j)`,
+		where `q_j` is its sampling probability (or by `log(k_j/(K q_j))` when
+		`K` draws are made with replacement and `j` is drawn `k_j` times).
+		"""
+		return self._data_ce_sampling_correction
+
+	@sampling_correction.setter
+	def sampling_correction(self, value):
+		if value is None:
+			self._data_ce_sampling_correction = None
+			self._array_ce_sampling_correction = None
+			return
+		if self._data_ce is None:
+			raise ValueError('sampling_correction requires data_ce')
+		if isinstance(value, pandas.DataFrame):
+			if value.shape[1] != 1:
+				raise ValueError('sampling_correction must be a single column')
+			value = value.iloc[:,0]
+		if not isinstance(value, pandas.Series):
+			value = numpy.asarray(value, dtype=l4_float_dtype).reshape(-1)
+			if value.shape[0] != len(self._data_ce):
+				raise ValueError(f'sampling_correction has {value.shape[0]} rows, data_ce has {len(self._data_ce)}')
+			value = pandas.Series(value, index=self._data_ce.index, name='sampling_correction')
+		elif not value.index.equals(self._data_ce.index):
+			value = value.reindex(self._data_ce.index)
+			if value.isnull().any():
+				raise ValueError('sampling_correction is missing values for some rows of data_ce')
+		value = value.astype(l4_float_dtype)
+		self._data_ce_sampling_correction = value
+		self._array_ce_sampling_correction = value.values
+
+	def _as_ce_rows(self, values, dtype, label, warn_dropped=False):
+		"""
+		Align availability or choice data with the rows of `data_ce`.
+
+		Parameters
+		----------
+		values : pandas.DataFrame or pandas.Series
+			Either wide data, with a row for each case and a column for
+			each alternative, or a single column with a two level MultiIndex.
+		dtype : dtype
+		label : str
+			The name of the resulting column.
+		warn_dropped : bool, default False
+			Log a warning if wide data has nonzero values for case-alts
+			that do not appear in `data_ce`, which are dropped.
+
+		Returns
+		-------
+		pandas.DataFrame
+			A single column, indexed the same as `data_ce`.
+		"""
+		if isinstance(values, pandas.DataFrame) and isinstance(values.index, pandas.MultiIndex) and values.shape[1]==1:
+			values = values.iloc[:,0]
+		if isinstance(values, pandas.Series):
+			if not isinstance(values.index, pandas.MultiIndex) or values.index.nlevels != 2:
+				raise ValueError(f'{label} must be wide, or have the same two level index as data_ce')
+			if not _fast_check_multiindex_equality(values.index, self._data_ce.index):
+				values = values.reindex(self._data_ce.index).fillna(0)
+			arr = numpy.asarray(values.values, dtype=dtype)
+		else:
+			if not isinstance(values, pandas.DataFrame):
+				raise TypeError(f'{label} must be a DataFrame or Series')
+			wide = _df_values(values, (self._n_cases(), self._n_alts()), dtype=dtype)
+			arr = wide[self._array_ce_caseindexes, numpy.asarray(self._array_ce_altpos)]
+			if warn_dropped and numpy.count_nonzero(wide) != numpy.count_nonzero(arr):
+				logger.warning(f'{label} has nonzero values for case-alts not in data_ce, these are dropped')
+		return pandas.DataFrame({label: arr}, index=self._data_ce.index)
+
+	def _ce_rows_as_wide(self, df):
+		"""
+		Expand a single column aligned with the rows of `data_ce` to wide format.
+
+		Case-alts that do not appear in `data_ce` are filled with zero.
+
+		Parameters
+		----------
+		df : pandas.DataFrame
+
+		Returns
+		-------
+		pandas.DataFrame
+		"""
+		arr = numpy.zeros([self._n_cases(), self._n_alts()], dtype=df.dtypes.iloc[0])
+		arr[self._array_ce_caseindexes, numpy.asarray(self._array_ce_altpos)] = df.values[:,0]
+		return pandas.DataFrame(arr, index=self.caseindex, columns=self.alternative_codes())
 
 	@property
 	def data_av(self):
+		"""pandas.DataFrame : Availability, with a column for each alternative.
+
+		When the data is in idce format, availability is stored for each
+		row of `data_ce` only, and this wide DataFrame is built on access.
+		"""
+		if self._array_ce_av is not None:
+			return self._ce_rows_as_wide(self._data_av)
 		return self._data_av
 
 	@data_av.setter
 	def data_av(self, df:pandas.DataFrame):
-		self._data_av = _ensure_dataframe_of_dtype(df, numpy.int8, 'data_av', warn_on_convert=False)
-		self._array_av = _df_values(self.data_av, (self.n_cases, self.n_alts))
+		self._utility_cache = None
+		if df is not None and self._data_ce is not None:
+			self._data_av = self._as_ce_rows(df, numpy.int8, 'avail')
+			self._array_ce_av = self._data_av.values[:,0]
+			self._array_av = None
+		else:
+			self._data_av = _ensure_dataframe_of_dtype(df, numpy.int8, 'data_av', warn_on_convert=False)
+			self._array_av = _df_values(self.data_av, (self.n_cases, self.n_alts))
+			self._array_ce_av = None
 
 	def data_av_as_ce(self):
 		"""
@@ -1227,15 +1423,7 @@ cdef class DataFrames:
 			if self._data_av is None:
 				raise NotImplementedError('not implemented when data_ce and data_av are None')
 			return self._data_av[self._data_av.stack().astype(bool).values]
-
-		arr = numpy.zeros( [len(self.data_ce)], dtype=numpy.int8 )
-		cdef int c,a,row
-		for c in range(self._array_ce_reversemap.shape[0]):
-			for a in range(self._array_ce_reversemap.shape[1]):
-				row = self._array_ce_reversemap[c,a]
-				if row >= 0:
-					arr[row] = self._array_av[c,a]
-		return pandas.DataFrame(arr, index=self.data_ce.index, columns=['avail'])
+		return self._data_av.copy()
 
 
 	def data_av_cascade(self, graph):
@@ -1268,12 +1456,25 @@ cdef class DataFrames:
 
 	@property
 	def data_ch(self):
+		"""pandas.DataFrame : Choices, with a column for each alternative.
+
+		When the data is in idce format, choices are stored for each
+		row of `data_ce` only, and this wide DataFrame is built on access.
+		"""
+		if self._array_ce_ch is not None:
+			return self._ce_rows_as_wide(self._data_ch)
 		return self._data_ch
 
 	@data_ch.setter
 	def data_ch(self, df:pandas.DataFrame):
-		self._data_ch = _ensure_dataframe_of_dtype(df, l4_float_dtype, 'data_ch')
-		self._array_ch = _df_values(self.data_ch, (self.n_cases, self.n_alts))
+		if df is not None and self._data_ce is not None:
+			self._data_ch = self._as_ce_rows(df, l4_float_dtype, 'choice', warn_dropped=True)
+			self._array_ce_ch = self._data_ch.values[:,0]
+			self._array_ch = None
+		else:
+			self._data_ch = _ensure_dataframe_of_dtype(df, l4_float_dtype, 'data_ch')
+			self._array_ch = _df_values(self.data_ch, (self.n_cases, self.n_alts))
+			self._array_ce_ch = None
 
 	def set_data_ch_wide(self, df, graph):
 		"""
@@ -1294,6 +1495,7 @@ cdef class DataFrames:
 		"""
 		self._data_ch = _ensure_dataframe_of_dtype(df, l4_float_dtype, 'data_ch')
 		self._array_ch = _df_values(self.data_ch, (self.n_cases, len(graph)))
+		self._array_ce_ch = None
 
 	def data_ch_cascade(self, graph):
 		"""
@@ -1344,15 +1546,10 @@ cdef class DataFrames:
 			if self._data_av is None:
 				raise NotImplementedError('not implemented when data_ce and data_av are None')
 			return self._data_ch[self._data_av.stack().astype(bool).values]
-
-		arr = numpy.zeros( [len(self.data_ce)], dtype=l4_float_dtype )
-		cdef int c,a,row
-		for c in range(self._array_ce_reversemap.shape[0]):
-			for a in range(self._array_ce_reversemap.shape[1]):
-				row = self._array_ce_reversemap[c,a]
-				if row >= 0:
-					arr[row] = self._array_ch[c,a]
-		return pandas.DataFrame(arr, index=self.data_ce.index, columns=['choice'])
+		if self._array_ce_ch is not None:
+			return self._data_ch.copy()
+		# choices set wide with nests, see `set_data_ch_wide`
+		return self._as_ce_rows(self._data_ch.iloc[:,:self.n_alts], l4_float_dtype, 'choice')
 
 	@property
 	def data_wt(self):
@@ -1368,11 +1565,10 @@ cdef class DataFrames:
 			return None
 		arr = numpy.zeros( [len(self.data_ce)], dtype=l4_float_dtype )
 		cdef int c,a,row
-		for c in range(self._array_ce_reversemap.shape[0]):
-			for a in range(self._array_ce_reversemap.shape[1]):
-				row = self._array_ce_reversemap[c,a]
-				if row >= 0:
-					arr[row] = self._array_wt[c]
+		for c in range(self._array_ce_caseptr.shape[0]-1):
+			for row in range(self._array_ce_caseptr[c], self._array_ce_caseptr[c+1]):
+				a = self._array_ce_altpos[row]
+				arr[row] = self._array_wt[c]
 		return pandas.DataFrame(arr, index=self.data_ce.index, columns=['weight'])
 
 	@property
@@ -1480,8 +1676,35 @@ cdef class DataFrames:
 
 	@property
 	def array_ce_reversemap(self):
+		"""
+		Dense map from (case, alternative) positions to rows of `data_ce`.
+
+		Unavailable alternatives map to -1.  This array is built on first access,
+		as the computational kernels use the per-case row offsets instead.
+		"""
+		if self._array_ce_reversemap is None and self._array_ce_caseptr is not None:
+			reversemap = numpy.full(
+				[self._array_ce_caseptr.shape[0]-1, self._array_ce_altindexes.max()+1],
+				-1,
+				dtype=numpy.int64,
+			)
+			reversemap[self._array_ce_caseindexes, self._array_ce_altpos.base] = numpy.arange(
+				len(self._array_ce_caseindexes), dtype=numpy.int64,
+			)
+			self._array_ce_reversemap = reversemap
 		return self._array_ce_reversemap
 
+	@property
+	def array_ce_caseptr(self):
+		"""
+		Row offsets for each case in `data_ce`.
+
+		The rows for case `c` are `array_ce_caseptr[c]` up to (but not including)
+		`array_ce_caseptr[c+1]`, in the same manner as the index pointer array
+		for a CSR sparse matrix.
+		"""
+		return self._array_ce_caseptr
+
 	def array_av(self, dtype=None):
 		return _df_values(self.data_av, (self.n_cases, self.n_alts, ), dtype=dtype)
 
@@ -1561,7 +1784,7 @@ cdef class DataFrames:
 				raise MissingDataError(f'{len(missing_data)+5} things missing, for example:\n  '+'\n  '.join(str(_) for _ in missing_examples))
 
 		# check data is well aligned
-		if self._data_ch is not None and model._graph is not None:
+		if self._array_ch is not None and model._graph is not None:
 			if not (numpy.all(self._data_ch.columns == model._graph.elementals) or numpy.all(self._data_ch.columns == model._graph.standard_sort)):
 				raise ValueError("data_ch columns not aligned with graph.elementals or graph.standard_sort")
 
@@ -1579,6 +1802,7 @@ cdef class DataFrames:
 			int len_model_utility_ca
 
 		try:
+			self._utility_cache = None
 			self._model = model
 			self._n_model_params = len(model._frame)
 			self._model_param_names = model._frame.index
@@ -1707,14 +1931,40 @@ cdef class DataFrames:
 	cdef void _read_in_model_parameters(
 			self,
 	):
+		try:
+			self._read_in_parameter_values(
+				self._model._frame['value'].values,
+				self._model._frame['holdfast'].values,
+			)
+		except:
+			import logging
+			from .log import logger_name
+			logger = logging.getLogger(logger_name)
+			logger.exception('error in DataFrames._read_in_model_parameters')
+			raise
+
+	def _read_in_parameter_values(self, values, holdfast=None):
+		"""
+		Read parameter values into the arrays used to compute utility.
+
+		Parameters
+		----------
+		values : array-like
+			The values of all the parameters of the linked model, in order.
+		holdfast : array-like, optional
+			The holdfast flags of the parameters, defaulting to all zero.
+		"""
 		cdef:
 			int j,n
 			int len_model_utility_ca
 			l4_float_t[:] pvalues
 
 		try:
-			pvalues = self._model._frame['value'].values.astype(l4_float_dtype)
-			hvalues = self._model._frame['holdfast'].values.astype(numpy.int8)
+			pvalues = numpy.asarray(values).astype(l4_float_dtype)
+			if holdfast is None:
+				hvalues = numpy.zeros(pvalues.shape[0], dtype=numpy.int8)
+			else:
+				hvalues = numpy.asarray(holdfast).astype(numpy.int8)
 
 			for n in range(self.model_quantity_ca_param_value.shape[0]):
 				IF DOUBLE_PRECISION:
@@ -1742,7 +1992,7 @@ cdef class DataFrames:
 			import logging
 			from .log import logger_name
 			logger = logging.getLogger(logger_name)
-			logger.exception('error in DataFrames._read_in_model_parameters')
+			logger.exception('error in DataFrames._read_in_parameter_values')
 			raise
 
 	def read_in_model_parameters(self):
@@ -1791,11 +2041,10 @@ cdef class DataFrames:
 			data = 0,
 			dtype = arr.dtype,
 		)
-		for c in range(self._n_cases()):
-			for a in range(self._n_alts()):
-				row = self._array_ce_reversemap[c,a]
-				if row >= 0:
-					result.values[row] = arr[c,a]
+		for c in range(self._array_ce_caseptr.shape[0]-1):
+			for row in range(self._array_ce_caseptr[c], self._array_ce_caseptr[c+1]):
+				a = self._array_ce_altpos[row]
+				result.values[row] = arr[c,a]
 		return result
 
 
@@ -1850,18 +2099,17 @@ cdef class DataFrames:
 
 		for j in range(n_alts):
 
-			if self._array_ce_reversemap is not None:
-				if c >= self._array_ce_reversemap.shape[0] or j >= self._array_ce_reversemap.shape[1]:
-					row = -1
-				else:
-					row = self._array_ce_reversemap[c,j]
+			if self._array_ce_caseptr is not None:
+				row = self._ce_row(c, j)
 
-			if self._array_av[c,j] and row!=-1:
+			if self._is_available(c, j, row):
 
 				if self.model_quantity_ca_param.shape[0]:
 					for i in range(self.model_quantity_ca_param.shape[0]):
 						if row >= 0:
 							_temp = self._array_ce[row, self.model_quantity_ca_data[i]]
+						elif self._float32_ca:
+							_temp = self._array_ca_f32[c, j, self.model_quantity_ca_data[i]]
 						else:
 							_temp = self._array_ca[c, j, self.model_quantity_ca_data[i]]
 						_temp *= self.model_quantity_ca_param_value[i] * self.model_quantity_ca_param_scale[i]
@@ -1884,24 +2132,32 @@ cdef class DataFrames:
 				for i in range(self.model_utility_ca_param.shape[0]):
 					if row >= 0:
 						_temp = self._array_ce[row, self.model_utility_ca_data[i]]
+					elif self._float32_ca:
+						_temp = self._array_ca_f32[c, j, self.model_utility_ca_data[i]]
 					else:
 						_temp = self._array_ca[c, j, self.model_utility_ca_data[i]]
 					_temp *= self.model_utility_ca_param_scale[i]
 					U[j] += _temp * self.model_utility_ca_param_value[i]
 					if not self.model_utility_ca_param_holdfast[i]:
 						dU[j,self.model_utility_ca_param[i]] += _temp
+
+				if row >= 0 and self._array_ce_sampling_correction is not None:
+					U[j] += self._array_ce_sampling_correction[row]
 			else:
 				U[j] = -INFINITY32
 
 		for i in range(self.model_utility_co_alt.shape[0]):
 			altindex = self.model_utility_co_alt[i]
-			if self._array_av[c,altindex]:
+			if self._is_available(c, altindex, -2):
 				if self.model_utility_co_data[i] == -1:
 					U[altindex] += self.model_utility_co_param_value[i] * self.model_utility_co_param_scale[i]
 					if not self.model_utility_co_param_holdfast[i]:
 						dU[altindex,self.model_utility_co_param[i]] += self.model_utility_co_param_scale[i]
 				else:
-					_temp = self._array_co[c, self.model_utility_co_data[i]] * self.model_utility_co_param_scale[i]
+					if self._float32_co:
+						_temp = self._array_co_f32[c, self.model_utility_co_data[i]] * self.model_utility_co_param_scale[i]
+					else:
+						_temp = self._array_co[c, self.model_utility_co_data[i]] * self.model_utility_co_param_scale[i]
 					U[altindex] += _temp * self.model_utility_co_param_value[i]
 					if not self.model_utility_co_param_holdfast[i]:
 						dU[altindex,self.model_utility_co_param[i]] += _temp
@@ -1925,7 +2181,7 @@ cdef class DataFrames:
 			int n_alts,
 	) nogil:
 		"""
-		Compute d_utility w.r.t. parameters, writing to externally defined `du` array.
+		Compute utility, writing to externally defined `U` array.
 		
 		Parameters
 		----------
@@ -1935,31 +2191,64 @@ cdef class DataFrames:
 			output array
 		"""
 
+		cdef:
+			int j
+			l4_float_t  _max_U = 0
+
+		self._compute_utility_onecase_unshifted(c, U, n_alts)
+
+		# Keep exp(U) from generating overflow
+		for j in range(n_alts):
+			if U[j] > _max_U:
+				_max_U = U[j]
+		if _max_U > 500:
+			for j in range(n_alts):
+				U[j] -= _max_U
+
+
+	@cython.boundscheck(False)
+	@cython.initializedcheck(False)
+	@cython.cdivision(True)
+	cdef void _compute_utility_onecase_unshifted(
+			self,
+			int c,
+			l4_float_t[:]   U,
+			int n_alts,
+	) nogil:
+		"""
+		Compute utility, writing to externally defined `U` array, without overflow protection.
+
+		Parameters
+		----------
+		c : int
+			The case index to compute.
+		U : l4_float_t[n_alts]
+			output array
+		"""
+
 		cdef:
 			int i,j,k, altindex
 			int64_t row = -2
-			l4_float_t  _temp, _temp_data, _max_U
+			l4_float_t  _temp, _temp_data
 
 		if not self._is_computational_ready(activate=True):
 			return
 
 		U[:] = 0
-		_max_U = 0
 
 		for j in range(n_alts):
 
-			if self._array_ce_reversemap is not None:
-				if c >= self._array_ce_reversemap.shape[0] or j >= self._array_ce_reversemap.shape[1]:
-					row = -1
-				else:
-					row = self._array_ce_reversemap[c,j]
+			if self._array_ce_caseptr is not None:
+				row = self._ce_row(c, j)
 
-			if self._array_av[c,j] and row!=-1:
+			if self._is_available(c, j, row):
 
 				if self.model_quantity_ca_param.shape[0]:
 					for i in range(self.model_quantity_ca_param.shape[0]):
 						if row >= 0:
 							_temp = self._array_ce[row, self.model_quantity_ca_data[i]]
+						elif self._float32_ca:
+							_temp = self._array_ca_f32[c, j, self.model_quantity_ca_data[i]]
 						else:
 							_temp = self._array_ca[c, j, self.model_quantity_ca_data[i]]
 						_temp *= self.model_quantity_ca_param_value[i] * self.model_quantity_ca_param_scale[i]
@@ -1974,30 +2263,30 @@ cdef class DataFrames:
 				for i in range(self.model_utility_ca_param.shape[0]):
 					if row >= 0:
 						_temp = self._array_ce[row, self.model_utility_ca_data[i]]
+					elif self._float32_ca:
+						_temp = self._array_ca_f32[c, j, self.model_utility_ca_data[i]]
 					else:
 						_temp = self._array_ca[c, j, self.model_utility_ca_data[i]]
 					_temp *= self.model_utility_ca_param_scale[i]
 					U[j] += _temp * self.model_utility_ca_param_value[i]
+
+				if row >= 0 and self._array_ce_sampling_correction is not None:
+					U[j] += self._array_ce_sampling_correction[row]
 			else:
 				U[j] = -INFINITY32
 
 		for i in range(self.model_utility_co_alt.shape[0]):
 			altindex = self.model_utility_co_alt[i]
-			if self._array_av[c,altindex]:
+			if self._is_available(c, altindex, -2):
 				if self.model_utility_co_data[i] == -1:
 					U[altindex] += self.model_utility_co_param_value[i] * self.model_utility_co_param_scale[i]
 				else:
-					_temp = self._array_co[c, self.model_utility_co_data[i]] * self.model_utility_co_param_scale[i]
+					if self._float32_co:
+						_temp = self._array_co_f32[c, self.model_utility_co_data[i]] * self.model_utility_co_param_scale[i]
+					else:
+						_temp = self._array_co[c, self.model_utility_co_data[i]] * self.model_utility_co_param_scale[i]
 					U[altindex] += _temp * self.model_utility_co_param_value[i]
 
-		# Keep exp(U) from generating overflow
-		for j in range(n_alts):
-			if U[j] > _max_U:
-				_max_U = U[j]
-		if _max_U > 500:
-			for j in range(n_alts):
-				U[j] -= _max_U
-
 
 	def compute_d_utility_onecase(
 			self,
@@ -2007,6 +2296,217 @@ cdef class DataFrames:
 	):
 		self._compute_d_utility_onecase(c, U, dU, dU.shape[0])
 
+	def _utility_cache_is_available(self):
+		"""
+		bool : Whether `_update_utility_cache` can be used with the linked model.
+
+		The incremental cache requires dense idca and idco data, and a model
+		without quantity terms (which enter the utility non-linearly).
+		"""
+		if not self._is_computational_ready(activate=True):
+			return False
+		if self._data_ce is not None:
+			return False
+		if self.model_quantity_ca_param.shape[0]:
+			return False
+		return True
+
+	def _invalidate_utility_cache(self):
+		self._utility_cache = None
+
+	@cython.boundscheck(False)
+	@cython.initializedcheck(False)
+	@cython.cdivision(True)
+	@cython.wraparound(False)
+	def _update_utility_cache(self, int num_threads=1):
+		"""
+		Bring the cached utility array up to date with the current parameters.
+
+		The utility of each alternative is linear in the utility parameters, so
+		when only a few parameters have changed since the last call, the cache
+		is updated by adding the change in each affected coefficient times its
+		data column, instead of recomputing every term.  A full recomputation
+		is made when the cache is empty (e.g. after the model structure or the
+		data changes), when more than half of the terms have changed, or after
+		64 consecutive incremental updates, to bound accumulated rounding error.
+
+		Parameters
+		----------
+		num_threads : int, default 1
+			Number of threads used for a full recomputation.
+
+		Returns
+		-------
+		ndarray
+			The cached utility, shape [n_cases, n_alts].  Utilities are not
+			shifted for overflow protection.  This array is owned by the cache
+			and should not be modified.
+		"""
+		cdef:
+			int c, j, t, i, altindex
+			int n_cases, n_alts
+			int n_changed_ca, n_changed_co
+			bint full
+			l4_float_t[:,:] cache
+			l4_float_t[:] delta_ca, delta_co
+			int[:] changed_ca, changed_co
+			l4_float_t _temp
+			int data_i
+
+		try:
+			if not self._utility_cache_is_available():
+				raise ValueError('the utility cache is not available for this data and model')
+
+			n_cases = self._n_cases()
+			n_alts = self._n_alts()
+
+			coef_ca = numpy.asarray(self.model_utility_ca_param_value) * numpy.asarray(self.model_utility_ca_param_scale)
+			coef_co = numpy.asarray(self.model_utility_co_param_value) * numpy.asarray(self.model_utility_co_param_scale)
+
+			full = (
+				self._utility_cache is None
+				or self._utility_cache_updates >= 64
+				or self._utility_cache_coef_ca.shape != coef_ca.shape
+				or self._utility_cache_coef_co.shape != coef_co.shape
+			)
+
+			if not full:
+				d_ca = coef_ca - self._utility_cache_coef_ca
+				d_co = coef_co - self._utility_cache_coef_co
+				_changed_ca = numpy.flatnonzero(d_ca).astype(numpy.int32)
+				_changed_co = numpy.flatnonzero(d_co).astype(numpy.int32)
+				n_changed_ca = _changed_ca.shape[0]
+				n_changed_co = _changed_co.shape[0]
+				if n_changed_ca + n_changed_co == 0:
+					return self._utility_cache
+				if 2 * (n_changed_ca + n_changed_co) > coef_ca.shape[0] + coef_co.shape[0]:
+					full = True
+
+			if full:
+				if self._utility_cache is None or self._utility_cache.shape != (n_cases, n_alts):
+					self._utility_cache = numpy.zeros([n_cases, n_alts], dtype=l4_float_dtype)
+				cache = self._utility_cache
+				with nogil, parallel(num_threads=num_threads):
+					for c in prange(n_cases):
+						self._compute_utility_onecase_unshifted(c, cache[c,:], n_alts)
+				self._utility_cache_updates = 0
+			else:
+				cache = self._utility_cache
+				delta_ca = d_ca.astype(l4_float_dtype)
+				delta_co = d_co.astype(l4_float_dtype)
+				changed_ca = _changed_ca
+				changed_co = _changed_co
+				with nogil, parallel(num_threads=num_threads):
+					for c in prange(n_cases):
+						for j in range(n_alts):
+							if not self._is_available(c, j, -2):
+								continue
+							for t in range(n_changed_ca):
+								i = changed_ca[t]
+								if self._float32_ca:
+									_temp = self._array_ca_f32[c, j, self.model_utility_ca_data[i]]
+								else:
+									_temp = self._array_ca[c, j, self.model_utility_ca_data[i]]
+								cache[c,j] += _temp * delta_ca[i]
+						for t in range(n_changed_co):
+							i = changed_co[t]
+							altindex = self.model_utility_co_alt[i]
+							if not self._is_available(c, altindex, -2):
+								continue
+							data_i = self.model_utility_co_data[i]
+							if data_i == -1:
+								cache[c,altindex] += delta_co[i]
+							elif self._float32_co:
+								cache[c,altindex] += self._array_co_f32[c, data_i] * delta_co[i]
+							else:
+								cache[c,altindex] += self._array_co[c, data_i] * delta_co[i]
+				self._utility_cache_updates += 1
+
+			self._utility_cache_coef_ca = coef_ca
+			self._utility_cache_coef_co = coef_co
+			return self._utility_cache
+
+		except:
+			logger.exception('error in DataFrames._update_utility_cache')
+			raise
+
+
+	@cython.boundscheck(False)
+	@cython.initializedcheck(False)
+	@cython.cdivision(True)
+	@cython.wraparound(False)
+	cdef int8_t _is_available(
+			self,
+			int c,
+			int j,
+			int64_t row,
+	) nogil:
+		"""
+		Check whether a case-alt is available.
+
+		Parameters
+		----------
+		c : int
+			The case index.
+		j : int
+			The alt index.
+		row : int64
+			The row of `data_ce` for this case-alt if already known, -1 if
+			it does not appear in `data_ce`, or -2 to look it up as needed.
+
+		Returns
+		-------
+		int8
+			Alternatives are all available when there is no availability data.
+		"""
+		if self._array_av is not None:
+			if row == -1:
+				return 0
+			return self._array_av[c,j]
+		if self._array_ce_caseptr is not None:
+			if row == -2:
+				row = self._ce_row(c, j)
+			if row < 0:
+				return 0
+			if self._array_ce_av is not None:
+				return self._array_ce_av[row]
+		return 1
+
+	@cython.boundscheck(False)
+	@cython.initializedcheck(False)
+	@cython.cdivision(True)
+	@cython.wraparound(False)
+	cdef l4_float_t _get_choice_onecase_onealt(
+			self,
+			int c,
+			int j,
+			int64_t row,
+	) nogil:
+		"""
+		Get the choice for a case-alt.
+
+		Parameters
+		----------
+		c : int
+			The case index.
+		j : int
+			The alt index.
+		row : int64
+			The row of `data_ce` for this case-alt if already known, or -2
+			to look it up as needed.
+
+		Returns
+		-------
+		l4_float_t
+		"""
+		if self._array_ch is not None:
+			return self._array_ch[c,j]
+		if self._array_ce_ch is not None:
+			if row == -2:
+				row = self._ce_row(c, j)
+			if row >= 0:
+				return self._array_ce_ch[row]
+		return 0
 
 	@cython.boundscheck(False)
 	@cython.initializedcheck(False)
@@ -2016,6 +2516,28 @@ cdef class DataFrames:
 			self,
 			int c,
 	) nogil:
+		"""
+		Get the choices for a case, one per alternative.
+
+		With wide choice data this is a view on `array_ch`.  When the choices
+		are stored by `data_ce` row there is no such row to view, so a new
+		array is built, with zeros for alternatives not in `data_ce`.
+
+		Parameters
+		----------
+		c : int
+			The case index.
+
+		Returns
+		-------
+		l4_float_t[:]
+		"""
+		cdef l4_float_t[:] result
+		if self._array_ch is None and self._array_ce_ch is not None:
+			with gil:
+				result = numpy.zeros(self._n_alts(), dtype=l4_float_dtype)
+				self._copy_choice_onecase(c, result)
+				return result
 		return self._array_ch[c,:]
 
 	@cython.boundscheck(False)
@@ -2028,9 +2550,17 @@ cdef class DataFrames:
 			l4_float_t[:] into_array,
 	) nogil:
 		cdef:
-			int i
-			int readcap = self._array_ch.shape[1]
+			int i, readcap
 			int writecap = into_array.shape[0]
+			int64_t row
+		if self._array_ch is None:
+			for i in range(writecap):
+				into_array[i] = 0
+			if self._array_ce_ch is not None:
+				for row in range(self._array_ce_caseptr[c], self._array_ce_caseptr[c+1]):
+					into_array[self._array_ce_altpos[row]] = self._array_ce_ch[row]
+			return
+		readcap = self._array_ch.shape[1]
 		if readcap < writecap:
 			for i in range(readcap):
 				into_array[i] = self._array_ch[c,i]
@@ -2042,6 +2572,166 @@ cdef class DataFrames:
 
 
 
+	@cython.boundscheck(False)
+	@cython.initializedcheck(False)
+	@cython.cdivision(True)
+	cdef int64_t _ce_row(
+			self,
+			int c,
+			int j,
+	) nogil:
+		"""
+		Find the row of `data_ce` for a case-alt, by bisection within the rows for the case.
+
+		Parameters
+		----------
+		c : int
+			The case index.
+		j : int
+			The alt index.
+
+		Returns
+		-------
+		int64
+			The row, or -1 if this case-alt does not appear in `data_ce`.
+		"""
+		cdef:
+			int64_t lo, hi, mid, stop
+
+		if c+1 >= self._array_ce_caseptr.shape[0]:
+			return -1
+		lo = self._array_ce_caseptr[c]
+		hi = stop = self._array_ce_caseptr[c+1]
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if self._array_ce_altpos[mid] < j:
+				lo = mid + 1
+			else:
+				hi = mid
+		if lo < stop and self._array_ce_altpos[lo] == j:
+			return lo
+		return -1
+
+	@cython.boundscheck(False)
+	@cython.initializedcheck(False)
+	@cython.cdivision(True)
+	cdef int _compute_d_utility_onecase_ce(
+			self,
+			int c,
+			l4_float_t[:]   U,
+			l4_float_t[:,:] dU,
+			bint return_dU,
+	) nogil:
+		"""
+		Compute utility and d_utility for only the `data_ce` rows of one case.
+
+		Unlike `_compute_d_utility_onecase`, the output arrays are compact: position
+		`k` refers to row `array_ce_caseptr[c] + k` of `data_ce`, and the alternatives
+		not in `data_ce` for this case are never visited.
+
+		Parameters
+		----------
+		c : int
+			The case index to compute.
+		U : l4_float_t[n_rows]
+			output array, with room for at least as many rows as this case has.
+		dU : l4_float_t[n_rows, n_params]
+			output array, with room for at least as many rows as this case has.
+		return_dU : bool
+			Whether to compute dU, otherwise it is not touched.
+
+		Returns
+		-------
+		int
+			The number of rows for this case.
+		"""
+
+		cdef:
+			int i, k, v, n_rows
+			int altindex
+			int64_t j, row, row0
+			l4_float_t  _temp, _max_U=0
+
+		if not self._is_computational_ready(activate=True):
+			return 0
+
+		row0 = self._array_ce_caseptr[c]
+		n_rows = self._array_ce_caseptr[c+1] - row0
+
+		for k in range(n_rows):
+			U[k] = 0
+			if return_dU:
+				for v in range(dU.shape[1]):
+					dU[k,v] = 0
+
+		for k in range(n_rows):
+			row = row0 + k
+			j = self._array_ce_altpos[row]
+
+			if self._is_available(c, j, row):
+
+				if self.model_quantity_ca_param.shape[0]:
+					for i in range(self.model_quantity_ca_param.shape[0]):
+						_temp = self._array_ce[row, self.model_quantity_ca_data[i]]
+						_temp *= self.model_quantity_ca_param_value[i] * self.model_quantity_ca_param_scale[i]
+						U[k] += _temp
+						if return_dU and not self.model_quantity_ca_param_holdfast[i]:
+							dU[k,self.model_quantity_ca_param[i]] += _temp * self.model_quantity_scale_param_value
+
+					if return_dU:
+						for i in range(self.model_quantity_ca_param.shape[0]):
+							if not self.model_quantity_ca_param_holdfast[i]:
+								dU[k,self.model_quantity_ca_param[i]] /= U[k]
+
+					IF DOUBLE_PRECISION:
+						_temp = log(U[k])
+					ELSE:
+						_temp = logf(U[k])
+					U[k] = _temp * self.model_quantity_scale_param_value
+					if return_dU and (self.model_quantity_scale_param >= 0) and not self.model_quantity_scale_param_holdfast:
+						dU[k,self.model_quantity_scale_param] += _temp
+
+				for i in range(self.model_utility_ca_param.shape[0]):
+					_temp = self._array_ce[row, self.model_utility_ca_data[i]]
+					_temp *= self.model_utility_ca_param_scale[i]
+					U[k] += _temp * self.model_utility_ca_param_value[i]
+					if return_dU and not self.model_utility_ca_param_holdfast[i]:
+						dU[k,self.model_utility_ca_param[i]] += _temp
+
+				if self._array_ce_sampling_correction is not None:
+					U[k] += self._array_ce_sampling_correction[row]
+			else:
+				U[k] = -INFINITY32
+
+		for i in range(self.model_utility_co_alt.shape[0]):
+			altindex = self.model_utility_co_alt[i]
+			row = self._ce_row(c, altindex)
+			if self._is_available(c, altindex, row):
+				k = row - row0
+				if self.model_utility_co_data[i] == -1:
+					U[k] += self.model_utility_co_param_value[i] * self.model_utility_co_param_scale[i]
+					if return_dU and not self.model_utility_co_param_holdfast[i]:
+						dU[k,self.model_utility_co_param[i]] += self.model_utility_co_param_scale[i]
+				else:
+					if self._float32_co:
+						_temp = self._array_co_f32[c, self.model_utility_co_data[i]] * self.model_utility_co_param_scale[i]
+					else:
+						_temp = self._array_co[c, self.model_utility_co_data[i]] * self.model_utility_co_param_scale[i]
+					U[k] += _temp * self.model_utility_co_param_value[i]
+					if return_dU and not self.model_utility_co_param_holdfast[i]:
+						dU[k,self.model_utility_co_param[i]] += _temp
+
+		# Keep exp(U) from generating overflow
+		for k in range(n_rows):
+			if U[k] > _max_U:
+				_max_U = U[k]
+		if _max_U > 500:
+			for k in range(n_rows):
+				U[k] -= _max_U
+
+		return n_rows
+
+
 	@cython.boundscheck(False)
 	@cython.initializedcheck(False)
 	@cython.cdivision(True)
@@ -2076,18 +2766,17 @@ cdef class DataFrames:
 
 			if Q[j]:
 
-				if self._array_ce_reversemap is not None:
-					if c >= self._array_ce_reversemap.shape[0] or j >= self._array_ce_reversemap.shape[1]:
-						row = -1
-					else:
-						row = self._array_ce_reversemap[c,j]
+				if self._array_ce_caseptr is not None:
+					row = self._ce_row(c, j)
 
-				if self._array_av[c,j] and row!=-1:
+				if self._is_available(c, j, row):
 
 					if self.model_quantity_ca_param.shape[0]:
 						for i in range(self.model_quantity_ca_param.shape[0]):
 							if row >= 0:
 								_temp = self._array_ce[row, self.model_quantity_ca_data[i]]
+							elif self._float32_ca:
+								_temp = self._array_ca_f32[c, j, self.model_quantity_ca_data[i]]
 							else:
 								_temp = self._array_ca[c, j, self.model_quantity_ca_data[i]]
 							if _temp:
@@ -2122,18 +2811,17 @@ cdef class DataFrames:
 			l4_float_t  _temp
 			bint result = True
 
-		if self._array_ce_reversemap is not None:
-			if c >= self._array_ce_reversemap.shape[0] or j >= self._array_ce_reversemap.shape[1]:
-				row = -1
-			else:
-				row = self._array_ce_reversemap[c,j]
+		if self._array_ce_caseptr is not None:
+			row = self._ce_row(c, j)
 
-		if self._array_av[c,j] and row!=-1:
+		if self._is_available(c, j, row):
 
 			if self.model_quantity_ca_param.shape[0]:
 				for i in range(self.model_quantity_ca_param.shape[0]):
 					if row >= 0:
 						_temp = self._array_ce[row, self.model_quantity_ca_data[i]]
+					elif self._float32_ca:
+						_temp = self._array_ca_f32[c, j, self.model_quantity_ca_data[i]]
 					else:
 						_temp = self._array_ca[c, j, self.model_quantity_ca_data[i]]
 					if _temp:
@@ -2228,6 +2916,8 @@ cdef class DataFrames:
 			storage_dict['co'] = self.data_co
 		if self.data_wt is not None:
 			storage_dict['wt'] = self.data_wt
+		if self.sampling_correction is not None:
+			storage_dict['sampling_correction'] = self.sampling_correction
 		import joblib
 		return joblib.dump(storage_dict, filename, **kwargs)
 
@@ -2239,7 +2929,9 @@ cdef class DataFrames:
 		Parameters
 		-----------
 		filename: str, pathlib.Path, or file object.
-			The file object or path of the file from which to load the object
+			The file object or path of the file from which to load the object.
+			If this is a directory written by `DataFrames.dump_mmap`, the
+			data is loaded using `DataFrames.load_mmap` instead.
 
 		Returns
 		-------
@@ -2251,11 +2943,204 @@ cdef class DataFrames:
 		DataFrames.dump : function to save a DataFrames
 
 		"""
+		import os
+		if isinstance(filename, (str, os.PathLike)) and os.path.isdir(filename):
+			return cls.load_mmap(filename)
 
 		import joblib
 		storage_dict = joblib.load(filename)
 		return cls(**storage_dict)
 
+	def dump_mmap(self, dirname):
+		"""
+		Persist this DataFrames object into a directory of raw numpy arrays.
+
+		Each data array is written as a separate `.npy` file, along with the
+		index values and a small `metadata.json` file describing the column
+		names and alternatives.  Unlike `dump`, data written this way can be
+		reloaded by `load_mmap` without deserializing or copying the arrays,
+		and several processes loading the same directory share one copy of
+		the data in the operating system's page cache.
+
+		Parameters
+		----------
+		dirname : str or pathlib.Path
+			The directory in which to store the data.  It is created if it
+			does not exist, and existing array files in it are overwritten.
+
+		Returns
+		-------
+		list of str
+			The names of the files written.
+
+		See Also
+		--------
+		DataFrames.load_mmap : corresponding loader
+		"""
+		import os, json
+		os.makedirs(dirname, exist_ok=True)
+		written = []
+
+		def _index_values(idx):
+			arr = numpy.asarray(idx)
+			if arr.dtype.kind not in 'biuf':
+				arr = arr.astype(str)
+			return arr
+
+		def _save(name, arr):
+			filename = os.path.join(dirname, f'{name}.npy')
+			numpy.save(filename, numpy.ascontiguousarray(arr), allow_pickle=False)
+			written.append(filename)
+
+		def _columns(df):
+			return [(c.item() if isinstance(c, numpy.generic) else c) if isinstance(c, (int, float, numpy.number)) else str(c) for c in df.columns]
+
+		metadata = {
+			'format': 'larch.DataFrames',
+			'version': 1,
+			'caseindex_name': self._caseindex_name,
+			'altindex_name': self._altindex_name,
+			'alt_names': None if self._alternative_names is None else [str(i) for i in self._alternative_names],
+			'av_name': self._data_av_name,
+			'ch_name': self._data_ch_name,
+			'wt_name': self._data_wt_name,
+			'frames': {},
+		}
+		_save('caseindex', _index_values(self.caseindex))
+		_save('altcodes', _index_values(self.alternative_codes()))
+		if self.data_co is not None:
+			_save('co', self.data_co.values)
+			metadata['frames']['co'] = _columns(self.data_co)
+		if self.data_ca is not None:
+			_save('ca', self.data_ca.values)
+			metadata['frames']['ca'] = _columns(self.data_ca)
+		if self.data_ce is not None:
+			_save('ce', self.data_ce.values)
+			_save('ce_casecodes', numpy.asarray(self._array_ce_caseindexes, dtype=numpy.int64))
+			_save('ce_altcodes', numpy.asarray(self._array_ce_altpos, dtype=numpy.int64))
+			metadata['frames']['ce'] = _columns(self.data_ce)
+			if self.sampling_correction is not None:
+				_save('sampling_correction', self.sampling_correction.values)
+				metadata['frames']['sampling_correction'] = None
+		for name, df, by_row in (
+				('av', self._data_av, self._array_ce_av is not None),
+				('ch', self._data_ch, self._array_ce_ch is not None),
+		):
+			if df is not None:
+				_save(name, df.values)
+				if by_row:
+					# one value for each row of data_ce
+					metadata['frames'][name] = 'ce'
+				else:
+					# columns are the alternative codes, unless this is wide (i.e. with nests)
+					metadata['frames'][name] = None if df.shape[1] == self.n_alts else _columns(df)
+		if self.data_wt is not None:
+			_save('wt', self.data_wt.values)
+			metadata['frames']['wt'] = _columns(self.data_wt)
+		filename = os.path.join(dirname, 'metadata.json')
+		with open(filename, 'w') as f:
+			json.dump(metadata, f, indent=2)
+		written.append(filename)
+		return written
+
+	@classmethod
+	def load_mmap(cls, dirname, mmap_mode='c'):
+		"""
+		Reconstruct a DataFrames object from a directory written by `DataFrames.dump_mmap`.
+
+		The data arrays are memory-mapped from disk and used directly as the
+		storage of the resulting dataframes, so loading is nearly instantaneous
+		regardless of the size of the data.  A model that loads its data from
+		the result with `load_data` keeps using the mapped idco and idca data,
+		as long as the model needs exactly the stored columns; otherwise the
+		needed columns are computed into new arrays.
+
+		Parameters
+		----------
+		dirname : str or pathlib.Path
+			The directory from which to load the data.
+		mmap_mode : {'c', 'r+'}, default 'c'
+			The memory-map mode for the data arrays.  The default copy-on-write
+			mode shares unmodified pages with other processes and never writes
+			changes back to disk.  Use 'r+' to write changes (e.g. from
+			`autoscale_weights`) through to the files.
+
+		Returns
+		-------
+		DataFrames
+
+		See Also
+		--------
+		DataFrames.dump_mmap : function to save a DataFrames in this format
+		"""
+		import os, json
+		if mmap_mode not in ('c', 'r+'):
+			raise ValueError(f"mmap_mode must be 'c' or 'r+', not {mmap_mode!r}")
+		with open(os.path.join(dirname, 'metadata.json'), 'r') as f:
+			metadata = json.load(f)
+		if metadata.get('format') != 'larch.DataFrames':
+			raise ValueError(f'{dirname} does not contain DataFrames data')
+		frames = metadata['frames']
+
+		def _load(name, mmap=True):
+			return numpy.load(
+				os.path.join(dirname, f'{name}.npy'),
+				mmap_mode=mmap_mode if mmap else None,
+				allow_pickle=False,
+			)
+
+		caseindex = pandas.Index(_load('caseindex', False), name=metadata['caseindex_name'])
+		altcodes = pandas.Index(_load('altcodes', False), name=metadata['altindex_name'])
+		n_cases = len(caseindex)
+		n_alts = len(altcodes)
+
+		storage_dict = {}
+		if 'co' in frames:
+			storage_dict['co'] = pandas.DataFrame(
+				_load('co'), index=caseindex, columns=frames['co'], copy=False,
+			)
+		if 'ca' in frames:
+			storage_dict['ca'] = pandas.DataFrame(
+				_load('ca'),
+				index=pandas.MultiIndex.from_product([caseindex, altcodes]),
+				columns=frames['ca'],
+				copy=False,
+			)
+		if 'ce' in frames:
+			ce_index = pandas.MultiIndex(
+				levels=[caseindex, altcodes],
+				codes=[_load('ce_casecodes', False), _load('ce_altcodes', False)],
+			)
+			storage_dict['ce'] = pandas.DataFrame(
+				_load('ce'), index=ce_index, columns=frames['ce'], copy=False,
+			)
+			if 'sampling_correction' in frames:
+				storage_dict['sampling_correction'] = pandas.Series(
+					_load('sampling_correction'), index=ce_index, name='sampling_correction', copy=False,
+				)
+		for name in ('av', 'ch', 'wt'):
+			if frames.get(name) == 'ce':
+				storage_dict[name] = pandas.DataFrame(
+					_load(name), index=ce_index, columns=[name], copy=False,
+				)
+			elif name in frames:
+				storage_dict[name] = pandas.DataFrame(
+					_load(name),
+					index=caseindex,
+					columns=altcodes if frames[name] is None else frames[name],
+					copy=False,
+				)
+		return cls(
+			**storage_dict,
+			alt_codes=altcodes,
+			alt_names=metadata['alt_names'],
+			av_name=metadata['av_name'],
+			ch_name=metadata['ch_name'],
+			wt_name=metadata['wt_name'],
+			caseindex_name=metadata['caseindex_name'],
+			altindex_name=metadata['altindex_name'],
+		)
+
 
 	def standardize(self, with_mean=True, with_std=True, DataFrames same_as=None):
 		"""
@@ -2312,6 +3197,41 @@ cdef class DataFrames:
 				self._std_scaler_ce.fit(self.data_ce.values, Xmask=mask)
 				self.data_ce.values[:] = self._std_scaler_ce.transform(self.data_ce.values)
 
+	def _extract_weights_from_choices(self):
+		"""
+		Move weights embedded in the choices into `data_wt`.
+
+		For each case where the total of the choices is not 1, the choices
+		are divided by that total and the weight is multiplied by it.
+		"""
+		if self._array_ce_ch is not None:
+			ch = numpy.asarray(self._array_ce_ch)
+			total = numpy.bincount(self._array_ce_caseindexes, weights=ch, minlength=self._n_cases())
+		elif self._array_ch is not None:
+			ch = numpy.asarray(self._array_ch)
+			total = ch.sum(1)
+		else:
+			return
+
+		if not numpy.any((total < 0.99999999) | (total > 1.00000001)):
+			return
+
+		if self._data_wt is None:
+			self.data_wt = pandas.DataFrame(
+				data=1.0,
+				index=self.caseindex,
+				columns=['computed_weight'],
+			)
+			self._data_wt_name = 'computed_weight'
+
+		divisor = numpy.where(total != 0, total, 1)
+		if ch.ndim == 1:
+			ch /= divisor[self._array_ce_caseindexes]
+		else:
+			ch /= divisor[:,None]
+		wt = numpy.asarray(self._array_wt)
+		wt *= total
+
 	def scale_weights(self, scale):
 		"""
 		Scale the weights by a fixed exogenous value.
@@ -2331,36 +3251,10 @@ cdef class DataFrames:
 		scale
 		"""
 
-		cdef int i,j
-		cdef bint need_to_extract_wgt_from_ch = False
-		cdef l4_float_t scale_level, temp
-
-		for i in range(self._array_ch.shape[0]):
-			temp = 0
-			for j in range(self._array_ch.shape[1]):
-				temp += self._array_ch[i,j]
-			if temp < 0.99999999 or temp > 1.00000001:
-				need_to_extract_wgt_from_ch = True
-				break
-
-		if need_to_extract_wgt_from_ch and self._data_wt is None:
-			self.data_wt = pandas.DataFrame(
-				data=1.0,
-				index=self.caseindex,
-				columns=['computed_weight'],
-			)
-			self._data_wt_name = 'computed_weight'
+		cdef int i
+		cdef l4_float_t scale_level
 
-		if need_to_extract_wgt_from_ch:
-			while i < self._array_ch.shape[0]:
-				temp = 0
-				for j in range(self._array_ch.shape[1]):
-					temp += self._array_ch[i,j]
-				if temp != 0:
-					for j in range(self._array_ch.shape[1]):
-						self._array_ch[i,j] /= temp
-				self._array_wt[i] *= temp
-				i += 1
+		self._extract_weights_from_choices()
 
 		if self._data_wt is None and scale == 1.0:
 			return 1.0
@@ -2391,36 +3285,10 @@ cdef class DataFrames:
 		scale
 		"""
 
-		cdef int i,j
-		cdef bint need_to_extract_wgt_from_ch = False
-		cdef l4_float_t scale_level, temp
-
-		for i in range(self._array_ch.shape[0]):
-			temp = 0
-			for j in range(self._array_ch.shape[1]):
-				temp += self._array_ch[i,j]
-			if temp < 0.99999999 or temp > 1.00000001:
-				need_to_extract_wgt_from_ch = True
-				break
-
-		if need_to_extract_wgt_from_ch and self._data_wt is None:
-			self.data_wt = pandas.DataFrame(
-				data=1.0,
-				index=self.caseindex,
-				columns=['computed_weight'],
-			)
-			self._data_wt_name = 'computed_weight'
+		cdef int i
+		cdef l4_float_t scale_level
 
-		if need_to_extract_wgt_from_ch:
-			while i < self._array_ch.shape[0]:
-				temp = 0
-				for j in range(self._array_ch.shape[1]):
-					temp += self._array_ch[i,j]
-				if temp != 0:
-					for j in range(self._array_ch.shape[1]):
-						self._array_ch[i,j] /= temp
-				self._array_wt[i] *= temp
-				i += 1
+		self._extract_weights_from_choices()
 
 		if self._data_wt is None:
 			return 1.0
@@ -2501,6 +3369,82 @@ cdef class DataFrames:
 		m5.dataframes = self
 		return m5
 
+	def _select_cases(self, these_positions, copy=False):
+		"""
+		Create a new DataFrames with a subset of the cases.
+
+		Parameters
+		----------
+		these_positions : array-like[bool] or slice
+			Selects the positions of the cases to keep.
+		copy : bool, default False
+			Make (shallow) copies of the selected data.
+
+		Returns
+		-------
+		DataFrames
+		"""
+		if isinstance(these_positions, slice):
+			_positions = numpy.zeros(self.n_cases, dtype=bool)
+			_positions[these_positions] = True
+			these_positions = _positions
+		else:
+			these_positions = numpy.asarray(these_positions, dtype=bool).reshape(-1)
+		data_co=None if self.data_co is None else self.data_co.iloc[these_positions,:]
+
+		if self.data_ca is None:
+			data_ca = None
+		else:
+			these_positions_2 = numpy.in1d(self.data_ca.index.codes[0], numpy.where(these_positions))
+			data_ca=self.data_ca.iloc[these_positions_2,:]
+		if self.data_ce is None:
+			data_ce = None
+		else:
+			these_positions_2 = numpy.in1d(self.data_ce.index.codes[0], numpy.where(these_positions))
+			data_ce=self.data_ce.iloc[these_positions_2,:]
+			data_ce.index = remove_unused_level(data_ce.index, 0)
+		if self.sampling_correction is None:
+			sampling_correction = None
+		else:
+			sampling_correction = self.sampling_correction.iloc[these_positions_2].copy()
+			sampling_correction.index = data_ce.index
+
+		if self._array_ce_av is not None:
+			data_av = self._data_av.iloc[these_positions_2,:]
+			data_av.index = data_ce.index
+		else:
+			data_av=None if self.data_av is None else self.data_av.iloc[these_positions,:]
+		if self._array_ce_ch is not None:
+			data_ch = self._data_ch.iloc[these_positions_2,:]
+			data_ch.index = data_ce.index
+		else:
+			data_ch=None if self.data_ch is None else self.data_ch.iloc[these_positions,:]
+		data_wt=None if self.data_wt is None else self.data_wt.iloc[these_positions,:]
+
+		if copy:
+			data_co=None if data_co is None else data_co.copy(deep=False)
+			data_ca=None if data_ca is None else data_ca.copy(deep=False)
+			data_ce=None if data_ce is None else data_ce.copy(deep=False)
+			data_av=None if data_av is None else data_av.copy(deep=False)
+			data_ch=None if data_ch is None else data_ch.copy(deep=False)
+			data_wt=None if data_wt is None else data_wt.copy(deep=False)
+
+		return self.__class__(
+			data_co=data_co,
+			data_ca=data_ca,
+			data_ce=data_ce,
+			data_av=data_av,
+			data_ch=data_ch,
+			data_wt=data_wt,
+			alt_names = self.alternative_names(),
+			alt_codes = self.alternative_codes(),
+			sys_alts=self.sys_alts,
+			ch_name=self._data_ch_name,
+			wt_name=self._data_wt_name,
+			av_name=self._data_av_name,
+			sampling_correction=sampling_correction,
+		)
+
 	def split(self, splits, method='simple'):
 		"""
 		Generate a train/test or similar multi-part split of the data.
@@ -2554,53 +3498,179 @@ cdef class DataFrames:
 			for s in range(n_splits):
 				logger.debug(f'  split {s} data prep')
 				these_positions = membership[:,s].reshape(-1)
-				data_co=None if self.data_co is None else self.data_co.iloc[these_positions,:]
-
-				if self.data_ca is None:
-					data_ca = None
-				else:
-					these_positions_2 = numpy.in1d(self.data_ca.index.codes[0], numpy.where(these_positions))
-					data_ca=self.data_ca.iloc[these_positions_2,:]
-				if self.data_ce is None:
-					data_ce = None
-				else:
-					these_positions_2 = numpy.in1d(self.data_ce.index.codes[0], numpy.where(these_positions))
-					data_ce=self.data_ce.iloc[these_positions_2,:]
-					data_ce.index = remove_unused_level(data_ce.index, 0)
-
-				data_av=None if self.data_av is None else self.data_av.iloc[these_positions,:]
-				data_ch=None if self.data_ch is None else self.data_ch.iloc[these_positions,:]
-				data_wt=None if self.data_wt is None else self.data_wt.iloc[these_positions,:]
-
-				if method == 'copy':
-					data_co=None if data_co is None else data_co.copy(deep=False)
-					data_ca=None if data_ca is None else data_ca.copy(deep=False)
-					data_ce=None if data_ce is None else data_ce.copy(deep=False)
-					data_av=None if data_av is None else data_av.copy(deep=False)
-					data_ch=None if data_ch is None else data_ch.copy(deep=False)
-					data_wt=None if data_wt is None else data_wt.copy(deep=False)
-
-				logger.debug(f'  split {s} factory')
-				result.append(self.__class__(
-					data_co=data_co,
-					data_ca=data_ca,
-					data_ce=data_ce,
-					data_av=data_av,
-					data_ch=data_ch,
-					data_wt=data_wt,
-					alt_names = self.alternative_names(),
-					alt_codes = self.alternative_codes(),
-					sys_alts=self.sys_alts,
-					ch_name=self._data_ch_name,
-					wt_name=self._data_wt_name,
-					av_name=self._data_av_name,
-				))
+				result.append(self._select_cases(these_positions, copy=(method == 'copy')))
 			logger.debug(f'done splitting dataframe {splits}')
 			return result
 		except:
 			logger.exception('error in DataFrames.split')
 			raise
 
+	def sample_alternatives(self, n_samples, importance=None, *, seed=None, replace=True):
+		"""
+		Draw a sample of alternatives for each case, creating new idce DataFrames.
+
+		For models with a very large number of alternatives (e.g. destination
+		choice over many zones) estimation on the full choice set can be
+		infeasible.  This method draws a random subset of the available
+		alternatives for each case, always including the chosen alternative,
+		and stores the result in the compact `idce` layout.  The sampling
+		correction for each sampled alternative is stored as the
+		`sampling_correction` of the result, and is added to the utility
+		of that alternative when computing the log likelihood, for both MNL
+		and NL models.
+
+		Parameters
+		----------
+		n_samples : int
+			The number of alternatives to draw for each case.  The chosen
+			alternative is added to the sample, so each case can have up
+			to `n_samples` + 1 alternatives in the result.
+		importance : str, array-like, pandas.Series or pandas.DataFrame, optional
+			Relative sampling weights, which need not be normalized. Give the
+			name of a column in `data_ca` or `data_ce` (e.g. a size term or a
+			distance decay term), a Series or 1-d array with one value per
+			alternative, or a DataFrame or 2-d array with one row per case and
+			one column per alternative.  If not given, alternatives are
+			sampled uniformly from the available alternatives.
+		seed : int, optional
+			A seed for the random number generator.
+		replace : bool, default True
+			Whether to draw with replacement.  When drawing with replacement, the
+			correction for alternative `j` is `log(k_j/(K q_j))`, where `q_j` is
+			its sampling probability and `k_j` is the number of times it appears
+			in the sample of size `K` (counting the chosen alternative once more).
+			Otherwise, `n_samples` distinct alternatives are drawn, the chosen
+			alternative is added if it was not drawn, and the correction is
+			`-log(pi_j)`, where `pi_j` is the probability that alternative `j`
+			is in the sample.  This is approximated by `1-(1-q_j)^K`, the exact
+			inclusion probability for `K` draws with replacement, and the same
+			approximation is used for the chosen alternative as for the others.
+			When the draws exhaust the alternatives with nonzero `q_j`, every
+			one is in the sample, so `pi_j` is 1 and the correction is zero.
+
+		Returns
+		-------
+		DataFrames
+		"""
+		try:
+			if self.data_ch is None:
+				raise ValueError('sampling alternatives requires data_ch')
+			if self.data_ca is None and self.data_ce is None:
+				raise ValueError('sampling alternatives requires data_ca or data_ce')
+
+			n_cases = self.n_cases
+			n_alts = self.n_alts
+			if self.data_av is None:
+				av = numpy.ones([n_cases, n_alts], dtype=bool)
+			else:
+				av = self.data_av.values.astype(bool)
+			ch = self.data_ch.values
+
+			if self.data_ce is not None:
+				source = self.data_ce
+				source_key = (
+					numpy.asarray(self._array_ce_caseindexes, dtype=numpy.int64) * n_alts
+					+ numpy.asarray(self._array_ce_altpos)
+				)
+			else:
+				source = self.data_ca
+				source_key = None
+
+			# resolve the importance weights, by source row, by alt, or by case-alt
+			w_rows = w_alts = w_case_alts = None
+			if importance is None:
+				w_alts = numpy.ones(n_alts)
+			elif isinstance(importance, str):
+				if importance not in source.columns:
+					raise KeyError(f'importance column {importance!r} not found in {"data_ce" if source_key is not None else "data_ca"}')
+				w_rows = source[importance].values.astype(numpy.float64)
+			elif isinstance(importance, pandas.Series):
+				w_alts = importance.reindex(self.alternative_codes()).fillna(0).values.astype(numpy.float64)
+			elif isinstance(importance, pandas.DataFrame):
+				w_case_alts = importance.reindex(
+					index=self.caseindex, columns=self.alternative_codes(),
+				).fillna(0).values.astype(numpy.float64)
+			else:
+				importance = numpy.asarray(importance, dtype=numpy.float64)
+				if importance.shape == (n_alts,):
+					w_alts = importance
+				elif importance.shape == (n_cases, n_alts):
+					w_case_alts = importance
+				else:
+					raise ValueError(f'importance has shape {importance.shape}, expected ({n_alts},) or ({n_cases}, {n_alts})')
+
+			rng = numpy.random.default_rng(seed)
+			sample_rows = []
+			sample_correction = []
+			for c in range(n_cases):
+				alts = numpy.flatnonzero(av[c])
+				if source_key is None:
+					rows = c * n_alts + alts
+				else:
+					rows = numpy.searchsorted(source_key, c * n_alts + alts)
+					found = (rows < len(source_key))
+					found[found] = (source_key[rows[found]] == c * n_alts + alts[found])
+					alts = alts[found]
+					rows = rows[found]
+				if len(alts) == 0:
+					continue
+				if w_rows is not None:
+					w = w_rows[rows]
+				elif w_alts is not None:
+					w = w_alts[alts]
+				else:
+					w = w_case_alts[c, alts]
+				if numpy.any(w < 0) or not numpy.isfinite(w).all() or w.sum() <= 0:
+					raise ValueError(f'invalid importance weights for case {self.caseindex[c]}')
+				q = w / w.sum()
+				chosen = numpy.flatnonzero(ch[c, alts] > 0)
+				if numpy.any(q[chosen] <= 0):
+					raise ValueError(f'chosen alternative has zero sampling probability for case {self.caseindex[c]}')
+				if replace:
+					counts = numpy.bincount(
+						rng.choice(len(alts), size=n_samples, p=q),
+						minlength=len(alts),
+					).astype(numpy.float64)
+					counts[chosen] += 1
+					keep = numpy.flatnonzero(counts)
+					correction = numpy.log(counts[keep] / (n_samples * q[keep]))
+				else:
+					n_draws = min(n_samples, numpy.count_nonzero(q))
+					draws = rng.choice(len(alts), size=n_draws, replace=False, p=q)
+					keep = numpy.union1d(draws, chosen)
+					if n_draws == numpy.count_nonzero(q):
+						correction = numpy.zeros(len(keep))
+					else:
+						correction = -numpy.log(1 - (1 - q[keep]) ** n_draws)
+				sample_rows.append(rows[keep])
+				sample_correction.append(correction)
+
+			data_ce = source.iloc[numpy.concatenate(sample_rows)]
+			sampling_correction = pandas.Series(
+				numpy.concatenate(sample_correction),
+				index=data_ce.index,
+				name='sampling_correction',
+			)
+
+			return self.__class__(
+				data_co=self.data_co,
+				data_ce=data_ce,
+				data_ch=self.data_ch,
+				data_wt=self.data_wt,
+				alt_names=self.alternative_names(),
+				alt_codes=self.alternative_codes(),
+				sys_alts=self.sys_alts,
+				ch_name=self._data_ch_name,
+				wt_name=self._data_wt_name,
+				av_name=self._data_av_name,
+				caseindex_name=self._caseindex_name,
+				altindex_name=self._altindex_name,
+				sampling_correction=sampling_correction,
+			)
+		except:
+			logger.exception('error in DataFrames.sample_alternatives')
+			raise
+
 	def make_idca(self, *columns, selector=None, float_dtype=numpy.float64):
 		"""
 		Extract a set of idca values into a new dataframe.
@@ -2744,11 +3814,17 @@ cdef class DataFrames:
 			'choice_ca', 'choice_co', 'choice_co_code', 'weight_co', 'avail_ca',
 			'avail_co', 'standardize'}. Other keys are silently ignored.
 		selector : array-like[bool] or slice, optional
-			If given, the selector filters the cases. This argument can only be given
-			as a keyword argument.
+			If given, the selector filters the cases, by position.  Only the selected
+			cases are read, so a contiguous slice of memory-mapped data (see
+			`load_mmap`) is loaded without touching the rest of the file.
+			This argument can only be given as a keyword argument.
 		float_dtype : dtype, default float64
-			The dtype to use for all float-type arrays.  Note that the availability
-			arrays are always returned as int8 regardless of the float type.
+			The dtype to use for the idca and idco data arrays.  Setting this to
+			float32 halves the memory used by the data, which is then kept in single
+			precision for computation, although the log likelihood and its derivatives
+			are still accumulated in double precision.  Note that the availability
+			arrays are always returned as int8, and the choice and weight arrays
+			as double precision, regardless of the float type.
 			This argument can only be given
 			as a keyword argument.
 		log_warnings : bool, default True
@@ -2767,14 +3843,26 @@ cdef class DataFrames:
 		"""
 
 		if selector is not None:
-			raise NotImplementedError
+			subset = self._select_cases(selector)
+			subset.weight_normalization = self._weight_normalization
+			return subset.make_dataframes(
+				req_data,
+				float_dtype=float_dtype,
+				log_warnings=log_warnings,
+				explicit=explicit,
+			)
 
 		if isinstance(req_data, str):
 			from .util import Dict
 			import textwrap
 			req_data = Dict.load(textwrap.dedent(req_data))
 
-		if 'ca' in req_data:
+		# frames are shared with this DataFrames unless standardizing, which alters them
+		reuse = not req_data.get('standardize', False)
+
+		if 'ca' in req_data and reuse and _reusable_columns(self._data_ca_or_ce, req_data['ca'], float_dtype):
+			df_ca = self._data_ca_or_ce
+		elif 'ca' in req_data:
 			df_ca = columnize(
 				self._data_ca_or_ce,
 				list(req_data['ca']),
@@ -2785,7 +3873,9 @@ cdef class DataFrames:
 		else:
 			df_ca = None
 
-		if 'co' in req_data:
+		if 'co' in req_data and reuse and _reusable_columns(self._data_co, req_data['co'], float_dtype):
+			df_co = self._data_co
+		elif 'co' in req_data:
 			df_co = columnize(
 				self._data_co,
 				list(req_data['co']),
@@ -2801,14 +3891,14 @@ cdef class DataFrames:
 				df_ch = self._data_ch
 			else:
 				try:
-					df_ch = columnize(self._data_ca_or_ce, [name_ch], inplace=False, dtype=float_dtype)
+					df_ch = columnize(self._data_ca_or_ce, [name_ch], inplace=False, dtype=l4_float_dtype)
 				except NameError:
 					df_ch = self._data_ch
 		elif 'choice_co' in req_data:
 			alts = self.alternative_codes()
 			cols = [req_data['choice_co'].get(a, '0') for a in alts]
 			try:
-				df_ch = columnize(self._data_co, cols, inplace=False, dtype=float_dtype)
+				df_ch = columnize(self._data_co, cols, inplace=False, dtype=l4_float_dtype)
 			except NameError:
 				df_ch = self._data_ch
 			else:
@@ -2819,10 +3909,10 @@ cdef class DataFrames:
 				0,
 				columns=self.alternative_codes(),
 				index=self._data_co.index,
-				dtype=float_dtype,
+				dtype=l4_float_dtype,
 			)
 			for c in df_ch.columns:
-				df_ch.loc[:,c] = (choicecodes==c).astype(float_dtype)
+				df_ch.loc[:,c] = (choicecodes==c).astype(l4_float_dtype)
 		elif self._data_ch is not None and not explicit:
 			if log_warnings:
 				logger.warning('req_data does not request {choice_ca,choice_co,choice_co_code} but '
@@ -2835,7 +3925,7 @@ cdef class DataFrames:
 
 		if 'weight_co' in req_data:
 			try:
-				df_wt = columnize(self._data_co, [req_data['weight_co']], inplace=False, dtype=float_dtype)
+				df_wt = columnize(self._data_co, [req_data['weight_co']], inplace=False, dtype=l4_float_dtype)
 			except NameError:
 				df_wt = self._data_wt
 				weight_normalization = self._weight_normalization
@@ -72,7 +72,117 @@ def _approx_fprime_helper_trailing(xk, f, epsilon, args=(), f0=None):
 	return grad
 
 
-def approx_fprime(xk, f, epsilon=None, trailing=False, *args, status_widget=None):
+# The function being differentiated by `_approx_fprime_helper_parallel`.  It is set
+# before the worker processes are forked, so that the function (and any model
+# and data it references) is inherited by the workers and never pickled.
+_parallel_fprime_function = None
+
+
+def _parallel_fprime_worker(x):
+	return numpy.nan_to_num(numpy.asarray(_parallel_fprime_function(x), dtype=float))
+
+
+def _approx_fprime_helper_parallel(
+		xk, f, epsilon, args=(), f0=None, *,
+		central=False, n_jobs=-1, status_widget=None, worker_initializer=None,
+):
+	"""
+	See ``approx_fprime``.  The perturbed function values are evaluated concurrently.
+
+	Each perturbation is evaluated in a worker process forked from the current
+	process, so the data arrays referenced by `f` are shared with the workers
+	(copy-on-write) rather than copied.  If forking is not available on this
+	platform, or only one job is requested, the evaluations are run serially.
+	If given, `worker_initializer` is called without arguments in each
+	worker process, e.g. to limit the threads used by `f` there.
+	"""
+	global _parallel_fprime_function
+	import multiprocessing
+	xk = numpy.asarray(xk, dtype=float)
+	epsilon = numpy.broadcast_to(numpy.asarray(epsilon, dtype=float), xk.shape)
+	if args:
+		func = lambda x: f(x, *args)
+	else:
+		func = f
+
+	points = []
+	for k in range(len(xk)):
+		d = numpy.zeros_like(xk)
+		d[k] = epsilon[k]
+		points.append(xk + d)
+		if central:
+			points.append(xk - d)
+	if not central and f0 is None:
+		points.append(xk)
+
+	if n_jobs is None or n_jobs <= 0:
+		n_jobs = multiprocessing.cpu_count()
+	n_jobs = min(n_jobs, len(points))
+	try:
+		context = multiprocessing.get_context('fork')
+	except ValueError:
+		context = None
+
+	values = []
+	if context is None or n_jobs <= 1:
+		for x in points:
+			values.append(numpy.nan_to_num(numpy.asarray(func(x), dtype=float)))
+			if status_widget:
+				status_widget("{} / {}".format(len(values), len(points)))
+	else:
+		_parallel_fprime_function = func
+		try:
+			if worker_initializer is None:
+				pool = context.Pool(n_jobs)
+			else:
+				pool = context.Pool(n_jobs, initializer=worker_initializer)
+			with pool:
+				for v in pool.imap(_parallel_fprime_worker, points):
+					values.append(v)
+					if status_widget:
+						status_widget("{} / {}".format(len(values), len(points)))
+		finally:
+			_parallel_fprime_function = None
+
+	if central:
+		grad = numpy.stack([
+			(values[2*k] - values[2*k+1]) / (2*epsilon[k])
+			for k in range(len(xk))
+		])
+	else:
+		if f0 is None:
+			f0 = values[-1]
+		f0 = numpy.nan_to_num(numpy.asarray(f0, dtype=float))
+		grad = numpy.stack([
+			(values[k] - f0) / epsilon[k]
+			for k in range(len(xk))
+		])
+	return grad
+
+
+def adaptive_epsilon(xk, central=False):
+	"""
+	Step sizes for finite differences, scaled to the magnitude of each element of `xk`.
+
+	The step is ``h * max(|xk[i]|, 1)``, where `h` is the square root of machine
+	epsilon for forward differences, or the cube root for central differences,
+	which approximately balances truncation and rounding error in each case.
+
+	Parameters
+	----------
+	xk : array_like
+	central : bool, default False
+
+	Returns
+	-------
+	ndarray
+	"""
+	xk = numpy.asarray(xk, dtype=float)
+	h = numpy.finfo(float).eps ** (1/3 if central else 1/2)
+	return h * numpy.fmax(numpy.fabs(xk), 1.0)
+
+
+def approx_fprime(xk, f, epsilon=None, trailing=False, *args, status_widget=None, central=False, n_jobs=1, worker_initializer=None):
 	"""Finite-difference approximation of the gradient of a scalar function.
 
 	Parameters
@@ -88,9 +198,22 @@ def approx_fprime(xk, f, epsilon=None, trailing=False, *args, status_widget=None
 	    Increment to `xk` to use for determining the function gradient.
 	    If a scalar, uses the same finite difference delta for all partial
 	    derivatives.  If an array, should contain one value per element of
-	    `xk`.
+	    `xk`.  If 'adaptive', the step for each element is scaled to its
+	    magnitude, see `adaptive_epsilon`.
 	\\*args : args, optional
 	    Any other arguments that are to be passed to `f`.
+	central : bool, default False
+	    Use central differences instead of forward differences.  This
+	    doubles the number of function evaluations but is more accurate.
+	n_jobs : int, default 1
+	    The number of worker processes used to evaluate the perturbed
+	    function values concurrently.  Set to -1 to use all available cores.
+	    Not compatible with `trailing`.
+	worker_initializer : callable, optional
+	    Called without arguments in each worker process, before any
+	    function values are evaluated there.  Use this to limit the threads
+	    used by `f` in each worker, e.g. to a single thread, as OpenMP
+	    thread pools do not survive the fork.
 
 	Returns
 	-------
@@ -116,8 +239,17 @@ def approx_fprime(xk, f, epsilon=None, trailing=False, *args, status_widget=None
 	"""
 	if epsilon is None:
 		epsilon = numpy.sqrt(numpy.finfo(float).eps)
+	elif isinstance(epsilon, str) and epsilon == 'adaptive':
+		epsilon = adaptive_epsilon(xk, central=central)
 	if trailing:
+		if central or n_jobs != 1:
+			raise NotImplementedError('central and parallel differences are not implemented for trailing')
 		return _approx_fprime_helper_trailing(xk, f, epsilon, args=args)
+	elif central or n_jobs != 1:
+		return _approx_fprime_helper_parallel(
+			xk, f, epsilon, args=args, central=central, n_jobs=n_jobs, status_widget=status_widget,
+			worker_initializer=worker_initializer,
+		)
 	else:
 		return _approx_fprime_helper(xk, f, epsilon, args=args, status_widget=status_widget)
 
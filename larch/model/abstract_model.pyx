@@ -15,6 +15,29 @@ from ..log import logger_name
 logger = logging.getLogger(logger_name+'.model')
 
 
+class _MultistartDominated(Exception):
+	"""Raised to stop a multistart run that is dominated by the best run so far."""
+
+
+# The model whose methods are run by `_run_in_forked_workers`, and the
+# arguments shared by every task.  The workers are forked from the process
+# that owns the model, so they find these here and share the data arrays
+# (copy-on-write) instead of receiving copies.
+_forked_model = None
+_forked_shared = ()
+
+
+def _forked_initializer(shared):
+	global _forked_shared
+	_forked_shared = shared
+	_forked_model._use_single_thread()
+
+
+def _forked_worker(args):
+	method, task = args
+	return getattr(_forked_model, method)(*_forked_shared, *task)
+
+
 cdef class AbstractChoiceModel(ParameterFrame):
 
 	def __init__(
@@ -395,17 +418,281 @@ cdef class AbstractChoiceModel(ParameterFrame):
 
 		return current_ll, tolerance, iter, numpy.asarray(steps), message
 
+	def maximize_loglike_stochastic(
+			self,
+			method='bhhh',
+			*,
+			batch_size=None,
+			n_batches=10,
+			epochs=5,
+			steplen=None,
+			seed=None,
+			polish=True,
+			polish_method=None,
+			polish_maxiter=None,
+			callback=None,
+			quiet=True,
+			leave_out=-1,
+			keep_only=-1,
+			subsample=-1,
+	):
+		"""
+		Maximize the log likelihood with a stochastic optimizer over blocks of cases.
+
+		The cases are divided into interleaved blocks, and each epoch visits
+		every block once, in a freshly shuffled order.  With `n` blocks,
+		block `b` holds every `n`-th case starting from case `b` (via the
+		`start_case` and `step_case` striding of `loglike2_bhhh`), so each
+		block spans the whole data set and the cases need not be shuffled
+		beforehand.  Each step uses only the cases in one block, so early
+		progress costs a fraction of a full pass over the data.  After the
+		stochastic epochs, the estimate is by default polished with a
+		full-data `maximize_loglike`.
+
+		This method is not available for a `ModelGroup`, which does not
+		support computing on a subset of cases.
+
+		Parameters
+		----------
+		method : {'bhhh', 'adam', 'svrg'}
+			The stochastic step to use.
+
+			- 'bhhh': minibatch BHHH, stepping along the gradient of one
+			  block, preconditioned by a running average of the per-case
+			  BHHH matrix over recent blocks.  The step length decays as
+			  `steplen / (1 + epoch)`, and is halved as needed until the
+			  step improves the log likelihood of that block.
+			- 'adam': Adam on the block gradient, with learning rate
+			  `steplen`.
+			- 'svrg': stochastic variance reduced gradient.  At the start
+			  of each epoch the full-data gradient and BHHH matrix are
+			  computed at a snapshot point.  Each step corrects the full
+			  gradient at the snapshot by the change in the block gradient
+			  since the snapshot, and moves along that corrected gradient
+			  preconditioned by the snapshot BHHH matrix.
+		batch_size : int, optional
+			The (approximate) number of cases in each block.  If not given,
+			the cases are split into `n_batches` blocks.
+		n_batches : int, default 10
+			The number of blocks, used if `batch_size` is not given.
+		epochs : int, default 5
+			The number of passes through all the blocks.
+		steplen : float, optional
+			The (initial) step length.  Defaults to 1.0 for 'bhhh', 0.5
+			for 'svrg', and 0.01 for 'adam'.
+		seed : int, optional
+			Seed for the random shuffling of blocks.
+		polish : bool, default True
+			Whether to finish with a full-data `maximize_loglike`.
+		polish_method : str, optional
+			The method for the polishing phase, see `maximize_loglike`.
+		polish_maxiter : int, optional
+			Maximum number of iterations for the polishing phase.
+		callback : callable, optional
+			Called with the current parameter values after each step.
+		quiet : bool, default True
+			Whether to suppress the dashboard during the polishing phase.
+		leave_out, keep_only, subsample : int, optional
+			Settings for cross validation subsampling, passed through to
+			all log likelihood computations.  Blocks left with no cases by
+			the subsampling are skipped.
+
+		Returns
+		-------
+		dictx
+			The results, including final log likelihood, parameter values,
+			and a `stochastic_history` DataFrame giving the full-data log
+			likelihood at the end of each epoch.  The number of steps
+			attempted (one per block per epoch) is given by
+			`stochastic_steps`, and the number of those rejected because
+			no shorter BHHH step improved the block log likelihood by
+			`stochastic_rejected_steps`.  When `polish` is True,
+			this is the result from `maximize_loglike`, with the stochastic
+			phase recorded in addition.
+		"""
+		try:
+			from ..util.timesize import Timer
+			from ..util import dictx
+
+			if self.dataframes is None:
+				raise ValueError("you must load data first -- try Model.load_data()")
+
+			method = method.lower()
+			if method not in ('bhhh', 'adam', 'svrg'):
+				raise ValueError(f"unknown stochastic method {method!r}")
+			if steplen is None:
+				steplen = {'bhhh': 1.0, 'svrg': 0.5, 'adam': 0.01}[method]
+
+			timer = Timer()
+			n_cases = self.n_cases
+			if batch_size is None:
+				batch_size = n_cases // n_batches + (1 if n_cases % n_batches else 0)
+			batch_size = max(int(batch_size), 1)
+			n_blocks = n_cases // batch_size + (1 if n_cases % batch_size else 0)
+			in_use = numpy.ones(n_cases, dtype=bool)
+			if subsample > 0:
+				if leave_out >= 0:
+					in_use &= (numpy.arange(n_cases) % subsample) != leave_out
+				if keep_only >= 0:
+					in_use &= (numpy.arange(n_cases) % subsample) == keep_only
+			# each block is a (start_case, number of cases used) pair
+			blocks = [
+				(b, int(in_use[b::n_blocks].sum()))
+				for b in range(n_blocks)
+			]
+			blocks = [(b, n) for b, n in blocks if n > 0]
+			n_in_use = int(in_use.sum())
+			rng = numpy.random.default_rng(seed)
+
+			subsample_kwargs = dict(leave_out=leave_out, keep_only=keep_only, subsample=subsample)
+			free = (self.pf['holdfast'].values == 0).astype(numpy.float64)
+			lower = self.pf['minimum'].values
+			upper = self.pf['maximum'].values
+
+			def _move(x):
+				x = numpy.clip(x, lower, upper)
+				self.set_values(x)
+				if callback is not None:
+					callback(x)
+				return x
+
+			x = self.pvals.copy()
+			adam_m = numpy.zeros_like(x)
+			adam_v = numpy.zeros_like(x)
+			adam_t = 0
+			bhhh_t = 0
+			bhhh_avg = None
+			history = [(0, self.loglike(**subsample_kwargs))]
+			n_steps = 0
+			n_rejected = 0
+
+			for epoch in range(epochs):
+				order = rng.permutation(len(blocks))
+
+				if method == 'svrg':
+					snapshot = x.copy()
+					snap_ll, snap_dll, snap_bhhh = self._loglike2_bhhh_tuple(**subsample_kwargs)
+					snap_dll = numpy.asarray(snap_dll)
+					snap_bhhh_inv = self._free_slots_inverse_matrix(snap_bhhh)
+
+				for b in order:
+					start_case, block_n = blocks[b]
+					block_kwargs = dict(start_case=start_case, stop_case=n_cases, step_case=n_blocks)
+					if method == 'bhhh':
+						block_ll, dll, bhhh = self._loglike2_bhhh_tuple(
+							**block_kwargs, **subsample_kwargs,
+						)
+						# precondition with a running average of the per-case BHHH
+						# matrix, which is much less noisy than any single block
+						bhhh = numpy.asarray(bhhh) / block_n
+						bhhh_t += 1
+						bhhh_avg = bhhh if bhhh_t == 1 else bhhh_avg + (bhhh - bhhh_avg) / min(bhhh_t, len(blocks))
+						direction = numpy.dot(
+							numpy.asarray(dll) / block_n,
+							self._free_slots_inverse_matrix(bhhh_avg),
+						)
+						step = steplen / (1 + epoch)
+						# backtrack on this block only, as `simple_step_bhhh` does on all cases
+						for _ in range(8):
+							trial = numpy.clip(x + direction * step, lower, upper)
+							if self.loglike(
+									trial, **block_kwargs, **subsample_kwargs,
+							) > block_ll:
+								x = _move(trial)
+								break
+							step *= 0.5
+						else:
+							self.set_values(x)
+							n_rejected += 1
+					elif method == 'adam':
+						dll = self.loglike2(
+							**block_kwargs, **subsample_kwargs,
+						).dll
+						g = numpy.asarray(dll) * free / block_n
+						adam_t += 1
+						adam_m = 0.9 * adam_m + 0.1 * g
+						adam_v = 0.999 * adam_v + 0.001 * g * g
+						m_hat = adam_m / (1 - 0.9 ** adam_t)
+						v_hat = adam_v / (1 - 0.999 ** adam_t)
+						x = _move(x + steplen * m_hat / (numpy.sqrt(v_hat) + 1e-8))
+					else: # svrg
+						dll_x = numpy.asarray(self.loglike2(
+							**block_kwargs, **subsample_kwargs,
+						).dll)
+						dll_snap = numpy.asarray(self.loglike2(
+							x=snapshot, **block_kwargs, **subsample_kwargs,
+						).dll)
+						self.set_values(x)
+						g = snap_dll + (dll_x - dll_snap) * (n_in_use / block_n)
+						x = _move(x + steplen * numpy.dot(g, snap_bhhh_inv))
+					n_steps += 1
+
+				history.append((epoch + 1, self.loglike(**subsample_kwargs)))
+
+			timer.stop()
+			stochastic_history = pandas.DataFrame.from_records(history, columns=['epoch', 'loglike']).set_index('epoch')
+			method_used = f"stochastic-{method}"
+
+			if polish:
+				result = self.maximize_loglike(
+					method=polish_method,
+					quiet=quiet,
+					maxiter=polish_maxiter,
+					**subsample_kwargs,
+				)
+				result['method'] = f"{method_used}|{result.get('method', '')}"
+				if 'elapsed_time' in result:
+					result['elapsed_time'] += timer.elapsed()
+			else:
+				result = dictx(
+					loglike=history[-1][1],
+					x=pandas.Series(self.pvals, index=self.pnames),
+					elapsed_time=timer.elapsed(),
+					method=method_used,
+					n_cases=n_cases,
+					logloss=-history[-1][1] / self.total_weight(),
+				)
+				self._most_recent_estimation_result = result
+			result['stochastic_history'] = stochastic_history
+			result['stochastic_steps'] = n_steps
+			result['stochastic_rejected_steps'] = n_rejected
+			result['stochastic_elapsed_time'] = timer.elapsed()
+			return result
+		except:
+			logger.exception("error in maximize_loglike_stochastic")
+			raise
+
 	def _bhhh_direction_and_convergence_tolerance(self, *args):
 		bhhh_inv = self._free_slots_inverse_matrix(self.bhhh(*args))
 		_1 = self.d_loglike(*args)
 		direction = numpy.dot(_1, bhhh_inv)
 		return direction, numpy.dot(direction, _1)
 
-	def loglike3(self, x=None, **kwargs):
+	def _use_single_thread(self):
+		# Called in forked worker processes.  The GNU OpenMP thread pool does
+		# not survive the fork, so a parallel region with more than one thread
+		# hangs in a worker once the parent process has used such a region.
+		self.n_threads = 1
+
+	def loglike3(self, x=None, *, n_jobs=1, central=False, **kwargs):
 		"""
-		Compute a log likelihood value, it first derivative, and the finite-difference approximation of the Hessian.
+		Compute a log likelihood value, it first derivative, and the Hessian.
 
-		See :ref:`loglike2` for a description of arguments.
+		If the underlying computation of `loglike2` provides an analytic Hessian
+		(as 'd2ll' in its result) that is used, otherwise the finite-difference
+		approximation of the Hessian is computed from `d_loglike`.
+
+		See :ref:`loglike2` for a description of other arguments.
+
+		Parameters
+		----------
+		n_jobs : int, default 1
+			The number of worker processes used to evaluate the perturbed
+			gradients of a finite-difference Hessian concurrently.  Set
+			to -1 to use all available cores.
+		central : bool, default False
+			Use central differences with adaptive step sizes for a
+			finite-difference Hessian, instead of forward differences.
 
 		Returns
 		-------
@@ -415,8 +702,21 @@ cdef class AbstractChoiceModel(ParameterFrame):
 
 		"""
 		part = self.loglike2(x=x, **kwargs)
-		from ..math.optimize import approx_fprime
-		part['d2ll'] = approx_fprime(self.pvals, lambda y: self.d_loglike(y, **kwargs))
+		if 'd2ll' not in part:
+			from ..math.optimize import approx_fprime
+			d_kwargs = {k: v for k, v in kwargs.items() if k != 'persist'}
+			pvals = self.pvals
+			try:
+				part['d2ll'] = approx_fprime(
+					pvals,
+					lambda y: self.d_loglike(y, **d_kwargs),
+					epsilon='adaptive' if central else None,
+					central=central,
+					n_jobs=n_jobs,
+					worker_initializer=self._use_single_thread,
+				)
+			finally:
+				self.set_values(pvals)
 		return part
 
 	def neg_loglike2(self, x=None, start_case=0, stop_case=-1, step_case=1, leave_out=-1, keep_only=-1, subsample=-1):
@@ -514,9 +814,12 @@ cdef class AbstractChoiceModel(ParameterFrame):
 		return self.loglike2(x,start_case=start_case,stop_case=stop_case,step_case=step_case,
 							 leave_out=leave_out, keep_only=keep_only, subsample=subsample,).dll
 
-	def d2_loglike(self, x=None, *, start_case=0, stop_case=-1, step_case=1, leave_out=-1, keep_only=-1, subsample=-1,):
+	def d2_loglike(self, x=None, *, start_case=0, stop_case=-1, step_case=1, leave_out=-1, keep_only=-1, subsample=-1, n_jobs=1, central=False,):
 		"""
-		Compute the (approximate) second derivative of log likelihood with respect to the parameters.
+		Compute the second derivative of log likelihood with respect to the parameters.
+
+		The analytic Hessian is used when the model provides one, otherwise
+		this is a finite-difference approximation.
 
 		Parameters
 		----------
@@ -536,16 +839,21 @@ cdef class AbstractChoiceModel(ParameterFrame):
 			Settings for cross validation calculations.
 			If `leave_out` and `subsample` are set, then case rows where rownumber % subsample == leave_out are dropped.
 			If `keep_only` and `subsample` are set, then only case rows where rownumber % subsample == keep_only are used.
+		n_jobs : int, default 1
+			The number of worker processes used to compute a finite-difference Hessian.
+			Set to -1 to use all available cores.
+		central : bool, default False
+			Use central differences with adaptive step sizes for a finite-difference Hessian.
 
 		Returns
 		-------
-		pandas.DataFrame
-			First derivatives of log likelihood with respect to the parameters (given as both the columns and
-			index for the DataFrame).
+		ndarray
+			Second derivatives of log likelihood with respect to the parameters.
 
 		"""
 		return self.loglike3(x,start_case=start_case,stop_case=stop_case,step_case=step_case,
-							 leave_out=leave_out, keep_only=keep_only, subsample=subsample,).d2ll
+							 leave_out=leave_out, keep_only=keep_only, subsample=subsample,
+							 n_jobs=n_jobs, central=central,).d2ll
 
 	def check_d_loglike(self, stylize=True, skip_zeros=False):
 		"""
@@ -605,6 +913,7 @@ cdef class AbstractChoiceModel(ParameterFrame):
 			leave_out=-1,
 			keep_only=-1,
 			subsample=-1,
+			callback=None,
 			**kwargs,
 	):
 		"""
@@ -622,6 +931,10 @@ cdef class AbstractChoiceModel(ParameterFrame):
 			otherwise defaults to BHHH.
 		quiet : bool, default False
 			Whether to suppress the dashboard.
+		callback : callable, optional
+			Called with the current parameter values after each iteration,
+			whether or not the dashboard is shown.  An exception raised by
+			the callback stops the optimization and is passed through.
 
 		Returns
 		-------
@@ -676,17 +989,22 @@ cdef class AbstractChoiceModel(ParameterFrame):
 				tag2 = display_nothing()
 				tag3 = display_nothing()
 
+			user_callback = callback
+			show_dashboard = not (quiet or _doctest_mode_)
+
 			def callback(x, status=None):
 				nonlocal iteration_number, throttle_gate
 				iteration_number += 1
-				if throttle_gate:
+				if show_dashboard and throttle_gate:
 					#clear_output(wait=True)
 					tag1.update(f'Iteration {iteration_number:03} {iteration_number_tail}')
 					tag2.update(f'LL = {self._cached_loglike_best}')
 					tag3.update(self.pf)
+				if user_callback is not None:
+					user_callback(x)
 				return False
 
-			if quiet or _doctest_mode_:
+			if not show_dashboard and user_callback is None:
 				callback = None
 
 			if method is None:
@@ -812,6 +1130,292 @@ cdef class AbstractChoiceModel(ParameterFrame):
 			logger.exception("error in maximize_loglike")
 			raise
 
+	def _run_in_forked_workers(self, method, tasks, n_jobs, *shared):
+		"""
+		Call a method of this model once for each task, concurrently in forked worker processes.
+
+		See `maximize_loglike_multistart` for how the workers share the data.
+
+		Parameters
+		----------
+		method : str
+			The name of the method, which is called with the `shared`
+			arguments followed by the arguments in each task.
+		tasks : list of tuple
+			The arguments for each call, which are passed to the workers.
+		n_jobs : int
+			The number of worker processes.  Set to -1 to use all
+			available cores.  There are never more workers than tasks.
+		*shared
+			Arguments given to every call, which are inherited by the
+			workers when they are forked and so are never pickled.
+
+		Returns
+		-------
+		list
+			The results of the calls, in no particular order.
+		"""
+		global _forked_model, _forked_shared
+		import multiprocessing
+		n_jobs = multiprocessing.cpu_count() if n_jobs is None or n_jobs <= 0 else n_jobs
+		n_jobs = min(n_jobs, len(tasks))
+		try:
+			context = multiprocessing.get_context('fork')
+		except ValueError:
+			context = None
+		if context is None or n_jobs <= 1:
+			return [getattr(self, method)(*shared, *task) for task in tasks]
+		_forked_model = self
+		try:
+			with context.Pool(n_jobs, initializer=_forked_initializer, initargs=(shared,)) as pool:
+				return list(pool.imap_unordered(
+					_forked_worker,
+					[(method, task) for task in tasks],
+					chunksize=1,
+				))
+		finally:
+			_forked_model = None
+			_forked_shared = ()
+
+	def _multistart_run(self, best, k, x0, prune, prune_after, options):
+		"""
+		One run of `maximize_loglike_multistart`, from starting values `x0`.
+
+		`best` is a shared `multiprocessing.Value` holding the best log
+		likelihood reached by any run so far.
+		"""
+		from ..util.timesize import Timer
+		timer = Timer()
+		iterations = 0
+
+		def _share_best(ll):
+			with best.get_lock():
+				if ll > best.value:
+					best.value = ll
+
+		def _check_dominated(x):
+			nonlocal iterations
+			iterations += 1
+			ll = self._cached_loglike_best
+			_share_best(ll)
+			if prune is not None and iterations >= prune_after:
+				if best.value - ll > prune * abs(best.value):
+					raise _MultistartDominated()
+
+		self.set_values(x0)
+		self.clear_best_loglike()
+		status = 'converged'
+		message = ''
+		try:
+			result = self.maximize_loglike(quiet=True, callback=_check_dominated, **options)
+			ll = result.get('loglike', self._cached_loglike_best)
+			message = result.get('message', '')
+		except _MultistartDominated:
+			ll = self._cached_loglike_best
+			status = 'dominated'
+			self.set_values(self._frame['best'].values)
+		except Exception as err:
+			ll = self._cached_loglike_best
+			status = 'failed'
+			message = f"{type(err).__name__}: {err}"
+			logger.debug(f"multistart run {k} failed", exc_info=True)
+			if 'best' in self._frame.columns:
+				self.set_values(self._frame['best'].values)
+		if numpy.isfinite(ll):
+			_share_best(ll)
+		return dict(
+			start=k,
+			loglike=ll,
+			status=status,
+			iterations=iterations,
+			elapsed_time=timer.elapsed(),
+			message=message,
+			x=self.pvals.copy(),
+		)
+
+	def maximize_loglike_multistart(
+			self,
+			n_starts=10,
+			*,
+			starts='perturb',
+			scale=1.0,
+			seed=None,
+			n_jobs=-1,
+			prune=0.01,
+			prune_after=5,
+			distinct_ll_tol=1e-3,
+			distinct_x_tol=1e-3,
+			**kwargs,
+	):
+		"""
+		Maximize the log likelihood from several starting points.
+
+		Nested logit and latent class likelihoods may have more than one
+		local maximum.  This runs `maximize_loglike` independently from
+		each of `n_starts` starting points, keeps the best solution, and
+		reports the distinct local optima found.  Unless the starting points
+		are given explicitly, the first one is the current parameter values.
+
+		The runs are evaluated concurrently in worker processes.  These are
+		forked from this process after the data is loaded, so they all share
+		the already-loaded `dataframes` arrays in memory (copy-on-write),
+		and only parameter values and results are passed between processes.
+		Each worker runs single-threaded.  Forking is not available on all
+		platforms, in which case the runs are made serially.
+
+		Parameters
+		----------
+		n_starts : int, default 10
+			The number of starting points, including the current values.
+		starts : {'perturb', 'uniform'} or array-like
+			How to draw the other starting points.  For 'perturb', normal
+			noise with standard deviation `scale` is added to the current
+			values.  For 'uniform', values are drawn uniformly between the
+			`minimum` and `maximum` of each parameter, where both are
+			finite, and perturbed otherwise.  Starting points are always
+			clipped to the parameter bounds, and holdfast parameters are
+			not changed.  Alternatively, give an array with a row of
+			parameter values for each starting point, which are used as
+			given (other than the clipping and holdfast parameters), in
+			which case `n_starts` is ignored and the current values are
+			not included unless they are one of the rows.
+		scale : float or array-like, default 1.0
+			The scale of the perturbations.
+		seed : int, optional
+			Seed for drawing the starting points.
+		n_jobs : int, default -1
+			The number of worker processes.  Set to -1 to use all
+			available cores, or 1 to make the runs serially in this process.
+		prune : float or None, default 0.01
+			Stop a run early when its log likelihood, after at least
+			`prune_after` iterations, is worse than the best log likelihood
+			reached by any run by more than this fraction.  Set to None to
+			run every start to convergence.
+		prune_after : int, default 5
+			The number of iterations before a run can be stopped early.
+		distinct_ll_tol, distinct_x_tol : float, default 1e-3
+			Two runs reached the same optimum if their log likelihoods are
+			within `distinct_ll_tol`, and every parameter is within
+			`distinct_x_tol` (relative to the magnitude of the parameter,
+			if that is larger than 1).
+		**kwargs
+			All other keyword arguments are passed through to
+			`maximize_loglike` for each run.
+
+		Returns
+		-------
+		dictx
+			The results, as from `maximize_loglike` for the best run, with
+			`multistart_runs`, a DataFrame describing every run, and
+			`optima`, a DataFrame with a row for each distinct optimum
+			found by runs that were not stopped early, best first.  The
+			model is left at the best parameter values.
+		"""
+		try:
+			import multiprocessing
+			from ..util.timesize import Timer
+			from ..util import dictx
+
+			if self.dataframes is None:
+				raise ValueError("you must load data first -- try Model.load_data()")
+			for key in ('quiet', 'callback', 'return_tags', 'reuse_tags'):
+				if key in kwargs:
+					raise TypeError(f"maximize_loglike_multistart does not accept {key!r}")
+
+			timer = Timer()
+			self.unmangle()
+			x_init = self.pvals.copy()
+			lower = self.pf['minimum'].values
+			upper = self.pf['maximum'].values
+			free = self.pf['holdfast'].values == 0
+
+			if isinstance(starts, str):
+				if starts not in ('perturb', 'uniform'):
+					raise ValueError(f"unknown starts {starts!r}")
+				rng = numpy.random.default_rng(seed)
+				x_starts = numpy.empty([n_starts, len(x_init)])
+				x_starts[:] = x_init
+				noise = rng.normal(size=(n_starts-1, len(x_init))) * numpy.asarray(scale)
+				x_starts[1:] += noise * free
+				if starts == 'uniform':
+					bounded = free & numpy.isfinite(lower) & numpy.isfinite(upper)
+					x_starts[1:, bounded] = rng.uniform(
+						lower[bounded], upper[bounded], size=(n_starts-1, bounded.sum()),
+					)
+			else:
+				x_starts = numpy.array(starts, dtype=numpy.float64, ndmin=2)
+				if x_starts.shape[1] != len(x_init):
+					raise ValueError(f"starts must have {len(x_init)} columns")
+				x_starts = numpy.where(free, x_starts, x_init)
+			x_starts = numpy.clip(x_starts, lower, upper)
+
+			best = multiprocessing.Value('d', -numpy.inf)
+			runs = self._run_in_forked_workers(
+				'_multistart_run',
+				[(k, x0, prune, prune_after, kwargs) for k, x0 in enumerate(x_starts)],
+				n_jobs,
+				best,
+			)
+			runs.sort(key=lambda r: r['start'])
+
+			lls = numpy.array([r['loglike'] for r in runs], dtype=numpy.float64)
+			if not numpy.isfinite(lls).any():
+				raise ValueError("all multistart runs failed:\n" + "\n".join(r['message'] for r in runs))
+			best_run = runs[int(numpy.nanargmax(numpy.where(numpy.isfinite(lls), lls, numpy.nan)))]
+
+			# group the runs that were not stopped early into distinct optima
+			optima = []
+			for r in sorted(runs, key=lambda r: -r['loglike']):
+				if r['status'] != 'converged' or not numpy.isfinite(r['loglike']):
+					continue
+				for o in optima:
+					if abs(o['loglike'] - r['loglike']) <= distinct_ll_tol and numpy.all(
+							numpy.abs(o['x'] - r['x']) <= distinct_x_tol * numpy.fmax(numpy.abs(o['x']), 1.0)
+					):
+						o['n_runs'] += 1
+						break
+				else:
+					optima.append(dict(loglike=r['loglike'], n_runs=1, first_start=r['start'], x=r['x']))
+
+			multistart_runs = pandas.DataFrame.from_records(
+				[{k: v for k, v in r.items() if k != 'x'} for r in runs],
+			).set_index('start')
+			multistart_runs = pandas.concat([
+				multistart_runs,
+				pandas.DataFrame(numpy.stack([r['x'] for r in runs]), columns=self.pnames, index=multistart_runs.index),
+			], axis=1)
+			optima = pandas.concat([
+				pandas.DataFrame.from_records(
+					[{k: v for k, v in o.items() if k != 'x'} for o in optima],
+					columns=['loglike', 'n_runs', 'first_start'],
+				),
+				pandas.DataFrame([o['x'] for o in optima], columns=self.pnames),
+			], axis=1)
+			optima.index.name = 'optimum'
+
+			# leave the model at the best optimum, and report the best run like `maximize_loglike`
+			self.set_values(best_run['x'])
+			self.clear_best_loglike()
+			timer.stop()
+			result = dictx(
+				loglike=self.loglike(),
+				x=pandas.Series(self.pvals, index=self.pnames),
+				elapsed_time=timer.elapsed(),
+				method=f"multistart|{kwargs.get('method') or 'default'}",
+				n_cases=self.n_cases,
+				iteration_number=best_run['iterations'],
+				message=best_run['message'],
+				n_starts=len(runs),
+				multistart_runs=multistart_runs,
+				optima=optima,
+			)
+			result['logloss'] = -result['loglike'] / self.total_weight()
+			self._most_recent_estimation_result = result
+			return result
+		except:
+			logger.exception("error in maximize_loglike_multistart")
+			raise
+
 	def estimate(self, dataservice=None, autoscale_weights=True, **kwargs):
 		"""
 		A convenience method to load data, maximize loglike, and get covariance.
@@ -848,7 +1452,20 @@ cdef class AbstractChoiceModel(ParameterFrame):
 		self.calculate_parameter_covariance()
 		return result
 
-	def cross_validate(self, cv=5, *args, **kwargs):
+	def _cross_validate_fold(self, fold, cv, x0, args, kwargs):
+		"""
+		One fold of `cross_validate`, estimated from starting values `x0`.
+
+		Returns the fold number, the log likelihood of the holdout cases,
+		and the parameter values estimated without them.
+		"""
+		self.set_values(x0)
+		self.clear_best_loglike()
+		self.maximize_loglike(leave_out=fold, subsample=cv, quiet=True, *args, **kwargs)
+		ll = self.loglike(keep_only=fold, subsample=cv)
+		return fold, ll, self.pvals.copy()
+
+	def cross_validate(self, cv=5, *args, n_jobs=-1, warm_start=True, **kwargs):
 		"""
 		A simple but well optimized cross-validated log likelihood.
 
@@ -859,22 +1476,321 @@ cdef class AbstractChoiceModel(ParameterFrame):
 		the cross-validation tools in scikit-learn are preferred, even though they are potentially not
 		as memory efficient.
 
+		The folds are estimated concurrently in worker processes that share
+		the already-loaded data, as for `maximize_loglike_multistart`.
+
 		Parameters
 		----------
 		cv : int
 			The number of folds in k-fold cross-validation.
+		n_jobs : int, default -1
+			The number of worker processes.  Set to -1 to use all
+			available cores (up to one per fold), or 1 to estimate the
+			folds serially in this process.
+		warm_start : bool, default True
+			Start the estimation of every fold from the estimates for the
+			full data, which are usually close to the estimates for each
+			fold, so that each fold converges in few iterations.  If the
+			model has not been estimated yet, it is estimated first.
+			Otherwise, every fold starts from the current values.
+		**kwargs
+			All other arguments are passed through to `maximize_loglike`
+			for each fold.
 
 		Returns
 		-------
 		float
-			The log likelihood as computed from the holdout folds.
+			The log likelihood as computed from the holdout folds.  The
+			parameter values estimated for each fold are stored in the
+			`cv_000`, `cv_001`, etc. columns of the parameter frame, and
+			the model is left at its values for the full data.
+		"""
+		try:
+			if self.dataframes is None:
+				raise ValueError("you must load data first -- try Model.load_data()")
+			for key in ('leave_out', 'keep_only', 'subsample', 'quiet'):
+				if key in kwargs:
+					raise TypeError(f"cross_validate does not accept {key!r}")
+
+			self.unmangle()
+			if warm_start and self._most_recent_estimation_result is None:
+				self.maximize_loglike(quiet=True, *args, **kwargs)
+			x_full = self.pvals.copy()
+			full_result = self._most_recent_estimation_result
+
+			try:
+				folds = self._run_in_forked_workers(
+					'_cross_validate_fold',
+					[(fold, cv, x_full, args, kwargs) for fold in range(cv)],
+					n_jobs,
+				)
+			finally:
+				self.set_values(x_full)
+				self.clear_best_loglike()
+				self._most_recent_estimation_result = full_result
+
+			ll_cv = 0
+			for fold, ll, x in sorted(folds, key=lambda f: f[0]):
+				ll_cv += ll
+				self._frame[f'cv_{fold:03d}'] = x
+			return ll_cv
+		except:
+			logger.exception("error in cross_validate")
+			raise
+
+	def _scale_case_weights(self, factor):
 		"""
-		ll_cv = 0
-		for fold in range(cv):
-			i = self.maximize_loglike(leave_out=fold, subsample=cv, quiet=True, *args, **kwargs)
-			ll_cv += self.loglike(keep_only=fold, subsample=cv)
-			self._frame[f'cv_{fold:03d}'] = self._frame['value']
-		return ll_cv
+		Multiply the weight of every case by a factor, without copying the data.
+
+		Parameters
+		----------
+		factor : array-like
+			A factor for each case, in the order of the cases in the
+			attached dataframes.
+
+		Returns
+		-------
+		Any
+			The prior state, to give to `_restore_case_weights`.
+		"""
+		dfs = self.dataframes
+		saved = dfs.data_wt
+		base = 1.0 if saved is None else saved.values.reshape(-1)
+		dfs.data_wt = pandas.DataFrame(
+			numpy.asarray(factor, dtype=l4_float_dtype) * base,
+			index=dfs.caseindex,
+			columns=['replicate_weight'],
+		)
+		self.clear_best_loglike()
+		return saved
+
+	def _restore_case_weights(self, saved):
+		"""Restore the case weights replaced by `_scale_case_weights`."""
+		self.dataframes.data_wt = saved
+		self.clear_best_loglike()
+
+	def _replicate_run(self, factors, r, x0, args, kwargs):
+		"""
+		Estimate one replicate of `bootstrap` or `jackknife`, from starting values `x0`.
+
+		The weight of each case is multiplied by `factors(r)` for this
+		replicate.  Returns the replicate number, the estimated parameter
+		values (all NaN if the estimation failed), and the log likelihood.
+		"""
+		saved = self._scale_case_weights(factors(r))
+		try:
+			self.set_values(x0)
+			self.clear_best_loglike()
+			result = self.maximize_loglike(quiet=True, *args, **kwargs)
+			return r, self.pvals.copy(), result.get('loglike', self._cached_loglike_best)
+		except Exception:
+			logger.debug(f"replicate {r} failed", exc_info=True)
+			return r, numpy.full(len(x0), numpy.nan), numpy.nan
+		finally:
+			self._restore_case_weights(saved)
+
+	def _replicate_estimates(self, factors, n_reps, n_jobs, args, kwargs):
+		"""
+		Estimate replicates of the model with case weights scaled by `factors`.
+
+		The replicates are warm-started from the current values, which are
+		first estimated on the full data if the model has not been
+		estimated yet, and are run concurrently in forked worker processes
+		as for `maximize_loglike_multistart`.
+
+		Returns
+		-------
+		x : ndarray
+			The estimates for the full data.
+		replicates : pandas.DataFrame
+			The estimates for each replicate, and its log likelihood.
+		"""
+		if self.dataframes is None:
+			raise ValueError("you must load data first -- try Model.load_data()")
+		for key in ('leave_out', 'keep_only', 'subsample', 'quiet'):
+			if key in kwargs:
+				raise TypeError(f"replicate estimation does not accept {key!r}")
+
+		self.unmangle()
+		if self._most_recent_estimation_result is None:
+			self.maximize_loglike(quiet=True, *args, **kwargs)
+		x_full = self.pvals.copy()
+		full_result = self._most_recent_estimation_result
+
+		try:
+			# `factors` is shared with the workers, so the replicate weights
+			# are made in the workers and never passed between processes
+			runs = self._run_in_forked_workers(
+				'_replicate_run',
+				[(r, x_full, args, kwargs) for r in range(n_reps)],
+				n_jobs,
+				factors,
+			)
+		finally:
+			self.set_values(x_full)
+			self.clear_best_loglike()
+			self._most_recent_estimation_result = full_result
+
+		runs.sort(key=lambda run: run[0])
+		replicates = pandas.DataFrame(
+			numpy.stack([run[1] for run in runs]),
+			columns=self.pnames,
+			index=pandas.RangeIndex(n_reps, name='replicate'),
+		)
+		replicates['loglike'] = [run[2] for run in runs]
+		return x_full, replicates
+
+	@staticmethod
+	def _case_groups(n_cases, clusters):
+		"""Get the group number of each case, and the number of groups."""
+		if clusters is None:
+			return numpy.arange(n_cases), n_cases
+		clusters = numpy.asarray(clusters).reshape(-1)
+		if clusters.shape[0] != n_cases:
+			raise ValueError(f"clusters must have one value per case, not {clusters.shape[0]} for {n_cases} cases")
+		uniques, groups = numpy.unique(clusters, return_inverse=True)
+		return groups, len(uniques)
+
+	def _replicate_result(self, method, x_full, replicates, covariance):
+		"""Summarize the replicate estimates, and store the standard errors in the parameter frame."""
+		from ..util import dictx
+		params = replicates[self.pnames]
+		ok = params.notna().all(axis=1)
+		covariance = pandas.DataFrame(covariance, index=self.pnames, columns=self.pnames)
+		std_err = pandas.Series(numpy.sqrt(numpy.diag(covariance.values)), index=self.pnames)
+		self.pf[f'{method} std err'] = std_err
+		self._matrixes[f'{method}_covariance_matrix'] = covariance.values
+		return dictx(
+			x=pandas.Series(x_full, index=self.pnames),
+			replicates=replicates,
+			n_failed=int((~ok).sum()),
+			mean=params[ok].mean(),
+			std_err=std_err,
+			covariance=covariance,
+		)
+
+	def bootstrap(self, n_reps=100, *args, clusters=None, seed=None, n_jobs=-1, **kwargs):
+		"""
+		Bootstrap the parameter estimates.
+
+		Each replicate resamples the cases (or clusters of cases) with
+		replacement, and re-estimates the model.  The resampling is done by
+		multiplying the weight of each case by the number of times it is
+		drawn, so the data itself is never copied.  Every replicate starts
+		from the estimates for the full data, which are usually close to
+		the estimates for the replicate.
+
+		The replicates are estimated concurrently in worker processes that
+		share the already-loaded data, as for `maximize_loglike_multistart`.
+
+		Parameters
+		----------
+		n_reps : int, default 100
+			The number of bootstrap replicates.
+		clusters : array-like, optional
+			A cluster identifier for each case, in the order of the cases
+			in the data.  If given, whole clusters are resampled, as for
+			clustered survey samples.
+		seed : int, optional
+			Seed for the resampling.  Each replicate has its own random
+			stream, so the results do not depend on `n_jobs`.
+		n_jobs : int, default -1
+			The number of worker processes.  Set to -1 to use all
+			available cores, or 1 to estimate the replicates serially in
+			this process.
+		**kwargs
+			All other arguments are passed through to `maximize_loglike`
+			for each replicate.
+
+		Returns
+		-------
+		dictx
+			With the estimates for the full data as 'x', the estimates for
+			each replicate (and their log likelihoods) as 'replicates', the
+			number of replicates where estimation failed as 'n_failed', and
+			the 'mean', 'std_err' and 'covariance' of the estimates over the
+			other replicates.  The standard errors are also stored in the
+			'bootstrap std err' column of the parameter frame.  The model is
+			left at its values for the full data.
+		"""
+		try:
+			groups, n_groups = self._case_groups(self.n_cases, clusters)
+			seeds = numpy.random.SeedSequence(seed).spawn(n_reps)
+
+			def factors(r):
+				rng = numpy.random.default_rng(seeds[r])
+				draws = numpy.bincount(rng.integers(0, n_groups, n_groups), minlength=n_groups)
+				return draws[groups]
+
+			x_full, replicates = self._replicate_estimates(factors, n_reps, n_jobs, args, kwargs)
+			params = replicates[self.pnames].dropna()
+			covariance = numpy.atleast_2d(numpy.cov(params.values, rowvar=False, ddof=1))
+			return self._replicate_result('bootstrap', x_full, replicates, covariance)
+		except:
+			logger.exception("error in bootstrap")
+			raise
+
+	def jackknife(self, n_groups=None, *args, clusters=None, n_jobs=-1, **kwargs):
+		"""
+		Jackknife the parameter estimates.
+
+		Each replicate drops one group of cases, and re-estimates the
+		model.  The cases are dropped by setting their weights to zero, so
+		the data itself is never copied.  Every replicate starts from the
+		estimates for the full data, and the replicates are estimated
+		concurrently in worker processes, as for `bootstrap`.
+
+		Parameters
+		----------
+		n_groups : int, optional
+			Split the cases into this many groups, by row number modulo
+			`n_groups` (as for `cross_validate`, this assumes the cases
+			are in random order), and drop one group in each replicate.
+			If not given, each replicate drops one case (or one cluster,
+			if `clusters` is given), which needs as many replicates as
+			there are cases.
+		clusters : array-like, optional
+			A cluster identifier for each case, in the order of the cases
+			in the data.  If given, each replicate drops one whole cluster,
+			as for clustered survey samples, and `n_groups` is ignored.
+		n_jobs : int, default -1
+			The number of worker processes.  Set to -1 to use all
+			available cores, or 1 to estimate the replicates serially in
+			this process.
+		**kwargs
+			All other arguments are passed through to `maximize_loglike`
+			for each replicate.
+
+		Returns
+		-------
+		dictx
+			As for `bootstrap`, with the jackknife estimate of the
+			covariance, (G-1)/G times the sum of the outer products of the
+			deviations of the G replicate estimates from their mean.  The
+			standard errors are also stored in the 'jackknife std err'
+			column of the parameter frame.
+		"""
+		try:
+			n_cases = self.n_cases
+			if clusters is None and n_groups is not None:
+				groups = numpy.arange(n_cases) % n_groups
+			else:
+				groups, n_groups = self._case_groups(n_cases, clusters)
+			if n_groups < 2:
+				raise ValueError("the jackknife needs at least two groups")
+
+			def factors(r):
+				return (groups != r).astype(l4_float_dtype)
+
+			x_full, replicates = self._replicate_estimates(factors, n_groups, n_jobs, args, kwargs)
+			params = replicates[self.pnames].dropna()
+			deviations = params.values - params.values.mean(axis=0)
+			g = len(params)
+			covariance = (g - 1) / g * (deviations.T @ deviations)
+			return self._replicate_result('jackknife', x_full, replicates, covariance)
+		except:
+			logger.exception("error in jackknife")
+			raise
 
 	def noop(self):
 		print("No op!")
@@ -1328,7 +2244,7 @@ cdef class AbstractChoiceModel(ParameterFrame):
 
 
 
-	def calculate_parameter_covariance(self, status_widget=None, preserve_hessian=False):
+	def calculate_parameter_covariance(self, status_widget=None, preserve_hessian=False, n_jobs=1, central=False):
 		"""
 		Compute the parameter covariance matrix.
 
@@ -1340,8 +2256,11 @@ cdef class AbstractChoiceModel(ParameterFrame):
 		the result in `covariance_matrix`, and computes the
 		standard error of the estimators (i.e. the square root
 		of the diagonal) and stores those values in `pf['std err']`.
+
+		For models without an analytic hessian, `n_jobs` and `central`
+		control the finite-difference approximation, see `d2_loglike`.
 		"""
-		hess = -self.d2_loglike()
+		hess = -self.d2_loglike(n_jobs=n_jobs, central=central)
 
 		from ..model.possible_overspec import compute_possible_overspecification, PossibleOverspecification
 		overspec = compute_possible_overspecification(hess, self.pf.loc[:,'holdfast'])
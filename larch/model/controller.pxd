@@ -33,4 +33,9 @@ cdef class Model5c(AbstractChoiceModel):
 		object _graph
 
 		int _n_threads
+		int _mnl_block_size
+		int _mnl_chunksize
+		bint _utility_cache
+
+	cdef readonly object _workspace
 
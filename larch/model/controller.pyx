@@ -24,7 +24,11 @@ from .linear cimport DataRef_C as DataRef
 
 from .abstract_model cimport AbstractChoiceModel
 
-from ..exceptions import MissingDataError, ParameterNotInModelWarning
+from ..exceptions import MissingDataError, ParameterNotInModelWarning, BHHHSimpleStepFailure
+from .workspace import KernelWorkspace
+
+# Choices made by `Model5c.autotune_threads`, keyed by the shape of the data.
+_autotune_cache = {}
 
 
 cdef class Model5c(AbstractChoiceModel):
@@ -42,6 +46,9 @@ cdef class Model5c(AbstractChoiceModel):
 			rename_parameters=None,
 			frame=None,
 			n_threads=-1,
+			mnl_block_size=0,
+			mnl_chunksize=0,
+			utility_cache=False,
 			is_clone=False,
 			title=None,
 	):
@@ -70,6 +77,10 @@ cdef class Model5c(AbstractChoiceModel):
 		self._most_recent_estimation_result = None
 
 		self.n_threads = n_threads
+		self.mnl_block_size = mnl_block_size
+		self.mnl_chunksize = mnl_chunksize
+		self.utility_cache = utility_cache
+		self._workspace = KernelWorkspace()
 
 		self._dataservice = dataservice
 
@@ -158,6 +169,10 @@ cdef class Model5c(AbstractChoiceModel):
 
 		self.unmangle(True)
 		self.n_threads = 0
+		self.mnl_block_size = 0
+		self.mnl_chunksize = 0
+		self.utility_cache = False
+		self._workspace = KernelWorkspace()
 		self._prior_frame_values = None
 		# if self._graph is not None:
 		# 	self.graph.set_touch_callback(self.mangle)
@@ -175,6 +190,142 @@ cdef class Model5c(AbstractChoiceModel):
 		else:
 			self._n_threads = int(value)
 
+	@property
+	def mnl_block_size(self):
+		"""int : Number of cases per block for the blocked (BLAS) MNL engine.
+
+		When set to a positive value, log likelihood computations for MNL
+		models gather this many cases at a time and compute utility,
+		probability, gradient and BHHH for the whole block with matrix
+		products, instead of looping over cases, alternatives and utility
+		terms one at a time.  The blocked engine supports only linear
+		utility functions on idca and idco data; models with quantity terms
+		or idce data fall back to the casewise engine.  Set to 0 (the
+		default) to always use the casewise engine.
+		"""
+		return self._mnl_block_size
+
+	@mnl_block_size.setter
+	def mnl_block_size(self, value):
+		if value is None or value <= 0:
+			self._mnl_block_size = 0
+		else:
+			self._mnl_block_size = int(value)
+
+	@property
+	def mnl_chunksize(self):
+		"""int : Number of cases handed to each thread at a time by the casewise MNL engine.
+
+		Threads take a new chunk of cases as they finish the last one, so
+		smaller chunks balance uneven work across threads better, at the
+		cost of more scheduling overhead.  Set to 0 (the default) to split
+		the cases evenly into one chunk per thread.  See `autotune_threads`
+		to choose this and `n_threads` by timing the data at hand.
+		"""
+		return self._mnl_chunksize
+
+	@mnl_chunksize.setter
+	def mnl_chunksize(self, value):
+		if value is None or value <= 0:
+			self._mnl_chunksize = 0
+		else:
+			self._mnl_chunksize = int(value)
+
+	def autotune_threads(self, max_threads=None, chunksizes=(0, 256, 32), repeats=3, use_cache=True):
+		"""
+		Choose `n_threads` and `mnl_chunksize` by timing the attached data.
+
+		Small models can run slower with more threads, as the cost of
+		starting threads and combining their results outweighs the work
+		shared among them, while large models benefit from every core.
+		This times a log likelihood, gradient and BHHH evaluation (the work
+		done in each iteration of estimation) for a range of thread counts
+		and chunk sizes, and keeps the fastest.  The choice is remembered
+		for other models with the same number of cases, alternatives and
+		parameters, unless `use_cache` is False.
+
+		Parameters
+		----------
+		max_threads : int, optional
+			The largest thread count to try, defaulting to the number of
+			CPUs.  Counts are tried in powers of two up to this.
+		chunksizes : sequence of int, default (0, 256, 32)
+			The values of `mnl_chunksize` to try.
+		repeats : int, default 3
+			The number of timings for each setting, of which the fastest
+			is used.
+		use_cache : bool, default True
+			Reuse an earlier choice for data of the same shape.
+
+		Returns
+		-------
+		pandas.DataFrame
+			The timings in seconds, indexed by thread count and chunk
+			size, or None if an earlier choice was reused.
+		"""
+		import time
+		import multiprocessing
+		if self._dataframes is None:
+			raise MissingDataError("no dataframes are set")
+		if max_threads is None or max_threads <= 0:
+			max_threads = multiprocessing.cpu_count()
+		self.unmangle()
+		key = (self.n_cases, self._dataframes._n_alts(), len(self._frame), self.is_mnl(), max_threads, tuple(chunksizes))
+		if use_cache and key in _autotune_cache:
+			self.n_threads, self.mnl_chunksize = _autotune_cache[key]
+			return None
+		thread_counts = []
+		n = 1
+		while n < max_threads:
+			thread_counts.append(n)
+			n *= 2
+		thread_counts.append(max_threads)
+		prior = self._n_threads, self._mnl_chunksize
+		timings = {}
+		try:
+			for n in thread_counts:
+				for chunk in chunksizes:
+					if chunk and not self.is_mnl():
+						continue
+					self.n_threads, self.mnl_chunksize = n, chunk
+					self._loglike2_bhhh_tuple() # warm up, and size the workspace
+					best = numpy.inf
+					for _ in range(repeats):
+						t = time.perf_counter()
+						self._loglike2_bhhh_tuple()
+						best = min(best, time.perf_counter() - t)
+					timings[(n, chunk)] = best
+		except:
+			self.n_threads, self.mnl_chunksize = prior
+			raise
+		choice = min(timings, key=timings.get)
+		self.n_threads, self.mnl_chunksize = choice
+		_autotune_cache[key] = choice
+		timings = pandas.Series(timings, name='seconds')
+		timings.index.names = ['n_threads', 'mnl_chunksize']
+		return timings.to_frame()
+
+	@property
+	def utility_cache(self):
+		"""bool : Whether to keep an incremental utility cache for MNL models.
+
+		When enabled, log likelihood evaluations for MNL models that do not
+		need derivatives (e.g. the trial points of a line search, or finite
+		difference sweeps that move one parameter at a time) reuse the
+		utility array from the previous evaluation, adding only the change
+		in the terms whose parameters have changed.  The cache is rebuilt in
+		full whenever the model structure or the data changes.  Models with
+		quantity terms or idce data always compute utility in full.
+		Defaults to False.
+		"""
+		return self._utility_cache
+
+	@utility_cache.setter
+	def utility_cache(self, value):
+		self._utility_cache = bool(value)
+		if not self._utility_cache and self._dataframes is not None:
+			self._dataframes._invalidate_utility_cache()
+
 	def mangle(self, *args, **kwargs):
 		super().mangle(*args, **kwargs)
 
@@ -274,6 +425,13 @@ cdef class Model5c(AbstractChoiceModel):
 
 		self._ensure_names(nameset, nullvalue=1, initvalue=1, min=0.001, max=1)
 
+		if self._graph is not None:
+			alpha_nameset = set()
+			for u, v, param_name in self._graph.edges(data='alpha'):
+				if param_name is not None:
+					alpha_nameset.add(self.__p_rename(str(param_name)))
+			self._ensure_names(alpha_nameset, nullvalue=0, initvalue=0)
+
 
 
 	@property
@@ -434,7 +592,7 @@ cdef class Model5c(AbstractChoiceModel):
 			raise MissingDataError("no dataframes are set")
 		return self._dataframes.total_weight()
 
-	def load_data(self, dataservice=None, autoscale_weights=True, log_warnings=True):
+	def load_data(self, dataservice=None, autoscale_weights=True, log_warnings=True, float_dtype=numpy.float64):
 		"""Load dataframes as required from the dataservice.
 
 		This method prepares the data for estimation. It is used to
@@ -458,6 +616,10 @@ cdef class Model5c(AbstractChoiceModel):
 			Emit warnings in the logger if choice, avail, or weight is
 			not included in `req_data` but is set in the dataservice, and
 			thus returned by default even though it was not requested.
+		float_dtype : dtype, default float64
+			The dtype used to store the idca and idco data.  Use float32
+			to halve the memory footprint of large data; the log likelihood
+			and its derivatives are still accumulated in double precision.
 
 		Raises
 		------
@@ -470,12 +632,256 @@ cdef class Model5c(AbstractChoiceModel):
 			self.dataframes = self._dataservice.make_dataframes(
 				self.required_data(),
 				log_warnings=log_warnings,
+				float_dtype=float_dtype,
 			)
 			if autoscale_weights and self.dataframes.data_wt is not None:
 				self.dataframes.autoscale_weights()
 		else:
 			raise ValueError('dataservice is not defined')
 
+	def loglike2_streaming(
+			self,
+			x=None,
+			*,
+			chunk_size=100_000,
+			return_bhhh=False,
+			dataservice=None,
+			float_dtype=numpy.float64,
+			prefetch=True,
+	):
+		"""
+		Compute the log likelihood and its derivatives, streaming data in chunks of cases.
+
+		Instead of loading all the data at once, the data required by this model
+		is loaded from the dataservice in chunks of `chunk_size` cases.  The next
+		chunk is read on a background thread while the log likelihood of the
+		current chunk is being computed, and the log likelihood, its derivative,
+		and optionally the BHHH matrix are summed across chunks.  This allows
+		estimation with data that is larger than memory.
+
+		Case weights are used as found in the data; they are not autoscaled as
+		they are by default in `load_data`.  Any `dataframes` already attached
+		to this model are not used, but are restored afterwards.
+
+		Parameters
+		----------
+		x : array-like or dict, optional
+			New values to set for the parameters before computing the log likelihood.
+		chunk_size : int, default 100_000
+			The number of cases loaded at a time.
+		return_bhhh : bool, default False
+			Also compute the BHHH approximation of the Hessian.
+		dataservice : DataService or DataFrames, optional
+			The source of the data, see `larch.data_services.streaming.iter_dataframes`.
+			Defaults to the dataservice of this model.
+		float_dtype : dtype, default float64
+			The dtype used to store the idca and idco data of each chunk.
+		prefetch : bool, default True
+			Whether to load the next chunk in the background.
+
+		Returns
+		-------
+		dictx
+			The log likelihood is given by key 'll', the first derivative by key
+			'dll', and the BHHH matrix (if requested) by 'bhhh'.  The number of
+			cases and their total weight are given by 'n_cases' and 'total_weight'.
+		"""
+		from ..data_services.streaming import iter_dataframes
+		from ..util import dictx
+		if dataservice is None:
+			dataservice = self._dataservice
+		if dataservice is None:
+			raise ValueError('dataservice is not defined')
+		if x is not None:
+			self.set_values(x)
+
+		ll = 0.0
+		dll = 0.0
+		bhhh = 0.0
+		n_cases = 0
+		total_weight = 0.0
+		prior_dataframes = self._dataframes
+		try:
+			for chunk in iter_dataframes(
+					dataservice,
+					self.required_data(),
+					chunk_size,
+					float_dtype=float_dtype,
+					prefetch=prefetch,
+			):
+				if chunk.n_cases == 0:
+					continue
+				self.dataframes = chunk
+				if return_bhhh:
+					part = self.loglike2_bhhh()
+					bhhh = bhhh + part.bhhh
+				else:
+					part = self.loglike2()
+				ll += part.ll
+				dll = dll + numpy.asarray(part.dll)
+				n_cases += chunk.n_cases
+				total_weight += chunk.total_weight()
+		finally:
+			self._dataframes = None
+			if prior_dataframes is not None:
+				self.dataframes = prior_dataframes
+			self.clear_best_loglike()
+
+		result = dictx(
+			ll=ll,
+			dll=pandas.Series(dll, index=self.pnames),
+			n_cases=n_cases,
+			total_weight=total_weight,
+		)
+		if return_bhhh:
+			result.bhhh = bhhh
+		return result
+
+	def maximize_loglike_streaming(
+			self,
+			method='bhhh',
+			*,
+			chunk_size=100_000,
+			dataservice=None,
+			float_dtype=numpy.float64,
+			prefetch=True,
+			maxiter=100,
+			ctol=1e-5,
+			minimum_steplen=0.0001,
+			callback=None,
+			options=None,
+	):
+		"""
+		Maximize the log likelihood, streaming data in chunks of cases.
+
+		Each evaluation of the log likelihood makes one pass over the data with
+		`loglike2_streaming`, so no more than two chunks of data are in memory
+		at once.
+
+		Parameters
+		----------
+		method : str, default 'bhhh'
+			The optimization method.  'bhhh' uses the BHHH algorithm with a
+			simple backtracking line search, as in `simple_fit_bhhh`, and
+			obtains the gradient and BHHH matrix from the same pass over
+			the data as the log likelihood.  Other values are passed to
+			`scipy.optimize.minimize`, with parameter bounds and constraints
+			as in `maximize_loglike`.
+		chunk_size, dataservice, float_dtype, prefetch
+			See `loglike2_streaming`.
+		maxiter : int, default 100
+			The maximum number of iterations.
+		ctol : float, default 1e-5
+			The convergence tolerance for 'bhhh'.
+		minimum_steplen : float, default 0.0001
+			The smallest step length tried in the 'bhhh' line search.
+		callback : callable, optional
+			Called with the parameter values after each iteration.
+		options : dict, optional
+			Other options for `scipy.optimize.minimize`.
+
+		Returns
+		-------
+		dictx
+		"""
+		try:
+			from ..util.timesize import Timer
+			from ..util import dictx
+			timer = Timer()
+			stream_kwargs = dict(
+				chunk_size=chunk_size,
+				dataservice=dataservice,
+				float_dtype=float_dtype,
+				prefetch=prefetch,
+			)
+			result = dictx()
+
+			if method.lower() == 'bhhh':
+				current = self.loglike2_streaming(return_bhhh=True, **stream_kwargs)
+				current_pvals = self.pvals.copy()
+				direction = numpy.dot(current.dll.values, self._free_slots_inverse_matrix(current.bhhh))
+				tolerance = numpy.dot(direction, current.dll.values)
+				iteration = 0
+				steps = []
+				while abs(tolerance) > ctol and iteration < maxiter:
+					iteration += 1
+					steplen = 1.0
+					while True:
+						proposed = self.loglike2_streaming(
+							current_pvals + direction * steplen,
+							return_bhhh=True,
+							**stream_kwargs,
+						)
+						if proposed.ll > current.ll: break
+						steplen *= 0.5
+						if steplen < minimum_steplen: break
+					if proposed.ll <= current.ll:
+						self.set_values(current_pvals)
+						raise BHHHSimpleStepFailure(f"streaming bhhh failed\ndirection = {str(direction)}")
+					steps.append(steplen)
+					current = proposed
+					current_pvals = self.pvals.copy()
+					if callback is not None:
+						callback(current_pvals)
+					direction = numpy.dot(current.dll.values, self._free_slots_inverse_matrix(current.bhhh))
+					tolerance = numpy.dot(direction, current.dll.values)
+				if abs(tolerance) <= ctol:
+					message = "Optimization terminated successfully."
+				else:
+					message = f"Optimization terminated after {iteration} iterations."
+				result.loglike = current.ll
+				result.x = pandas.Series(current_pvals, index=self.pnames)
+				result.tolerance = tolerance
+				result.steps = numpy.asarray(steps)
+				result.message = message
+				result.iteration_number = iteration
+				n_cases, total_weight = current.n_cases, current.total_weight
+			else:
+				from scipy.optimize import minimize
+				stats = {}
+				def _neg_loglike2(x):
+					part = self.loglike2_streaming(x, **stream_kwargs)
+					stats['n_cases'] = part.n_cases
+					stats['total_weight'] = part.total_weight
+					return -part.ll, -part.dll.values
+				if options is None:
+					options = {}
+				options['maxiter'] = maxiter
+				bounds = None
+				if method.lower() in ('slsqp', 'l-bfgs-b', 'tnc', 'trust-constr'):
+					bounds = self.pbounds
+				try:
+					constraints = self._get_constraints(method)
+				except:
+					constraints = ()
+				raw_result = minimize(
+					_neg_loglike2,
+					self.pvals,
+					method=method,
+					jac=True,
+					bounds=bounds,
+					callback=callback,
+					options=options,
+					constraints=constraints,
+				)
+				self.set_values(raw_result.x)
+				result.loglike = -raw_result.fun
+				result.x = pandas.Series(raw_result.x, index=self.pnames)
+				result.message = raw_result.message
+				result.iteration_number = raw_result.get('nit', 0)
+				n_cases, total_weight = stats['n_cases'], stats['total_weight']
+
+			timer.stop()
+			result.elapsed_time = timer.elapsed()
+			result.method = f"{method}-streaming"
+			result.n_cases = n_cases
+			result.logloss = -result.loglike / total_weight
+			self._most_recent_estimation_result = result
+			return result
+		except:
+			logger.exception("error in maximize_loglike_streaming")
+			raise
+
 	def dataframes_from_idce(self, ce, choice, autoscale_weights=True):
 		"""
 		Create DataFrames from a single `idce` format DataFrame.
@@ -497,6 +903,36 @@ cdef class Model5c(AbstractChoiceModel):
 		if autoscale_weights and self.dataframes.data_wt is not None:
 			self.dataframes.autoscale_weights()
 
+	def sample_alternatives(self, n_samples, importance=None, *, seed=None, replace=True):
+		"""
+		Replace the attached dataframes with a sample of alternatives for each case.
+
+		The sampled data is stored in `idce` format, and the sampling correction
+		is added to the utility of each sampled alternative in the log likelihood.
+		Data must already be loaded, and reloading the data (e.g. with `load_data`)
+		will discard the sample.
+
+		Parameters
+		----------
+		n_samples : int
+			The number of alternatives to draw for each case, in addition
+			to the chosen alternative.
+		importance : str, array-like, pandas.Series or pandas.DataFrame, optional
+			Relative sampling weights, see `DataFrames.sample_alternatives`.
+		seed : int, optional
+			A seed for the random number generator.
+		replace : bool, default True
+			Whether to draw with replacement.
+		"""
+		if self._dataframes is None:
+			raise MissingDataError("no dataframes are set")
+		self.dataframes = self._dataframes.sample_alternatives(
+			n_samples,
+			importance=importance,
+			seed=seed,
+			replace=replace,
+		)
+
 	def __d_log_likelihood_from_dataframes_all_rows(
 			self,
 			bint        return_dll=True,
@@ -510,7 +946,55 @@ cdef class Model5c(AbstractChoiceModel):
 			int         subsample= 1,
 			bint        probability_only=False,
 	):
-		if self.is_mnl() and not (persist & PERSIST_D_PROBABILITY):
+		from .mnl import _mnl_blocked_engine_available, mnl_d_log_likelihood_from_dataframes_blocked
+		from .mnl import _mnl_ce_engine_available, mnl_d_log_likelihood_from_dataframes_ce
+		if self.is_mnl() and self._utility_cache and not return_dll and not return_bhhh \
+				and persist == 0 and not probability_only \
+				and self._dataframes._utility_cache_is_available():
+			from .mnl import mnl_log_likelihood_from_utility_cache
+			y = mnl_log_likelihood_from_utility_cache(
+				self._dataframes,
+				num_threads=self.n_threads,
+				start_case=start_case,
+				stop_case=stop_case,
+				step_case=step_case,
+				leave_out=leave_out,
+				keep_only=keep_only,
+				subsample=subsample,
+			)
+		elif self.is_mnl() and not (persist & PERSIST_D_PROBABILITY) and self._mnl_block_size > 0 \
+				and _mnl_blocked_engine_available(self._dataframes):
+			y = mnl_d_log_likelihood_from_dataframes_blocked(
+				self._dataframes,
+				block_size=self._mnl_block_size,
+				return_dll=return_dll,
+				return_bhhh=return_bhhh,
+				start_case=start_case,
+				stop_case=stop_case,
+				step_case=step_case,
+				persist=persist,
+				leave_out=leave_out,
+				keep_only=keep_only,
+				subsample=subsample,
+				probability_only=probability_only,
+			)
+		elif self.is_mnl() and not (persist & PERSIST_D_PROBABILITY) \
+				and _mnl_ce_engine_available(self._dataframes):
+			y = mnl_d_log_likelihood_from_dataframes_ce(
+				self._dataframes,
+				num_threads=self.n_threads,
+				return_dll=return_dll,
+				return_bhhh=return_bhhh,
+				start_case=start_case,
+				stop_case=stop_case,
+				step_case=step_case,
+				persist=persist,
+				leave_out=leave_out,
+				keep_only=keep_only,
+				subsample=subsample,
+				probability_only=probability_only,
+			)
+		elif self.is_mnl() and not (persist & PERSIST_D_PROBABILITY):
 			from .mnl import mnl_d_log_likelihood_from_dataframes_all_rows
 			y = mnl_d_log_likelihood_from_dataframes_all_rows(
 				self._dataframes,
@@ -525,6 +1009,8 @@ cdef class Model5c(AbstractChoiceModel):
 				keep_only=keep_only,
 				subsample=subsample,
 				probability_only=probability_only,
+				workspace=self._workspace,
+				chunksize=self._mnl_chunksize,
 			)
 		else:
 			if self.graph is None:
@@ -610,7 +1096,7 @@ cdef class Model5c(AbstractChoiceModel):
 			subsample=subsample,
 			probability_only=probability_only,
 		)
-		if start_case==0 and stop_case==-1 and step_case==1:
+		if start_case==0 and stop_case==-1 and step_case==1 and leave_out<0 and keep_only<0:
 			self._check_if_best(y.ll)
 		# if return_series and 'dll' in y and not isinstance(y['dll'], (pandas.DataFrame, pandas.Series)):
 		# 	y['dll'] = pandas.Series(y['dll'], index=self.frame.index, )
@@ -676,7 +1162,7 @@ cdef class Model5c(AbstractChoiceModel):
 			keep_only=keep_only,
 			subsample=subsample,
 		)
-		if start_case==0 and stop_case==-1 and step_case==1:
+		if start_case==0 and stop_case==-1 and step_case==1 and leave_out<0 and keep_only<0:
 			self._check_if_best(y.ll)
 		if return_series and 'dll' in y and not isinstance(y['dll'], (pandas.DataFrame, pandas.Series)):
 			y['dll'] = pandas.Series(y['dll'], index=self._frame.index, )
@@ -684,6 +1170,26 @@ cdef class Model5c(AbstractChoiceModel):
 			y['bhhh'] = pandas.DataFrame(y['bhhh'], index=self._frame.index, columns=self._frame.index)
 		return y
 
+	def loglike3(self, x=None, **kwargs):
+		"""
+		Compute a log likelihood value, it first derivative, and the Hessian.
+
+		For MNL models without quantity terms, the exact Hessian is accumulated
+		by the likelihood kernel in the same pass as the first derivative
+		(see `PERSIST_D2_LOGLIKE`).  For other models, the finite-difference
+		approximation of the Hessian is used.
+
+		See :ref:`loglike2` for a description of arguments.
+
+		Returns
+		-------
+		dictx
+			The log likelihood is given by key 'll', the first derivative by key 'dll', and the second derivative by 'd2ll'.
+			Other arrays are also included if `persist` is set to True.
+		"""
+		kwargs['persist'] = kwargs.get('persist', 0) | PERSIST_D2_LOGLIKE
+		return super().loglike3(x=x, **kwargs)
+
 	def d_probability(
 			self,
 			x=None,
@@ -796,7 +1302,7 @@ cdef class Model5c(AbstractChoiceModel):
 			subsample=subsample,
 			probability_only=probability_only,
 		)
-		if start_case==0 and stop_case==-1 and step_case==1:
+		if start_case==0 and stop_case==-1 and step_case==1 and leave_out<0 and keep_only<0:
 			self._check_if_best(y.ll)
 		if probability_only:
 			return y.probability
@@ -833,6 +1339,224 @@ cdef class Model5c(AbstractChoiceModel):
 			arr[:] = self.loglike(persist=PERSIST_UTILITY).utility[:,-1]
 		return arr
 
+	def scorer(self, x=None):
+		"""
+		Create a Scorer, to apply this model with fixed parameter values.
+
+		Parameters
+		----------
+		x : {'null', 'init', 'best', array-like, dict, scalar}, optional
+			Values for the parameters, see :ref:`set_values`.  The
+			current values are used if not given.  The values are copied,
+			so later changes to this model do not affect the scorer.
+
+		Returns
+		-------
+		larch.model.scoring.Scorer
+		"""
+		from .scoring import Scorer
+		return Scorer(self, x)
+
+	def _restore_dataframes_link(self, DataFrames dfs, prior_model):
+		"""Link `dfs` back to the model it was linked to before scoring, if any."""
+		if prior_model is None:
+			dfs._model = None
+		else:
+			dfs._link_to_model_structure(prior_model)
+			dfs._read_in_model_parameters()
+
+	def _score_dataframes(
+			self,
+			DataFrames dfs,
+			values,
+			int start_case=0,
+			int stop_case=-1,
+			bint return_probability=True,
+			bint return_logsums=False,
+			int n_threads=0,
+			int n_draws=0,
+			seed=0,
+			case_offset=0,
+	):
+		"""
+		Compute probabilities, logsums and/or simulated choices for a range of cases, without estimation setup.
+
+		The `dfs` need not include choices or weights, nor be attached to this
+		model.  If it includes no availability data, all alternatives are
+		taken as available.  The `dfs` is not modified.
+
+		Parameters
+		----------
+		dfs : DataFrames
+		values : array-like
+			The values of all the parameters, in the order of `pf`.
+		start_case, stop_case : int
+			The range of cases to compute.
+		return_probability, return_logsums : bool
+			What to compute.
+		n_threads : int, optional
+			Defaults to `n_threads`.
+		n_draws : int, default 0
+			The number of simulated choices to draw for each case.
+		seed : int, default 0
+			The seed for the simulated choices.
+		case_offset : int, default 0
+			The number of the case at `start_case`.  Each case has its own
+			random stream, numbered from this, so that the draws for a case
+			do not depend on how the data is split into chunks.
+
+		Returns
+		-------
+		probability : ndarray or None
+		logsums : ndarray or None
+		choices : ndarray[int64] or None
+			The positions of the chosen alternatives, with a column for
+			each draw, or -1 where no alternative is available.
+		"""
+		cdef:
+			l4_float_t logsum_parameter = 1
+		self.unmangle()
+		if not dfs.is_computational_ready(activate=True):
+			raise ValueError('DataFrames is not computational-ready')
+		if stop_case < 0:
+			stop_case = dfs._n_cases()
+		if n_threads <= 0:
+			n_threads = self._n_threads
+		values = numpy.asarray(values, dtype=numpy.float64)
+		if self._logsum_parameter is not None:
+			logsum_parameter = values[self._frame.index.get_loc(self._logsum_parameter)]
+		n_alts = dfs._n_alts()
+
+		prior_model = dfs._model
+		if self.is_mnl():
+			from .mnl import mnl_score_from_dataframes
+			probability = numpy.empty([stop_case-start_case, n_alts], dtype=l4_float_dtype) if return_probability else None
+			logsums = numpy.empty([stop_case-start_case], dtype=l4_float_dtype) if return_logsums else None
+			choices = numpy.empty([stop_case-start_case, n_draws], dtype=numpy.int64) if n_draws > 0 else None
+			try:
+				dfs._link_to_model_structure(self)
+				dfs._read_in_parameter_values(values)
+				mnl_score_from_dataframes(
+					dfs,
+					num_threads=n_threads,
+					start_case=start_case,
+					stop_case=stop_case,
+					probability=probability,
+					logsums=logsums,
+					logsum_parameter=logsum_parameter,
+					choices=choices,
+					seed=seed,
+					case_offset=case_offset,
+				)
+			finally:
+				self._restore_dataframes_link(dfs, prior_model)
+			return probability, logsums, choices
+
+		# nested models read parameters from the model, so these are
+		# computed with the model temporarily set up for this data
+		prior_dataframes = self._dataframes
+		prior_values = self.pvals.copy()
+		prior_n_threads = self._n_threads
+		try:
+			self._dataframes = dfs
+			self._n_threads = n_threads
+			# link first, as setting the values reads them into the attached dataframes
+			dfs._link_to_model_structure(self)
+			self.set_values(values)
+			dfs._read_in_model_parameters()
+			y = self.__d_log_likelihood_from_dataframes_all_rows(
+				return_dll=False,
+				return_bhhh=False,
+				start_case=start_case,
+				stop_case=stop_case,
+				persist=PERSIST_PROBABILITY | PERSIST_UTILITY,
+				probability_only=True,
+			)
+		finally:
+			self._dataframes = prior_dataframes
+			self._n_threads = prior_n_threads
+			self.set_values(prior_values)
+			if prior_dataframes is not None:
+				prior_dataframes._link_to_model_structure(self)
+				prior_dataframes._read_in_model_parameters()
+			if dfs is not prior_dataframes:
+				self._restore_dataframes_link(dfs, prior_model)
+		probability = y.probability[:, :n_alts] if (return_probability or n_draws > 0) else None
+		logsums = y.utility[:, -1] if return_logsums else None
+		choices = None
+		if n_draws > 0:
+			from .mnl import simulate_choices_from_probability
+			choices = numpy.empty([stop_case-start_case, n_draws], dtype=numpy.int64)
+			simulate_choices_from_probability(
+				numpy.ascontiguousarray(probability),
+				choices,
+				seed=seed,
+				case_offset=case_offset,
+				num_threads=n_threads,
+			)
+		if not return_probability:
+			probability = None
+		return probability, logsums, choices
+
+	def simulate_choices(
+			self,
+			n_draws=1,
+			seed=0,
+			*,
+			x=None,
+			data=None,
+			chunk_size=100_000,
+			n_threads=None,
+			return_dataframe=True,
+	):
+		"""
+		Simulate choices by Monte Carlo draws from the model probabilities.
+
+		Choices are drawn within the same parallel loop over cases that
+		computes the probabilities (for MNL models), or in a parallel pass
+		over the probabilities (for nested models), without returning the
+		probabilities.  Each case has its own counter-based random stream,
+		determined by the seed and the position of the case in the data,
+		so the simulated choices are the same whatever the number of
+		threads or the `chunk_size`.
+
+		Parameters
+		----------
+		n_draws : int, default 1
+			The number of simulated choices for each case.
+		seed : int, default 0
+			The random seed.
+		x : {'null', 'init', 'best', array-like, dict, scalar}, optional
+			Values for the parameters, see :ref:`set_values`.  The
+			current values are used if not given.
+		data : DataFrames or DataService, optional
+			The data, which need not include choices.  Defaults to the
+			dataframes, or if there are none, the dataservice, of this model.
+		chunk_size : int, default 100_000
+			The number of cases computed at a time.
+		n_threads : int, optional
+			Defaults to `n_threads`.
+		return_dataframe : bool, default True
+			Return a DataFrame indexed by case, with a column for each draw,
+			giving the codes of the chosen alternatives.  Otherwise return
+			an array of the positions of the chosen alternatives.
+
+		Returns
+		-------
+		pandas.DataFrame or ndarray
+			Cases where no alternative is available have no simulated
+			choice, which is given as -1 in an array, or as a missing
+			value in a DataFrame.
+		"""
+		return self.scorer(x).simulate_choices(
+			data,
+			n_draws=n_draws,
+			seed=seed,
+			chunk_size=chunk_size,
+			n_threads=n_threads,
+			return_dataframe=return_dataframe,
+		)
+
 	def exputility(self, x=None, return_dataframe=None):
 		arr = self.loglike(persist=PERSIST_EXP_UTILITY).exp_utility
 		if return_dataframe == 'names':
@@ -921,7 +1645,7 @@ cdef class Model5c(AbstractChoiceModel):
 					index=idx,
 				)
 				if return_dataframe == 'idce':
-					return result.stack()[self._dataframes._data_av.stack().astype(bool).values]
+					return result.stack()[self._dataframes.data_av.stack().astype(bool).values]
 				elif return_dataframe == 'idca':
 					return result.stack()
 				else:
@@ -1187,7 +1911,7 @@ cdef class Model5c(AbstractChoiceModel):
 		if self._dataframes._array_wt is None:
 			return top_k_accuracy(
 				probability_to_rank(self.probability(x=x)),
-				self._dataframes._data_ch,
+				self._dataframes.data_ch,
 				k=k,
 			)
 		else:
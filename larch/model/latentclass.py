@@ -95,6 +95,212 @@ class LatentClassModel(AbstractChoiceModel):
 		if x is not None:
 			self._k_membership.set_values(x)
 
+	def _fused_mnl_ready(self):
+		"""
+		Check whether the fused latent class kernel can be used.
+
+		This requires that the class membership model and all the class
+		models are MNL models, with data loaded and parameters in sync.
+		"""
+		if self._dataframes is None:
+			return False
+		models = [self._k_membership, *self._k_models.values()]
+		for m in models:
+			is_mnl = getattr(m, 'is_mnl', None)
+			if is_mnl is None or not is_mnl():
+				return False
+			if m.dataframes is None:
+				return False
+		param_names = list(self._k_membership.dataframes.param_names)
+		for m in models[1:]:
+			if list(m.dataframes.param_names) != param_names:
+				return False
+		return True
+
+	def _fused_mnl_loglike(
+			self,
+			start_case=0,
+			stop_case=-1,
+			step_case=1,
+			return_dll=True,
+			return_bhhh=False,
+			return_probability=False,
+			probability_only=False,
+	):
+		"""
+		Compute the log likelihood and gradient with the fused latent class kernel.
+
+		See `mnl_latent_class_d_log_likelihood` for details.
+		"""
+		from .mnl import mnl_latent_class_d_log_likelihood
+		self._k_membership.dataframes.read_in_model_parameters()
+		for m in self._k_models.values():
+			m.dataframes.read_in_model_parameters()
+		return mnl_latent_class_d_log_likelihood(
+			self._k_membership.dataframes,
+			[self._k_models[k].dataframes for k in self._k_model_names()],
+			num_threads=self._k_membership.n_threads,
+			return_dll=return_dll,
+			return_bhhh=return_bhhh,
+			start_case=start_case,
+			stop_case=stop_case,
+			step_case=step_case,
+			return_probability=return_probability,
+			probability_only=probability_only,
+		)
+
+	def _case_mask(self, start_case=0, stop_case=-1, step_case=1, leave_out=-1, keep_only=-1, subsample=-1):
+		"""
+		Find the cases in a slice that are used under cross validation settings.
+
+		Returns
+		-------
+		ndarray[bool] or None
+			For each case in the slice, whether it is used, or None if all are.
+		"""
+		if leave_out < 0 and keep_only < 0:
+			return None
+		if subsample < 1:
+			raise ValueError('subsample must be given when leave_out or keep_only is set')
+		if stop_case == -1:
+			stop_case = self.n_cases
+		rownumber = numpy.arange(self.n_cases)[start_case:stop_case:step_case]
+		mask = numpy.ones(rownumber.shape, dtype=bool)
+		if leave_out >= 0:
+			mask &= (rownumber % subsample != leave_out)
+		if keep_only >= 0:
+			mask &= (rownumber % subsample == keep_only)
+		return mask
+
+	def _case_weights(self, cases, mask=None):
+		"""
+		Get the weights of a slice of cases as an array, or None if unweighted.
+
+		Cases excluded by `mask` get zero weight.
+		"""
+		if self.dataframes.data_wt is not None:
+			wt = numpy.asarray(self.dataframes.data_wt.iloc[cases], dtype=l4_float_dtype).reshape(-1)
+		elif mask is not None:
+			wt = numpy.ones(mask.shape, dtype=l4_float_dtype)
+		else:
+			return None
+		if mask is not None:
+			wt = numpy.where(mask, wt, 0)
+		return wt
+
+	def _posterior_weighted_loglike(
+			self,
+			start_case=0,
+			stop_case=-1,
+			step_case=1,
+			return_bhhh=False,
+			return_probability=False,
+			case_mask=None,
+	):
+		"""
+		Compute the log likelihood and gradient using the kernels of the component models.
+
+		For a mixture, the gradient of the log likelihood of each case is
+
+			sum_k sum_a ch[a] * (pi[k] * dP[k,a] + P[k,a] * dpi[k]) / P[a]
+
+		where `pi` are the class membership probabilities, `P[k,a]` the
+		within-class probabilities and `P[a]` the mixed probabilities.  The
+		first term for class `k` is the casewise gradient of the log
+		likelihood of that class model, with its choices replaced by the
+		posterior share of each choice attributable to that class,
+		`ch[a] * pi[k] * P[k,a] / P[a]`.  The second term is likewise the
+		casewise gradient of the class membership model, with the posterior
+		class probabilities as its choices.  Each component model computes
+		its term exactly, with its own (analytic, parallel) kernel, so this
+		works for any type of class model, and needs only a casewise
+		gradient array, not the derivatives of all the probabilities.
+
+		Cases where `case_mask` is False (if given) are given zero weight,
+		for cross validation.
+		"""
+		import warnings
+		from ..util import dictx
+		from .mnl import loglike_from_probability
+
+		if stop_case == -1:
+			stop_case_ = self.n_cases
+		else:
+			stop_case_ = stop_case
+		cases = slice(start_case, stop_case_, step_case)
+
+		k_names = self._k_model_names()
+		n_alts = self.dataframes.n_alts
+		pnames = self.pf.index
+
+		with warnings.catch_warnings():
+			warnings.simplefilter("ignore", category=ParameterNotInModelWarning)
+			pi = self.class_membership_probability(
+				start_case=start_case, stop_case=stop_case, step_case=step_case,
+			).reindex(columns=k_names).values
+			pk = [
+				numpy.asarray(self._k_models[k_name].probability(
+					start_case=start_case, stop_case=stop_case, step_case=step_case,
+				))[:, :n_alts]
+				for k_name in k_names
+			]
+		pr = sum(pi[:, i, None] * pk[i] for i in range(len(k_names)))
+
+		wt_or_none = self._case_weights(cases, case_mask)
+		wt = numpy.ones(pr.shape[0], dtype=l4_float_dtype) if wt_or_none is None else wt_or_none
+		ch = self.dataframes.array_ch()[cases]
+		if case_mask is not None:
+			# excluded cases contribute nothing, even where a choice has zero probability
+			ch = numpy.where(case_mask[:, None], ch, 0)
+
+		y = dictx()
+		y.ll = loglike_from_probability(pr, ch, wt_or_none)
+		if return_probability:
+			y.probability = pr
+
+		with numpy.errstate(divide='ignore', invalid='ignore'):
+			ch_over_pr = numpy.where(pr > 0, ch / pr, 0)
+
+		G = numpy.zeros([pr.shape[0], len(pnames)], dtype=l4_float_dtype)
+		h = numpy.zeros([pr.shape[0], len(k_names)], dtype=l4_float_dtype)
+		membership = self._k_membership
+		models = [membership, *(self._k_models[k] for k in k_names)]
+		saved = [(m.dataframes.data_ch, m.dataframes.data_wt) for m in models]
+		try:
+			with warnings.catch_warnings():
+				warnings.simplefilter("ignore", category=ParameterNotInModelWarning)
+				for i, k_name in enumerate(k_names):
+					k_ch = ch_over_pr * pi[:, i, None] * pk[i]
+					h[:, i] = k_ch.sum(1)
+					k_dfs = self._k_models[k_name].dataframes
+					full_ch = numpy.zeros([k_dfs.n_cases, k_dfs.n_alts], dtype=l4_float_dtype)
+					full_ch[cases] = k_ch
+					k_dfs.data_ch = pandas.DataFrame(full_ch, index=k_dfs.caseindex, columns=k_dfs.alternative_codes())
+					k_dfs.data_wt = None
+					G += self._k_models[k_name].loglike2(
+						start_case=start_case, stop_case=stop_case, step_case=step_case,
+						persist=persist_flags.PERSIST_D_LOGLIKE_CASEWISE,
+					).dll_casewise.reindex(columns=pnames, fill_value=0).values
+				m_dfs = membership.dataframes
+				full_h = numpy.zeros([m_dfs.n_cases, len(k_names)], dtype=l4_float_dtype)
+				full_h[cases] = h
+				m_dfs.data_ch = pandas.DataFrame(full_h, index=m_dfs.caseindex, columns=m_dfs.alternative_codes())
+				m_dfs.data_wt = None
+				G += membership.loglike2(
+					start_case=start_case, stop_case=stop_case, step_case=step_case,
+					persist=persist_flags.PERSIST_D_LOGLIKE_CASEWISE,
+				).dll_casewise.reindex(columns=pnames, fill_value=0).values
+		finally:
+			for m, (m_ch, m_wt) in zip(models, saved):
+				m.dataframes.data_ch = m_ch
+				m.dataframes.data_wt = m_wt
+				m.clear_best_loglike()
+
+		y.dll = pandas.Series(data=wt @ G, index=pnames)
+		if return_bhhh:
+			y.bhhh = (G * wt[:, None]).T @ G
+		return y
+
 	def class_membership_probability(self, x=None, start_case=0, stop_case=-1, step_case=1):
 		self.__prep_for_compute(x)
 		return self._k_membership.probability(
@@ -131,20 +337,26 @@ class LatentClassModel(AbstractChoiceModel):
 
 		n_rows = ((stop_case - start_case) // step_case) + (1 if (stop_case - start_case) % step_case else 0)
 
-		p = numpy.zeros([n_rows, self.dataframes.n_alts])
-
-		import warnings
-		with warnings.catch_warnings():
-			warnings.simplefilter("ignore", category=ParameterNotInModelWarning)
-			k_membership_probability = self.class_membership_probability(
+		if self._fused_mnl_ready():
+			p = self._fused_mnl_loglike(
 				start_case=start_case, stop_case=stop_case, step_case=step_case,
-			)
-			for k_name, k_model in self._k_models.items():
-				k_pr = k_model.probability(start_case=start_case, stop_case=stop_case, step_case=step_case)
-				p += (
-						numpy.asarray( k_pr[:,:self.dataframes.n_alts] )
-						* k_membership_probability.loc[:,k_name].values[:, None]
+				probability_only=True,
+			).probability
+		else:
+			p = numpy.zeros([n_rows, self.dataframes.n_alts])
+
+			import warnings
+			with warnings.catch_warnings():
+				warnings.simplefilter("ignore", category=ParameterNotInModelWarning)
+				k_membership_probability = self.class_membership_probability(
+					start_case=start_case, stop_case=stop_case, step_case=step_case,
 				)
+				for k_name, k_model in self._k_models.items():
+					k_pr = k_model.probability(start_case=start_case, stop_case=stop_case, step_case=step_case)
+					p += (
+							numpy.asarray( k_pr[:,:self.dataframes.n_alts] )
+							* k_membership_probability.loc[:,k_name].values[:, None]
+					)
 
 		if return_dataframe:
 			return pandas.DataFrame(
@@ -159,20 +371,22 @@ class LatentClassModel(AbstractChoiceModel):
 		"""
 		Compute the partial derivative of probability w.r.t. the parameters.
 
-		Note this function is known to be incomplete.  It computes the
-		derivative only within the classes, not for the class membership model.
+		The derivative includes both the parameters of the class models and
+		those of the class membership model.  This builds arrays of shape
+		[n_cases, n_alts, n_params] for each class; the log likelihood and
+		its gradient are computed without them, see `loglike2`.
 
 		Parameters
 		----------
-		x
-		start_case
-		stop_case
-		step_case
-		return_dataframe
+		x : {'null', 'init', 'best', array-like, dict, scalar}, optional
+			Values for the parameters.  See :ref:`set_values` for details.
+		start_case, stop_case, step_case : int, optional
+			The cases to include.
 
 		Returns
 		-------
-
+		ndarray
+			Of shape [n_cases, n_alts, n_params].
 		"""
 		self.__prep_for_compute(x)
 
@@ -264,71 +478,51 @@ class LatentClassModel(AbstractChoiceModel):
 			Other arrays are also included if `persist` is set to True.
 
 		"""
-		if leave_out != -1 or keep_only != -1 or subsample != -1:
-			raise NotImplementedError()
-
 		from ..util import dictx
 
 		self.__prep_for_compute(x)
-		pr = self.probability(
-			x=None,
-			start_case=start_case, stop_case=stop_case, step_case=step_case,
+
+		case_mask = self._case_mask(start_case, stop_case, step_case, leave_out, keep_only, subsample)
+		full_data = (
+			case_mask is None
+			and start_case==0 and (stop_case==-1 or stop_case==self.n_cases) and step_case==1
 		)
 
-		y = dictx()
+		if case_mask is None and self._fused_mnl_ready():
+			# membership, class probabilities and the gradient in one pass,
+			# without the [n_cases, n_alts, n_params] derivative arrays
+			y = self._fused_mnl_loglike(
+				start_case=start_case, stop_case=stop_case, step_case=step_case,
+				return_dll=not probability_only,
+				return_bhhh=bool(persist & persist_flags.PERSIST_BHHH),
+				return_probability=bool(persist & persist_flags.PERSIST_PROBABILITY),
+				probability_only=probability_only,
+			)
+			if probability_only:
+				return y
+			if full_data:
+				self._check_if_best(y.ll)
+			return y
 
 		if probability_only:
+			y = dictx()
 			y.ll = numpy.nan
-			y.probability = pr
+			y.probability = self.probability(
+				x=None,
+				start_case=start_case, stop_case=stop_case, step_case=step_case,
+			)
 			return y
 
-		d_p = self.d_probability(
-			x=None,
+		# casewise gradients from the kernels of the component models,
+		# without the [n_cases, n_alts, n_params] derivative arrays
+		y = self._posterior_weighted_loglike(
 			start_case=start_case, stop_case=stop_case, step_case=step_case,
+			return_bhhh=bool(persist & persist_flags.PERSIST_BHHH),
+			return_probability=bool(persist & persist_flags.PERSIST_PROBABILITY),
+			case_mask=case_mask,
 		)
 
-		from .nl import d_loglike_from_d_probability
-		from .mnl import loglike_from_probability
-
-		if stop_case == -1:
-			stop_case_ = self.n_cases
-		else:
-			stop_case_ = stop_case
-
-		if self.dataframes.data_wt is not None:
-			wt = self.dataframes.data_wt.iloc[start_case:stop_case_:step_case]
-		else:
-			wt = None
-
-		ch = self.dataframes.array_ch()[start_case:stop_case_:step_case]
-
-		y.ll = loglike_from_probability(
-			pr,
-			ch,
-			wt
-		)
-
-		if persist & persist_flags.PERSIST_PROBABILITY:
-			y.probability = pr
-
-		if persist & persist_flags.PERSIST_BHHH:
-			y.dll, y.bhhh = d_loglike_from_d_probability(
-				pr,
-				d_p,
-				ch,
-				wt,
-				True
-			)
-		else:
-			y.dll = d_loglike_from_d_probability(
-				pr,
-				d_p,
-				ch,
-				wt,
-				False
-			)
-
-		if start_case==0 and (stop_case==-1 or stop_case==self.n_cases) and step_case==1:
+		if full_data:
 			self._check_if_best(y.ll)
 
 		return y
@@ -457,21 +651,22 @@ class LatentClassModel(AbstractChoiceModel):
 			stop_case_ = self.n_cases
 		else:
 			stop_case_ = stop_case
+		cases = slice(start_case, stop_case_, step_case)
 
-		if self.dataframes.data_wt is not None:
-			wt = self.dataframes.data_wt.iloc[start_case:stop_case_:step_case]
-		else:
-			wt = None
+		case_mask = self._case_mask(start_case, stop_case, step_case, leave_out, keep_only, subsample)
+		ch = self.dataframes.array_ch()[cases]
+		if case_mask is not None:
+			ch = numpy.where(case_mask[:, None], ch, 0)
 
 		from ..util import dictx
 		y = dictx()
 		y.ll = loglike_from_probability(
-			pr,
-			self.dataframes.array_ch()[start_case:stop_case_:step_case],
-			wt
+			numpy.asarray(pr, dtype=l4_float_dtype),
+			ch,
+			self._case_weights(cases, case_mask),
 		)
 
-		if start_case==0 and (stop_case==-1 or stop_case==self.n_cases) and step_case==1:
+		if case_mask is None and start_case==0 and (stop_case==-1 or stop_case==self.n_cases) and step_case==1:
 			self._check_if_best(y.ll)
 
 		if persist & persist_flags.PERSIST_PROBABILITY:
@@ -480,6 +675,205 @@ class LatentClassModel(AbstractChoiceModel):
 			return y
 		return y.ll
 
+	def class_posterior_probability(self, x=None):
+		"""
+		Compute the posterior probability of class membership for each case.
+
+		The posterior for class `k` is proportional to the class membership
+		probability of `k` times the probability of the observed choice under
+		the model for class `k`.
+
+		Parameters
+		----------
+		x : {'null', 'init', 'best', array-like, dict, scalar}, optional
+			Values for the parameters.  See :ref:`set_values` for details.
+
+		Returns
+		-------
+		pandas.DataFrame
+			One row per case and one column per class.
+		"""
+		self.__prep_for_compute(x)
+		import warnings
+		with warnings.catch_warnings():
+			warnings.simplefilter("ignore", category=ParameterNotInModelWarning)
+			k_membership_probability = self.class_membership_probability()
+			ch = self.dataframes.array_ch()
+			n_alts = self.dataframes.n_alts
+			posterior = pandas.DataFrame(
+				0.0,
+				index=k_membership_probability.index,
+				columns=k_membership_probability.columns,
+			)
+			for k_name, k_model in self._k_models.items():
+				k_pr = numpy.asarray(k_model.probability())[:, :n_alts]
+				posterior.loc[:, k_name] = (
+					k_membership_probability.loc[:, k_name].values * (k_pr * ch).sum(1)
+				)
+		total = posterior.sum(1)
+		total[total == 0] = 1.0
+		return posterior.div(total, axis=0)
+
+	def estimate_em(
+			self,
+			*,
+			maxiter=100,
+			ctol=1e-6,
+			m_step_method='slsqp',
+			m_step_maxiter=None,
+			responsibilities=None,
+			n_jobs=1,
+			quiet=True,
+	):
+		"""
+		Estimate the model parameters with the expectation-maximization algorithm.
+
+		Each iteration computes the posterior class membership probabilities
+		(responsibilities) at the current parameter values, and then maximizes
+		the expected complete-data log likelihood.  That is the sum of each class
+		model's log likelihood with case weights multiplied by that class's
+		responsibilities, plus the class membership model's log likelihood with
+		the responsibilities as (fractional) choices.  These weighted models are
+		estimated jointly as a `ModelGroup`, so parameters shared across classes
+		are handled correctly, and the class models can be evaluated in parallel.
+
+		Estimation starts from the current parameter values, so a model can be
+		warm started by setting values (or giving `responsibilities`) first.
+
+		Parameters
+		----------
+		maxiter : int, default 100
+			Maximum number of EM iterations.
+		ctol : float, default 1e-6
+			Convergence tolerance on the improvement in the log likelihood
+			from one iteration to the next.
+		m_step_method : str, default 'slsqp'
+			The optimization method for each maximization step, see
+			`maximize_loglike`.
+		m_step_maxiter : int, optional
+			Limit the number of optimizer iterations in each maximization step.
+			A few iterations per step (generalized EM) is often sufficient.
+		responsibilities : pandas.DataFrame or array-like, optional
+			Initial posterior class membership probabilities, with one row per
+			case and one column per class.  If given, the first iteration uses
+			these instead of computing them from the current parameters.
+		n_jobs : int, default 1
+			Number of worker processes used to evaluate the class models in
+			the maximization steps, see `ModelGroup.n_jobs`.
+		quiet : bool, default True
+			Whether to suppress the progress display of each maximization step.
+
+		Returns
+		-------
+		dictx
+			Results including the final log likelihood ('loglike'), parameter
+			values ('x'), whether the algorithm converged ('converged'), and the
+			log likelihood at each iteration ('history').
+		"""
+		from ..util import dictx
+		from ..util.timesize import Timer
+		from .model_group import ModelGroup
+		import warnings
+
+		self.unmangle()
+		if self._dataframes is None:
+			raise MissingDataError("no dataframes are set")
+		timer = Timer()
+
+		k_names = self._k_model_names()
+		k_membership_dfs = self._k_membership.dataframes
+		original_wt = self._dataframes.data_wt
+		original_membership_ch = k_membership_dfs.data_ch
+		original_membership_wt = k_membership_dfs.data_wt
+		caseindex = self._dataframes.caseindex
+		if original_wt is not None:
+			case_weight = numpy.asarray(original_wt, dtype=l4_float_dtype).reshape(-1)
+		else:
+			case_weight = numpy.ones(len(caseindex), dtype=l4_float_dtype)
+
+		history = []
+		ll = self.loglike()
+		history.append(ll)
+		converged = False
+		iteration = 0
+		try:
+			for iteration in range(1, maxiter+1):
+
+				# E-step
+				if iteration == 1 and responsibilities is not None:
+					h = numpy.asarray(responsibilities, dtype=l4_float_dtype)
+					if isinstance(responsibilities, pandas.DataFrame):
+						h = responsibilities.reindex(index=caseindex, columns=k_names).values.astype(l4_float_dtype)
+				else:
+					h = self.class_posterior_probability().reindex(columns=k_names).values.astype(l4_float_dtype)
+				if h.shape != (len(caseindex), len(k_names)):
+					raise ValueError(f'responsibilities must have shape {(len(caseindex), len(k_names))}, not {h.shape}')
+
+				# M-step
+				k_membership_dfs.data_ch = pandas.DataFrame(
+					h,
+					index=k_membership_dfs.caseindex,
+					columns=k_membership_dfs.alternative_codes(),
+				)
+				if original_wt is not None:
+					k_membership_dfs.data_wt = pandas.DataFrame(
+						case_weight, index=k_membership_dfs.caseindex, columns=['wt'],
+					)
+				for i, k_name in enumerate(k_names):
+					self._k_models[k_name].dataframes.data_wt = pandas.DataFrame(
+						case_weight * h[:, i], index=caseindex, columns=['wt'],
+					)
+				group = ModelGroup([self._k_membership, *(self._k_models[k] for k in k_names)], n_jobs=n_jobs)
+				try:
+					with warnings.catch_warnings():
+						warnings.simplefilter("ignore", category=ParameterNotInModelWarning)
+						group.maximize_loglike(
+							method=m_step_method,
+							maxiter=m_step_maxiter,
+							quiet=quiet,
+						)
+						vals = group.pf.value
+				finally:
+					group.close_pool()
+
+				# restore the data before evaluating the mixed likelihood
+				k_membership_dfs.data_ch = original_membership_ch
+				k_membership_dfs.data_wt = original_membership_wt
+				for k_name in k_names:
+					self._k_models[k_name].dataframes.data_wt = original_wt
+				self.set_values(**vals)
+				ll_new = self.loglike()
+				history.append(ll_new)
+				if abs(ll_new - ll) < ctol:
+					ll = ll_new
+					converged = True
+					break
+				ll = ll_new
+		finally:
+			k_membership_dfs.data_ch = original_membership_ch
+			k_membership_dfs.data_wt = original_membership_wt
+			for k_name in k_names:
+				self._k_models[k_name].dataframes.data_wt = original_wt
+			for m in (self._k_membership, *self._k_models.values()):
+				m.clear_best_loglike()
+			self.clear_best_loglike()
+
+		timer.stop()
+		result = dictx(
+			loglike=self.loglike(),
+			x=pandas.Series(self.pvals, index=self.pnames),
+			converged=converged,
+			iterations=iteration,
+			history=pandas.Series(history, name='loglike').rename_axis('iteration'),
+			elapsed_time=timer.elapsed(),
+			method='EM',
+			n_cases=self.n_cases,
+			message='converged' if converged else 'maximum iterations reached',
+		)
+		result['logloss'] = -result['loglike'] / self.total_weight()
+		self._most_recent_estimation_result = result
+		return result
+
 
 
 	@property
@@ -514,6 +908,38 @@ class LatentClassModel(AbstractChoiceModel):
 				alt_codes=x.alternative_codes(),
 			)
 
+	def _scale_case_weights(self, factor):
+		# the class models hold their own references to the case weights
+		dfs_list = [self._dataframes, *(m.dataframes for m in self._k_models.values())]
+		saved = [dfs.data_wt for dfs in dfs_list]
+		base = 1.0 if saved[0] is None else saved[0].values.reshape(-1)
+		wt = pandas.DataFrame(
+			numpy.asarray(factor, dtype=l4_float_dtype) * base,
+			index=self._dataframes.caseindex,
+			columns=['replicate_weight'],
+		)
+		for dfs in dfs_list:
+			dfs.data_wt = wt
+		self.clear_best_loglike()
+		return saved
+
+	def _restore_case_weights(self, saved):
+		dfs_list = [self._dataframes, *(m.dataframes for m in self._k_models.values())]
+		for dfs, wt in zip(dfs_list, saved):
+			dfs.data_wt = wt
+		self.clear_best_loglike()
+
+	@property
+	def n_threads(self):
+		"""int : Number of threads used by the class membership and class models."""
+		return self._k_membership.n_threads
+
+	@n_threads.setter
+	def n_threads(self, value):
+		self._k_membership.n_threads = value
+		for m in self._k_models.values():
+			m.n_threads = value
+
 	def mangle(self, *args, **kwargs):
 		self._k_membership.mangle()
 		for m in self._k_models.values():
@@ -532,12 +958,12 @@ class LatentClassModel(AbstractChoiceModel):
 				m.unmangle()
 			self._mangled = False
 
-	def load_data(self, dataservice=None, autoscale_weights=True, log_warnings=True):
+	def load_data(self, dataservice=None, autoscale_weights=True, log_warnings=True, float_dtype=numpy.float64):
 		self.unmangle()
 		if dataservice is not None:
 			self._dataservice = dataservice
 		if self._dataservice is not None:
-			dfs = self._dataservice.make_dataframes(self.required_data(), log_warnings=log_warnings)
+			dfs = self._dataservice.make_dataframes(self.required_data(), log_warnings=log_warnings, float_dtype=float_dtype)
 			if autoscale_weights and dfs.data_wt is not None:
 				dfs.autoscale_weights()
 			self.dataframes = dfs
@@ -589,4 +1015,16 @@ class LatentClassModel(AbstractChoiceModel):
 			raise MissingDataError("no dataframes are set")
 		return self._k_membership.n_cases
 
+	def total_weight(self):
+		"""
+		The total weight of cases in the attached dataframes.
+
+		Returns
+		-------
+		float
+		"""
+		if self._dataframes is None:
+			raise MissingDataError("no dataframes are set")
+		return self._dataframes.total_weight()
+
 
@@ -6,6 +6,7 @@ from ..general_precision cimport l4_float_t
 
 include "fastmath.pxi"
 from libc.stdlib cimport malloc, free
+from libc.stdint cimport int64_t, uint64_t
 from libc.math cimport exp, log
 from numpy.math cimport expf, logf
 
@@ -123,7 +124,7 @@ cdef void _mnl_logsum_from_utility(
 		int    n_alts,
 		l4_float_t* utility,     # input
 		l4_float_t* logsum,      # output (scalar)
-):
+) nogil:
 	cdef:
 		int i
 		l4_float_t sum_expU = 0
@@ -145,7 +146,7 @@ cdef void _mnl_logsum_from_utility_MU(
 		l4_float_t* utility,     # input
 		l4_float_t* logsum,      # output (scalar)
 		l4_float_t  mu           # input
-):
+) nogil:
 	cdef:
 		int i
 		l4_float_t sum_expU = 0
@@ -457,6 +458,67 @@ cdef void _mnl_d_log_likelihood_from_d_utility(
 
 
 
+@cython.boundscheck(False)
+@cython.initializedcheck(False)
+@cython.wraparound(False)
+cdef void _mnl_d2_log_likelihood_from_d_utility(
+		int             n_alts,
+		int             n_params,
+		l4_float_t[:]   choice,         # input [n_alts]
+		l4_float_t      weight,         # input scalar
+		l4_float_t[:,:] dU,             # input [n_alts, n_params]
+		l4_float_t*     probability,    # input [n_alts]
+		l4_float_t[:,:] d2_loglike_cum, # output [n_params, n_params]
+		l4_float_t*     dU_mean,        # temp  [n_params]
+) nogil:
+	"""
+	Accumulate the exact hessian of the MNL log likelihood for one case.
+
+	When utility is linear in the parameters, the hessian for a case is
+	-Σ_ch · Σ_i P_i (dU_i - dŪ)(dU_i - dŪ)ᵀ, where dŪ = Σ_i P_i dU_i.
+	"""
+	cdef:
+		int i, v, v2
+		l4_float_t total_ch = 0
+		l4_float_t tempvalue
+
+	if weight == 0:
+		return
+
+	for i in range(n_alts):
+		total_ch += choice[i]
+	total_ch *= weight
+
+	if total_ch == 0:
+		return
+
+	for v in range(n_params):
+		dU_mean[v] = 0
+	for i in range(n_alts):
+		if probability[i] == 0:
+			continue
+		for v in range(n_params):
+			dU_mean[v] += probability[i] * dU[i,v]
+
+	for i in range(n_alts):
+		if probability[i] == 0:
+			continue
+		for v in range(n_params):
+			tempvalue = (dU[i,v] - dU_mean[v]) * probability[i] * total_ch
+			if tempvalue == 0:
+				continue
+			for v2 in range(n_params):
+				d2_loglike_cum[v,v2] -= tempvalue * (dU[i,v2] - dU_mean[v2])
+
+
+
+
+def _scratch(workspace, name, shape):
+	"""A zeroed array, from the workspace if one is given."""
+	if workspace is None:
+		return numpy.zeros(shape, dtype=l4_float_dtype)
+	return workspace.zeros(name, shape, l4_float_dtype)
+
 
 @cython.boundscheck(False)
 @cython.initializedcheck(False)
@@ -474,7 +536,23 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 		int         keep_only=-1,
 		int         subsample= 1,
 		bint        probability_only=False,
+		object      workspace=None,
+		int         chunksize=0,
 ):
+	"""
+	Compute the MNL log likelihood and derivatives, one case at a time.
+
+	Parameters
+	----------
+	workspace : KernelWorkspace, optional
+		Holds the per-thread scratch buffers between calls.  Arrays that
+		are returned (because of `persist`) are always newly allocated.
+	chunksize : int, default 0
+		The number of cases handed to a thread at a time.  Threads take
+		new chunks as they finish, so smaller chunks balance uneven work
+		better at the cost of more scheduling.  If zero, the cases are
+		split evenly into one chunk per thread.
+	"""
 	cdef:
 		int c = 0
 		int c_local = 0
@@ -484,7 +562,7 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 		int n_cases_local = n_cases
 		int n_alts  = dfs._n_alts()
 		int n_params= dfs._n_model_params
-		l4_float_t[:] array_ch
+		l4_float_t[:,:] array_ch
 		l4_float_t[:] LL_case
 		l4_float_t[:,:] dLL_case, dLL_total, dLL_temp
 		l4_float_t[:,:] raw_utility
@@ -492,6 +570,9 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 		l4_float_t[:,:] probability
 		l4_float_t[:,:,:] dU
 		l4_float_t[:,:,:] bhhh_total
+		l4_float_t[:,:,:] d2LL_total
+		l4_float_t[:,:] d2LL_temp
+		bint            return_d2ll = False
 		l4_float_t*     buffer_exp_utility
 		l4_float_t*     buffer_probability
 		l4_float_t      ll = 0
@@ -518,7 +599,7 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 	if dfs._data_ch is None and not probability_only:
 		raise ValueError('DataFrames does not define data_ch')
 
-	if dfs._data_av is None:
+	if dfs._data_av is None and not probability_only:
 		raise ValueError('DataFrames does not define data_av')
 
 	if step_case <= 0:
@@ -532,12 +613,22 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 		if stop_case<0:
 			stop_case = n_cases
 
+		if persist & PERSIST_D2_LOGLIKE and not probability_only and _mnl_utility_is_linear(dfs):
+			# the analytic hessian is built from dU in the same pass as dll
+			return_d2ll = True
+			return_dll = True
+
 		if return_bhhh:
 			# must compute dll to get bhhh
 			return_dll = True
 
 		n_cases_local = ((stop_case - start_case) // step_case) + (1 if (stop_case - start_case) % step_case else 0)
 
+		if chunksize <= 0:
+			chunksize = n_cases_local // num_threads + (1 if n_cases_local % num_threads else 0)
+		if chunksize <= 0:
+			chunksize = 1
+
 		storage_size_U    = n_cases_local if persist & PERSIST_UTILITY            else num_threads
 		storage_size_expU = n_cases_local if persist & PERSIST_EXP_UTILITY        else num_threads
 		storage_size_P    = n_cases_local if persist & PERSIST_PROBABILITY        else num_threads
@@ -545,24 +636,33 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 		storage_size_dLLc = n_cases_local if persist & PERSIST_D_LOGLIKE_CASEWISE else num_threads
 		storage_size_dU   = n_cases_local if persist & PERSIST_D_UTILITY          else num_threads
 
-		raw_utility = numpy.zeros([storage_size_U,   n_alts], dtype=l4_float_dtype)
-		exp_utility = numpy.zeros([storage_size_expU,n_alts], dtype=l4_float_dtype)
-		probability = numpy.zeros([storage_size_P,   n_alts], dtype=l4_float_dtype)
+		# per-thread buffers come from the workspace, persisted ones are returned so must be new
+		raw_utility = _scratch(None if persist & PERSIST_UTILITY else workspace, 'U', [storage_size_U, n_alts])
+		exp_utility = _scratch(None if persist & PERSIST_EXP_UTILITY else workspace, 'expU', [storage_size_expU, n_alts])
+		probability = _scratch(None if persist & PERSIST_PROBABILITY else workspace, 'P', [storage_size_P, n_alts])
 
-		LL_case  = numpy.zeros([storage_size_LLc,], dtype=l4_float_dtype)
+		LL_case  = _scratch(None if persist & PERSIST_LOGLIKE_CASEWISE else workspace, 'LLc', [storage_size_LLc])
+		# choices are copied per case, as idce choices are not stored densely
+		array_ch = _scratch(workspace, 'ch', [num_threads, n_alts])
 
 		if return_dll:
-			dU = numpy.zeros([storage_size_dU,n_alts, n_params], dtype=l4_float_dtype)
-			dLL_case  = numpy.zeros([storage_size_dLLc,n_params], dtype=l4_float_dtype)
-			dLL_total = numpy.zeros([num_threads,n_params], dtype=l4_float_dtype)
-			dLL_temp  = numpy.zeros([num_threads,n_params], dtype=l4_float_dtype)
+			dU = _scratch(None if persist & PERSIST_D_UTILITY else workspace, 'dU', [storage_size_dU, n_alts, n_params])
+			dLL_case  = _scratch(None if persist & PERSIST_D_LOGLIKE_CASEWISE else workspace, 'dLLc', [storage_size_dLLc, n_params])
+			dLL_total = _scratch(workspace, 'dLL_total', [num_threads, n_params])
+			dLL_temp  = _scratch(workspace, 'dLL_temp', [num_threads, n_params])
 		if return_bhhh:
-			bhhh_total = numpy.zeros([num_threads,n_params,n_params], dtype=l4_float_dtype)
+			bhhh_total = _scratch(workspace, 'bhhh_total', [num_threads, n_params, n_params])
+		else:
+			# never written, but must be bound to pass slices of it
+			bhhh_total = numpy.zeros([num_threads, 0, 0], dtype=l4_float_dtype)
+		if return_d2ll:
+			d2LL_total = _scratch(workspace, 'd2LL_total', [num_threads, n_params, n_params])
+			d2LL_temp = _scratch(workspace, 'd2LL_temp', [num_threads, n_params])
 
 		with nogil, parallel(num_threads=num_threads):
 			thread_number = threadid()
 
-			for c in prange(start_case, stop_case, step_case):
+			for c in prange(start_case, stop_case, step_case, schedule='dynamic', chunksize=chunksize):
 
 				if leave_out >= 0 and c % subsample == leave_out:
 					continue
@@ -602,10 +702,12 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 				if probability_only:
 					continue
 
+				dfs._copy_choice_onecase(c, array_ch[thread_number])
+
 				ll_temp = _mnl_log_likelihood_from_probability_stride(
 					n_alts,
 					probability[store_number_P], # output
-					dfs._array_ch[c,:],
+					array_ch[thread_number],
 				) * weight
 				ll += ll_temp
 				LL_case[store_number_LLc] += ll_temp
@@ -615,7 +717,7 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 						_mnl_d_log_likelihood_from_d_utility(
 							n_alts,
 							n_params,
-							dfs._array_ch[c,:],         # input [n_alts]
+							array_ch[thread_number],    # input [n_alts]
 							weight,                     # input scalar
 							dU[store_number_dU],          # input [n_alts, n_params]
 							buffer_probability,         # output [n_alts]
@@ -626,6 +728,17 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 							bhhh_total[thread_number],
 							&dLL_temp[thread_number,0],
 						)
+						if return_d2ll:
+							_mnl_d2_log_likelihood_from_d_utility(
+								n_alts,
+								n_params,
+								array_ch[thread_number],    # input [n_alts]
+								weight,                     # input scalar
+								dU[store_number_dU],        # input [n_alts, n_params]
+								buffer_probability,         # input [n_alts]
+								d2LL_total[thread_number],  # output [n_params, n_params]
+								&d2LL_temp[thread_number,0],
+							)
 
 		if probability_only:
 			ll = numpy.nan
@@ -666,6 +779,8 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 				result.dutility = dU.base
 		if return_bhhh:
 			result.bhhh = bhhh
+		if return_d2ll:
+			result.d2ll = d2LL_total.base.sum(0) * dfs._weight_normalization
 
 		return result
 
@@ -677,73 +792,1250 @@ def mnl_d_log_likelihood_from_dataframes_all_rows(
 
 
 
+cdef inline uint64_t _splitmix64(uint64_t z) nogil:
+	z = z + 0x9E3779B97F4A7C15ULL
+	z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL
+	z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL
+	return z ^ (z >> 31)
+
+
+cdef inline double _counter_uniform(uint64_t seed, uint64_t case_number, uint64_t draw) nogil:
+	"""
+	A uniform random number in [0,1), from a counter-based generator.
+
+	The value depends only on the seed, the case number and the draw number,
+	not on the order in which cases are visited, so a parallel loop over cases
+	gives the same draws whatever the number of threads or chunking.
+	"""
+	return (_splitmix64(_splitmix64(seed ^ _splitmix64(case_number)) + draw) >> 11) * (1.0 / 9007199254740992.0)
+
+
+cdef void _draw_choices(
+		int          n_alts,
+		l4_float_t*  probability,   # input [n_alts]
+		int64_t[:]   choices,       # output [n_draws]
+		uint64_t     seed,
+		uint64_t     case_number,
+) nogil:
+	"""Draw simulated choices for one case, as alternative positions (-1 if none is available)."""
+	cdef:
+		int i, j, last
+		l4_float_t total = 0
+		l4_float_t cum, target
+
+	last = -1
+	for j in range(n_alts):
+		if probability[j] > 0:
+			total += probability[j]
+			last = j
+	for i in range(choices.shape[0]):
+		if last < 0:
+			choices[i] = -1
+			continue
+		target = _counter_uniform(seed, case_number, i) * total
+		cum = 0
+		choices[i] = last
+		for j in range(last):
+			cum += probability[j]
+			if probability[j] > 0 and cum > target:
+				choices[i] = j
+				break
+
+
 @cython.boundscheck(False)
 @cython.initializedcheck(False)
 @cython.wraparound(False)
-def mnl_logsums_from_dataframes_all_rows(
-		DataFrames dfs,
-		l4_float_t    logsum_parameter,
-		l4_float_t[:] logsums, # output
+def simulate_choices_from_probability(
+		l4_float_t[:,:] probability,
+		int64_t[:,:]    choices,
+		uint64_t        seed=0,
+		int64_t         case_offset=0,
+		int             num_threads=1,
+):
+	"""
+	Draw simulated choices from an array of probabilities.
+
+	Parameters
+	----------
+	probability : l4_float_t[n_cases, n_alts]
+	choices : int64_t[n_cases, n_draws]
+		Output array for the positions of the chosen alternatives.
+	seed : int
+	case_offset : int
+		The number of the first case, for the random streams.
+	num_threads : int
+	"""
+	cdef:
+		int c
+		int n_alts = probability.shape[1]
+	if choices.shape[0] != probability.shape[0]:
+		raise ValueError('choices and probability must have the same number of cases')
+	if num_threads <= 0:
+		num_threads = 1
+	with nogil, parallel(num_threads=num_threads):
+		for c in prange(probability.shape[0]):
+			_draw_choices(n_alts, &probability[c, 0], choices[c], seed, case_offset + c)
+
+
+@cython.boundscheck(False)
+@cython.initializedcheck(False)
+@cython.wraparound(False)
+def mnl_score_from_dataframes(
+		DataFrames  dfs,
+		int         num_threads=1,
+		int         start_case=0,
+		int         stop_case=-1,
+		l4_float_t[:,:] probability=None,
+		l4_float_t[:]   logsums=None,
+		l4_float_t  logsum_parameter=1,
+		int64_t[:,:] choices=None,
+		uint64_t    seed=0,
+		int64_t     case_offset=0,
 ):
+	"""
+	Compute MNL probabilities, logsums and/or simulated choices, for applying a model.
+
+	This is the scoring counterpart of `mnl_d_log_likelihood_from_dataframes_all_rows`,
+	with nothing computed for estimation: no choices or weights are used, and
+	no likelihood or derivative buffers are allocated.  The parameter values
+	must already be read into `dfs`.  Simulated choices are drawn in the same
+	pass, from a random stream for each case (see `_counter_uniform`), so they
+	are the same whatever the number of threads.  All alternatives are available
+	if `dfs` has no availability data.
+
+	Parameters
+	----------
+	dfs : DataFrames
+	num_threads : int
+	start_case, stop_case : int
+		The range of cases to compute.
+	probability : l4_float_t[stop_case-start_case, n_alts], optional
+		Output array for the probabilities.
+	logsums : l4_float_t[stop_case-start_case], optional
+		Output array for the logsums.
+	logsum_parameter : l4_float_t, default 1
+		The scale of the logsums.
+	choices : int64_t[stop_case-start_case, n_draws], optional
+		Output array for the positions of simulated choices.
+	seed : int
+		The seed for the simulated choices.
+	case_offset : int
+		The number of case `start_case`, for the random streams.  The
+		random stream for case `c` is numbered `case_offset + c - start_case`.
+	"""
 	cdef:
 		int c = 0
-		int v
 		int n_cases = dfs._n_cases()
 		int n_alts  = dfs._n_alts()
-		int n_params= dfs._n_model_params
-		l4_float_t[:] array_ch
-		l4_float_t[:] dLL_case, dLL_total
-		l4_float_t[:] raw_utility
-		l4_float_t[:] probability
-		l4_float_t[:,:] dU
+		bint do_probability = probability is not None
+		bint do_logsums = logsums is not None
+		bint do_choices = choices is not None
+		l4_float_t[:,:] raw_utility
+		l4_float_t[:,:] exp_utility
+		l4_float_t[:,:] probability_temp
 		l4_float_t*     buffer_probability
+		int             thread_number = 0
+
+	if not dfs._is_computational_ready(activate=True):
+		raise ValueError('DataFrames is not computational-ready')
+
+	if num_threads <= 0:
+		num_threads = 1
+
+	if stop_case < 0:
+		stop_case = n_cases
+
+	if do_probability and (probability.shape[0] != stop_case-start_case or probability.shape[1] != n_alts):
+		raise ValueError(f'probability must have shape {(stop_case-start_case, n_alts)}')
+	if do_logsums and logsums.shape[0] != stop_case-start_case:
+		raise ValueError(f'logsums must have shape {(stop_case-start_case,)}')
+	if do_choices and choices.shape[0] != stop_case-start_case:
+		raise ValueError(f'choices must have {stop_case-start_case} rows')
+
+	try:
+		raw_utility = numpy.zeros([num_threads, n_alts], dtype=l4_float_dtype)
+		exp_utility = numpy.zeros([num_threads, n_alts], dtype=l4_float_dtype)
+		probability_temp = numpy.zeros([num_threads, n_alts], dtype=l4_float_dtype)
+
+		with nogil, parallel(num_threads=num_threads):
+			thread_number = threadid()
+
+			for c in prange(start_case, stop_case):
+				dfs._compute_utility_onecase(c, raw_utility[thread_number], n_alts)
+				if do_probability:
+					buffer_probability = &probability[c-start_case, 0]
+				else:
+					buffer_probability = &probability_temp[thread_number, 0]
+				_mnl_probability_from_utility(
+					n_alts,
+					&raw_utility[thread_number, 0],  # input
+					&exp_utility[thread_number, 0],  # output
+					buffer_probability,              # output
+				)
+				if do_choices:
+					_draw_choices(n_alts, buffer_probability, choices[c-start_case], seed, case_offset + c - start_case)
+				if do_logsums:
+					if logsum_parameter == 1:
+						_mnl_logsum_from_utility(
+							n_alts,
+							&raw_utility[thread_number, 0],
+							&logsums[c-start_case],
+						)
+					else:
+						_mnl_logsum_from_utility_MU(
+							n_alts,
+							&raw_utility[thread_number, 0],
+							&logsums[c-start_case],
+							logsum_parameter,
+						)
+
+	except:
+		logger.error(f'c={c}')
+		logger.error(f'n_cases, n_alts, num_threads={(n_cases, n_alts, num_threads)}')
+		logger.exception('error in mnl_score_from_dataframes')
+		raise
+
+
+def mnl_log_likelihood_from_utility_cache(
+		DataFrames  dfs,
+		int         num_threads=1,
+		int         start_case=0,
+		int         stop_case=-1,
+		int         step_case=1,
+		int         leave_out=-1,
+		int         keep_only=-1,
+		int         subsample= 1,
+):
+	"""
+	Compute the MNL log likelihood from the incremental utility cache.
+
+	The utility cache on `dfs` is first brought up to date (see
+	`DataFrames._update_utility_cache`), so that when only a few parameters
+	have changed since the last evaluation, as in a line search or a finite
+	difference sweep, only the affected terms are recomputed.  No derivatives
+	are computed.
+
+	Returns
+	-------
+	dictx
+		With the log likelihood as `ll`.
+	"""
+	cdef:
+		int c = 0
+		int j
+		int n_cases = dfs._n_cases()
+		int n_alts  = dfs._n_alts()
+		l4_float_t[:,:] cache
+		l4_float_t[:,:] raw_utility
+		l4_float_t[:,:] exp_utility
+		l4_float_t[:,:] probability
 		l4_float_t      ll = 0
-		l4_float_t*     choice
-		l4_float_t      weight = 1 # TODO
+		l4_float_t      weight = 1 # default
+		l4_float_t      max_U
+		int             thread_number = 0
 
-	if not dfs.is_computational_ready(activate=True):
+	if not dfs._is_computational_ready(activate=True):
 		raise ValueError('DataFrames is not computational-ready')
 
 	if dfs._data_ch is None:
 		raise ValueError('DataFrames does not define data_ch')
 
+	if dfs._data_av is None:
+		raise ValueError('DataFrames does not define data_av')
+
+	if step_case <= 0:
+		raise NotImplementedError('non-positive step')
+
 	try:
-		raw_utility = numpy.zeros([n_alts], dtype=l4_float_dtype)
-		probability = numpy.zeros([n_alts], dtype=l4_float_dtype)
 
-		buffer_probability = &probability[0]
+		if num_threads <= 0:
+			num_threads = 1
 
-		dU = numpy.zeros([n_alts, n_params], dtype=l4_float_dtype)
-		dLL_case  = numpy.zeros([n_params], dtype=l4_float_dtype)
-		dLL_total = numpy.zeros([n_params], dtype=l4_float_dtype)
+		if stop_case<0:
+			stop_case = n_cases
 
-		if logsum_parameter == 1:
-			for c in range(n_cases):
-				dfs._compute_utility_onecase(c,raw_utility,n_alts)
-				_mnl_logsum_from_utility(
+		cache = dfs._update_utility_cache(num_threads)
+
+		raw_utility = numpy.zeros([num_threads, n_alts], dtype=l4_float_dtype)
+		exp_utility = numpy.zeros([num_threads, n_alts], dtype=l4_float_dtype)
+		probability = numpy.zeros([num_threads, n_alts], dtype=l4_float_dtype)
+
+		with nogil, parallel(num_threads=num_threads):
+			thread_number = threadid()
+
+			for c in prange(start_case, stop_case, step_case):
+
+				if leave_out >= 0 and c % subsample == leave_out:
+					continue
+
+				if keep_only >= 0 and c % subsample != keep_only:
+					continue
+
+				if dfs._array_wt is not None:
+					weight = dfs._array_wt[c]
+				else:
+					weight = 1
+
+				# Keep exp(U) from generating overflow, as in `_compute_utility_onecase`
+				max_U = 0
+				for j in range(n_alts):
+					raw_utility[thread_number,j] = cache[c,j]
+					if cache[c,j] > max_U:
+						max_U = cache[c,j]
+				if max_U > 500:
+					for j in range(n_alts):
+						raw_utility[thread_number,j] -= max_U
+
+				_mnl_probability_from_utility(
 					n_alts,
-					&raw_utility[0],     # input
-					&logsums[c], # output
+					&raw_utility[thread_number,0],  # input
+					&exp_utility[thread_number,0],  # output
+					&probability[thread_number,0],  # output
 				)
-		else:
 
-			for c in range(n_cases):
-				dfs._compute_utility_onecase(c,raw_utility,n_alts)
-				_mnl_logsum_from_utility_MU(
+				ll += _mnl_log_likelihood_from_probability_stride(
 					n_alts,
-					&raw_utility[0],     # input
-					&logsums[c], # output
-					logsum_parameter,
-				)
+					probability[thread_number],
+					dfs._array_ch[c,:],
+				) * weight
+
+		ll *= dfs._weight_normalization
+
+		from ..util import dictx
+		return dictx(
+			ll=ll,
+		)
 
 	except:
 		logger.error(f'c={c}')
-		logger.error(f'n_cases, n_alts={(n_cases, n_alts)}')
-		logger.exception('error in mnl_logsums_from_dataframes_all_rows')
+		logger.exception('error in mnl_log_likelihood_from_utility_cache')
 		raise
 
 
 
+def _mnl_ce_engine_available(DataFrames dfs):
+	"""
+	Check whether the sparse idce MNL engine can be used with these dataframes.
+
+	Returns
+	-------
+	bool
+	"""
+	if dfs._data_ce is None or dfs._array_ce_caseptr is None:
+		return False
+	if dfs._array_ce_caseptr.shape[0] - 1 != dfs._n_cases():
+		return False
+	if dfs._array_ch is not None and dfs._array_ch.shape[1] != dfs._n_alts():
+		return False
+	return True
+
+
+@cython.boundscheck(False)
+@cython.initializedcheck(False)
+@cython.wraparound(False)
+def mnl_d_log_likelihood_from_dataframes_ce(
+		DataFrames  dfs,
+		int         num_threads=1,
+		bint        return_dll=True,
+		bint        return_bhhh=False,
+		int         start_case=0,
+		int         stop_case=-1,
+		int         step_case=1,
+		int         persist=0,
+		int         leave_out=-1,
+		int         keep_only=-1,
+		int         subsample= 1,
+		bint        probability_only=False,
+):
+	"""
+	Compute the MNL log likelihood from idce data, visiting only the rows present for each case.
+
+	Utility, probability and the derivatives are computed in compact per-case
+	buffers sized by the largest number of rows for any case, using the row
+	offsets in `DataFrames.array_ce_caseptr`, so the work per case scales with
+	the number of alternatives present in `data_ce` and not with the total
+	number of alternatives.  The arguments and the result are the same as for
+	`mnl_d_log_likelihood_from_dataframes_all_rows`; any persisted arrays are
+	expanded to the usual dense [cases, alts] shape.
+	"""
+	cdef:
+		int c = 0
+		int c_local = 0
+		int k
+		int n_rows
+		int n_cases = dfs._n_cases()
+		int n_cases_local = n_cases
+		int n_alts  = dfs._n_alts()
+		int n_params= dfs._n_model_params
+		int max_rows = 1
+		int64_t row0
+		l4_float_t[:,:]   U_k
+		l4_float_t[:,:]   expU_k
+		l4_float_t[:,:]   P_k
+		l4_float_t[:,:]   ch_k
+		l4_float_t[:,:,:] dU_k
+		l4_float_t[:]     LL_case
+		l4_float_t[:,:]   dLL_case, dLL_total, dLL_temp
+		l4_float_t[:,:]   raw_utility
+		l4_float_t[:,:]   exp_utility
+		l4_float_t[:,:]   probability
+		l4_float_t[:,:,:] dU_persist
+		l4_float_t[:,:,:] bhhh_total
+		l4_float_t[:,:,:] d2LL_total
+		l4_float_t[:,:]   d2LL_temp
+		bint              return_d2ll = False
+		l4_float_t        ll = 0
+		l4_float_t        ll_temp
+		l4_float_t        weight = 1 # default
+		int               thread_number = 0
+		int               store_number_dLLc
+		int               storage_size_dLLc
+
+	if not dfs._is_computational_ready(activate=True):
+		raise ValueError('DataFrames is not computational-ready')
+
+	if dfs._data_ch is None and not probability_only:
+		raise ValueError('DataFrames does not define data_ch')
+
+	if dfs._data_av is None:
+		raise ValueError('DataFrames does not define data_av')
+
+	if step_case <= 0:
+		raise NotImplementedError('non-positive step')
+
+	if not _mnl_ce_engine_available(dfs):
+		raise NotImplementedError('sparse idce engine requires data_ce for every case')
+
+	try:
+
+		if num_threads <= 0:
+			num_threads = 1
+
+		if stop_case<0:
+			stop_case = n_cases
+
+		if persist & PERSIST_D2_LOGLIKE and not probability_only and _mnl_utility_is_linear(dfs):
+			return_d2ll = True
+			return_dll = True
+
+		if return_bhhh:
+			# must compute dll to get bhhh
+			return_dll = True
+
+		n_cases_local = ((stop_case - start_case) // step_case) + (1 if (stop_case - start_case) % step_case else 0)
+
+		if n_cases:
+			max_rows = max(int(numpy.diff(dfs._array_ce_caseptr.base).max()), 1)
+
+		U_k    = numpy.zeros([num_threads, max_rows], dtype=l4_float_dtype)
+		expU_k = numpy.zeros([num_threads, max_rows], dtype=l4_float_dtype)
+		P_k    = numpy.zeros([num_threads, max_rows], dtype=l4_float_dtype)
+		ch_k   = numpy.zeros([num_threads, max_rows], dtype=l4_float_dtype)
+		dU_k   = numpy.zeros([num_threads, max_rows, n_params if return_dll else 0], dtype=l4_float_dtype)
+
+		if persist & PERSIST_UTILITY:
+			raw_utility = numpy.full([n_cases_local, n_alts], -numpy.inf, dtype=l4_float_dtype)
+		if persist & PERSIST_EXP_UTILITY:
+			exp_utility = numpy.zeros([n_cases_local, n_alts], dtype=l4_float_dtype)
+		if persist & PERSIST_PROBABILITY:
+			probability = numpy.zeros([n_cases_local, n_alts], dtype=l4_float_dtype)
+		if persist & PERSIST_LOGLIKE_CASEWISE:
+			LL_case = numpy.zeros([n_cases_local], dtype=l4_float_dtype)
+
+		if return_dll:
+			storage_size_dLLc = n_cases_local if persist & PERSIST_D_LOGLIKE_CASEWISE else num_threads
+			dLL_case  = numpy.zeros([storage_size_dLLc,n_params], dtype=l4_float_dtype)
+			dLL_total = numpy.zeros([num_threads,n_params], dtype=l4_float_dtype)
+			dLL_temp  = numpy.zeros([num_threads,n_params], dtype=l4_float_dtype)
+			if persist & PERSIST_D_UTILITY:
+				dU_persist = numpy.zeros([n_cases_local, n_alts, n_params], dtype=l4_float_dtype)
+		if return_bhhh:
+			bhhh_total = numpy.zeros([num_threads,n_params,n_params], dtype=l4_float_dtype)
+		if return_d2ll:
+			d2LL_total = numpy.zeros([num_threads,n_params,n_params], dtype=l4_float_dtype)
+			d2LL_temp = numpy.zeros([num_threads,n_params], dtype=l4_float_dtype)
+
+		with nogil, parallel(num_threads=num_threads):
+			thread_number = threadid()
+
+			for c in prange(start_case, stop_case, step_case):
+
+				if leave_out >= 0 and c % subsample == leave_out:
+					continue
+
+				if keep_only >= 0 and c % subsample != keep_only:
+					continue
+
+				c_local = (c-start_case)//step_case
+				row0 = dfs._array_ce_caseptr[c]
+
+				if dfs._array_wt is not None:
+					weight = dfs._array_wt[c]
+				else:
+					weight = 1
+
+				n_rows = dfs._compute_d_utility_onecase_ce(c, U_k[thread_number], dU_k[thread_number], return_dll)
+
+				_mnl_probability_from_utility(
+					n_rows,
+					&U_k[thread_number,0],    # input
+					&expU_k[thread_number,0], # output
+					&P_k[thread_number,0],    # output
+				)
+
+				if persist & PERSIST_UTILITY:
+					for k in range(n_rows):
+						raw_utility[c_local, dfs._array_ce_altpos[row0+k]] = U_k[thread_number,k]
+				if persist & PERSIST_EXP_UTILITY:
+					for k in range(n_rows):
+						exp_utility[c_local, dfs._array_ce_altpos[row0+k]] = expU_k[thread_number,k]
+				if persist & PERSIST_PROBABILITY:
+					for k in range(n_rows):
+						probability[c_local, dfs._array_ce_altpos[row0+k]] = P_k[thread_number,k]
+				if return_dll and persist & PERSIST_D_UTILITY:
+					for k in range(n_rows):
+						dU_persist[c_local, dfs._array_ce_altpos[row0+k], :] = dU_k[thread_number,k,:]
+
+				if probability_only:
+					continue
+
+				for k in range(n_rows):
+					ch_k[thread_number,k] = dfs._get_choice_onecase_onealt(c, dfs._array_ce_altpos[row0+k], row0+k)
+
+				ll_temp = _mnl_log_likelihood_from_probability(
+					n_rows,
+					&P_k[thread_number,0],
+					&ch_k[thread_number,0],
+				) * weight
+				ll += ll_temp
+				if persist & PERSIST_LOGLIKE_CASEWISE:
+					LL_case[c_local] += ll_temp
+
+				if return_dll:
+					store_number_dLLc = c_local if persist & PERSIST_D_LOGLIKE_CASEWISE else thread_number
+					if weight:
+						_mnl_d_log_likelihood_from_d_utility(
+							n_rows,
+							n_params,
+							ch_k[thread_number],          # input [n_rows]
+							weight,                       # input scalar
+							dU_k[thread_number],          # input [n_rows, n_params]
+							&P_k[thread_number,0],        # input [n_rows]
+							&dLL_case[store_number_dLLc,0],  # output [n_params]
+							0,                            # accelerator
+							return_bhhh,
+							dLL_total[thread_number],
+							bhhh_total[thread_number],
+							&dLL_temp[thread_number,0],
+						)
+						if return_d2ll:
+							_mnl_d2_log_likelihood_from_d_utility(
+								n_rows,
+								n_params,
+								ch_k[thread_number],        # input [n_rows]
+								weight,                     # input scalar
+								dU_k[thread_number],        # input [n_rows, n_params]
+								&P_k[thread_number,0],      # input [n_rows]
+								d2LL_total[thread_number],  # output [n_params, n_params]
+								&d2LL_temp[thread_number,0],
+							)
+
+		if probability_only:
+			ll = numpy.nan
+
+		ll *= dfs._weight_normalization
+
+		from ..util import dictx
+		result = dictx(
+			ll=ll,
+		)
+		if persist & PERSIST_UTILITY:
+			result.utility=raw_utility.base
+		if persist & PERSIST_LOGLIKE_CASEWISE:
+			result.ll_casewise=LL_case.base
+		if persist & PERSIST_EXP_UTILITY:
+			result.exp_utility=exp_utility.base
+		if persist & PERSIST_PROBABILITY:
+			result.probability=probability.base
+
+		if return_dll:
+			result.dll = pandas.Series(
+				data=dLL_total.base.sum(0) * dfs._weight_normalization,
+				index=dfs._model_param_names,
+			)
+			if persist & PERSIST_D_LOGLIKE_CASEWISE:
+				result.dll_casewise=pandas.DataFrame(
+					dLL_case.base * dfs._weight_normalization,
+					columns=dfs._model_param_names,
+				)
+			if persist & PERSIST_D_UTILITY:
+				result.dutility = dU_persist.base
+		if return_bhhh:
+			result.bhhh = bhhh_total.base.sum(0) * dfs._weight_normalization
+		if return_d2ll:
+			result.d2ll = d2LL_total.base.sum(0) * dfs._weight_normalization
+
+		return result
+
+	except:
+		logger.error(f'c={c}')
+		logger.error(f'n_cases, n_cases_local, n_alts, num_threads={(n_cases, n_cases_local, n_alts, num_threads)}')
+		logger.exception('error in mnl_d_log_likelihood_from_dataframes_ce')
+		raise
+
+
+def _mnl_utility_is_linear(DataFrames dfs):
+	"""
+	Check whether utility is linear in the model parameters.
+
+	Quantity terms enter the utility through a logarithm, so when
+	any are present the second derivative of utility is not zero and
+	the analytic MNL hessian cannot be used.
+
+	Returns
+	-------
+	bool
+	"""
+	if dfs.model_quantity_ca_param is not None and dfs.model_quantity_ca_param.shape[0]:
+		return False
+	return True
+
+
+def _mnl_blocked_engine_available(DataFrames dfs):
+	"""
+	Check whether the blocked (BLAS) MNL engine can be used with these dataframes.
+
+	The blocked engine handles linear-in-parameters utility from dense idca
+	and idco arrays.  Quantity terms and idce storage require the casewise
+	kernel.
+
+	Returns
+	-------
+	bool
+	"""
+	if dfs._array_ce is not None or dfs._array_av is None:
+		return False
+	if dfs.model_quantity_ca_param is not None and dfs.model_quantity_ca_param.shape[0]:
+		return False
+	if dfs._array_ch is not None and dfs._array_ch.shape[1] != dfs._n_alts():
+		return False
+	return True
+
+
+def _mnl_blocked_data_arrays(DataFrames dfs):
+	"""
+	Get the idca and idco data arrays, in whichever precision they are stored.
+
+	Returns
+	-------
+	array_ca, array_co : ndarray or None
+	"""
+	if dfs._float32_ca:
+		array_ca = numpy.asarray(dfs._array_ca_f32)
+	elif dfs._array_ca is not None:
+		array_ca = numpy.asarray(dfs._array_ca)
+	else:
+		array_ca = None
+	if dfs._float32_co:
+		array_co = numpy.asarray(dfs._array_co_f32)
+	elif dfs._array_co is not None:
+		array_co = numpy.asarray(dfs._array_co)
+	else:
+		array_co = None
+	return array_ca, array_co
+
+
+def _mnl_blocked_coefficients(DataFrames dfs):
+	"""
+	Collapse the linked utility terms into dense coefficient and mapping arrays.
+
+	Returns
+	-------
+	beta_ca : ndarray [n_vars_ca]
+		Coefficient applied to each idca data column.
+	map_ca : ndarray [n_vars_ca, n_params]
+		Derivative of the idca coefficients w.r.t. the model parameters.
+	beta_co : ndarray [n_vars_co+1, n_alts]
+		Coefficient applied to each idco data column (the last row
+		is the alternative specific constant) for each alternative.
+	map_co : ndarray [n_vars_co+1, n_alts, n_params]
+		Derivative of the idco coefficients w.r.t. the model parameters.
+	"""
+	cdef:
+		int i, d, a, p
+		int n_alts = dfs._n_alts()
+		int n_params = dfs._n_model_params
+		int n_vars_ca = 0
+		int n_vars_co = 0
+
+	array_ca, array_co = _mnl_blocked_data_arrays(dfs)
+	if array_ca is not None:
+		n_vars_ca = array_ca.shape[2]
+	if array_co is not None:
+		n_vars_co = array_co.shape[1]
+
+	beta_ca = numpy.zeros([n_vars_ca], dtype=l4_float_dtype)
+	map_ca = numpy.zeros([n_vars_ca, n_params], dtype=l4_float_dtype)
+	for i in range(dfs.model_utility_ca_param.shape[0]):
+		d = dfs.model_utility_ca_data[i]
+		p = dfs.model_utility_ca_param[i]
+		beta_ca[d] += dfs.model_utility_ca_param_value[i] * dfs.model_utility_ca_param_scale[i]
+		if not dfs.model_utility_ca_param_holdfast[i]:
+			map_ca[d, p] += dfs.model_utility_ca_param_scale[i]
+
+	# data index -1 is the constant, which is stored in the last row
+	beta_co = numpy.zeros([n_vars_co+1, n_alts], dtype=l4_float_dtype)
+	map_co = numpy.zeros([n_vars_co+1, n_alts, n_params], dtype=l4_float_dtype)
+	for i in range(dfs.model_utility_co_alt.shape[0]):
+		d = dfs.model_utility_co_data[i]
+		a = dfs.model_utility_co_alt[i]
+		p = dfs.model_utility_co_param[i]
+		beta_co[d, a] += dfs.model_utility_co_param_value[i] * dfs.model_utility_co_param_scale[i]
+		if not dfs.model_utility_co_param_holdfast[i]:
+			map_co[d, a, p] += dfs.model_utility_co_param_scale[i]
+
+	return beta_ca, map_ca, beta_co, map_co
+
+
+def mnl_d_log_likelihood_from_dataframes_blocked(
+		DataFrames  dfs,
+		int         block_size=4096,
+		bint        return_dll=True,
+		bint        return_bhhh=False,
+		int         start_case=0,
+		int         stop_case=-1,
+		int         step_case=1,
+		int         persist=0,
+		int         leave_out=-1,
+		int         keep_only=-1,
+		int         subsample= 1,
+		bint        probability_only=False,
+):
+	"""
+	Compute the MNL log likelihood over blocks of cases using BLAS matrix products.
+
+	Instead of building the utility one case and one alternative at a time,
+	this engine gathers `block_size` cases and computes U = X_ca·β + X_co·B
+	for the entire block, then computes the probabilities, the gradient,
+	and the BHHH matrix for the block with vectorized operations.  The
+	arguments and the result are the same as for
+	`mnl_d_log_likelihood_from_dataframes_all_rows`.
+
+	Only linear-in-parameters utility from dense idca and idco arrays
+	is supported; check `_mnl_blocked_engine_available` first.
+	"""
+	cdef:
+		int n_cases = dfs._n_cases()
+		int n_cases_local
+		int n_alts  = dfs._n_alts()
+		int n_params= dfs._n_model_params
+		int b0 = 0
+		int b1, n_block, c0, c1
+		bint return_d2ll
+
+	if not dfs._is_computational_ready(activate=True):
+		raise ValueError('DataFrames is not computational-ready')
+
+	if dfs._data_ch is None and not probability_only:
+		raise ValueError('DataFrames does not define data_ch')
+
+	if dfs._data_av is None:
+		raise ValueError('DataFrames does not define data_av')
+
+	if step_case <= 0:
+		raise NotImplementedError('non-positive step')
+
+	if not _mnl_blocked_engine_available(dfs):
+		raise NotImplementedError('blocked engine does not support quantity or idce data')
+
+	try:
+		if block_size <= 0:
+			block_size = 4096
+
+		if stop_case<0:
+			stop_case = n_cases
+
+		# blocked utility is always linear in the parameters
+		return_d2ll = bool(persist & PERSIST_D2_LOGLIKE)
+
+		if return_bhhh or return_d2ll:
+			# must compute dll to get bhhh or d2ll
+			return_dll = True
+
+		if probability_only:
+			return_dll = False
+			return_bhhh = False
+			return_d2ll = False
+
+		n_cases_local = ((stop_case - start_case) // step_case) + (1 if (stop_case - start_case) % step_case else 0)
+
+		beta_ca, map_ca, beta_co, map_co = _mnl_blocked_coefficients(dfs)
+		n_vars_co1 = beta_co.shape[0]
+		map_co_flat = map_co.reshape(n_vars_co1, n_alts*n_params)
+
+		array_ca, array_co = _mnl_blocked_data_arrays(dfs)
+		array_av = numpy.asarray(dfs._array_av)
+		array_ch = numpy.asarray(dfs._array_ch) if dfs._array_ch is not None else None
+		array_wt = numpy.asarray(dfs._array_wt) if dfs._array_wt is not None else None
+
+		if persist & PERSIST_UTILITY:
+			raw_utility = numpy.zeros([n_cases_local, n_alts], dtype=l4_float_dtype)
+		if persist & PERSIST_EXP_UTILITY:
+			exp_utility = numpy.zeros([n_cases_local, n_alts], dtype=l4_float_dtype)
+		if persist & PERSIST_PROBABILITY:
+			probability = numpy.zeros([n_cases_local, n_alts], dtype=l4_float_dtype)
+		if persist & PERSIST_LOGLIKE_CASEWISE:
+			LL_case = numpy.zeros([n_cases_local], dtype=l4_float_dtype)
+		if return_dll and persist & PERSIST_D_UTILITY:
+			dU_persist = numpy.zeros([n_cases_local, n_alts, n_params], dtype=l4_float_dtype)
+		if return_dll and persist & PERSIST_D_LOGLIKE_CASEWISE:
+			dLL_case = numpy.zeros([n_cases_local, n_params], dtype=l4_float_dtype)
+
+		ll = 0.0
+		dll = numpy.zeros([n_params], dtype=l4_float_dtype)
+		bhhh = numpy.zeros([n_params, n_params], dtype=l4_float_dtype) if return_bhhh else None
+		d2ll = numpy.zeros([n_params, n_params], dtype=l4_float_dtype) if return_d2ll else None
+
+		while b0 < n_cases_local:
+			b1 = min(b0 + block_size, n_cases_local)
+			n_block = b1 - b0
+			c0 = start_case + b0 * step_case
+			c1 = start_case + b1 * step_case
+			cases = slice(c0, c1, step_case)
+
+			av = array_av[cases] != 0
+
+			# U = X_ca·β + X_co·B
+			U = numpy.zeros([n_block, n_alts], dtype=l4_float_dtype)
+			if beta_ca.shape[0]:
+				U += numpy.dot(array_ca[cases], beta_ca)
+			if array_co is not None:
+				U += numpy.dot(array_co[cases], beta_co[:-1])
+			U += beta_co[-1]
+
+			# Keep exp(U) from generating overflow
+			max_U = numpy.where(av, U, 0).max(1)
+			shift = numpy.where(max_U > 500, max_U, 0)
+			U -= shift[:, None]
+			U[~av] = -INFINITY32
+
+			with numpy.errstate(under='ignore'):
+				expU = numpy.exp(U)
+			sum_expU = expU.sum(1)
+			with numpy.errstate(invalid='ignore', divide='ignore'):
+				P = numpy.where(sum_expU[:, None] > 0, expU / sum_expU[:, None], 0)
+
+			if persist & PERSIST_UTILITY:
+				raw_utility[b0:b1] = U
+			if persist & PERSIST_EXP_UTILITY:
+				exp_utility[b0:b1] = expU
+			if persist & PERSIST_PROBABILITY:
+				probability[b0:b1] = P
+
+			if probability_only:
+				b0 = b1
+				continue
+
+			# cases dropped for cross validation get zero weight
+			if array_wt is not None:
+				w = numpy.array(array_wt[cases], dtype=l4_float_dtype)
+			else:
+				w = numpy.ones([n_block], dtype=l4_float_dtype)
+			if leave_out >= 0 or keep_only >= 0:
+				c_mod = numpy.arange(c0, c1, step_case) % subsample
+				if leave_out >= 0:
+					w[c_mod == leave_out] = 0
+				if keep_only >= 0:
+					w[c_mod != keep_only] = 0
+
+			ch = array_ch[cases]
+			with numpy.errstate(divide='ignore', invalid='ignore'):
+				ll_terms = numpy.where(ch != 0, numpy.log(P) * ch, 0).sum(1) * w
+			ll += ll_terms.sum()
+			if persist & PERSIST_LOGLIKE_CASEWISE:
+				LL_case[b0:b1] = ll_terms
+
+			if return_dll:
+				# dU = X_ca·∂β + X_co·∂B, as two matrix products over the block
+				dU = numpy.repeat(map_co[-1:], n_block, axis=0)
+				if array_co is not None:
+					dU += numpy.dot(array_co[cases], map_co_flat[:-1]).reshape(n_block, n_alts, n_params)
+				if beta_ca.shape[0]:
+					dU += numpy.dot(
+						array_ca[cases].reshape(n_block*n_alts, -1), map_ca
+					).reshape(n_block, n_alts, n_params)
+				if persist & PERSIST_D_UTILITY:
+					dU_persist[b0:b1] = dU * av[:, :, None]
+
+				# the gradient for each chosen alternative is its dU less the
+				# probability-weighted mean of dU across all alternatives
+				mean_dU = numpy.matmul(P[:, None, :], dU)[:, 0, :]
+				wch = ch * w[:, None]
+				dll_block = numpy.matmul(wch[:, None, :], dU)[:, 0, :] - wch.sum(1)[:, None] * mean_dU
+				dll += dll_block.sum(0)
+				if persist & PERSIST_D_LOGLIKE_CASEWISE:
+					dLL_case[b0:b1] = dll_block
+				if return_bhhh:
+					rows_b, rows_a = numpy.nonzero(wch)
+					g = dU[rows_b, rows_a, :] - mean_dU[rows_b, :]
+					bhhh += numpy.dot(g.T * wch[rows_b, rows_a], g)
+				if return_d2ll:
+					dU_centered = (dU - mean_dU[:, None, :]).reshape(n_block*n_alts, n_params)
+					wP = (P * wch.sum(1)[:, None]).reshape(n_block*n_alts)
+					d2ll -= numpy.dot(dU_centered.T * wP, dU_centered)
+
+			b0 = b1
+
+		if probability_only:
+			ll = numpy.nan
+
+		ll *= dfs._weight_normalization
+
+		from ..util import dictx
+		result = dictx(
+			ll=ll,
+		)
+		if persist & PERSIST_UTILITY:
+			result.utility=raw_utility
+		if persist & PERSIST_LOGLIKE_CASEWISE:
+			result.ll_casewise=LL_case
+		if persist & PERSIST_EXP_UTILITY:
+			result.exp_utility=exp_utility
+		if persist & PERSIST_PROBABILITY:
+			result.probability=probability
+
+		if return_dll:
+			result.dll = pandas.Series(
+				data=dll * dfs._weight_normalization,
+				index=dfs._model_param_names,
+			)
+			if persist & PERSIST_D_LOGLIKE_CASEWISE:
+				result.dll_casewise=pandas.DataFrame(
+					dLL_case * dfs._weight_normalization,
+					columns=dfs._model_param_names,
+				)
+			if persist & PERSIST_D_UTILITY:
+				result.dutility = dU_persist
+		if return_bhhh:
+			result.bhhh = bhhh * dfs._weight_normalization
+		if return_d2ll:
+			result.d2ll = d2ll * dfs._weight_normalization
+
+		return result
+
+	except:
+		logger.error(f'b0={b0}')
+		logger.error(f'n_cases, n_alts, block_size={(n_cases, n_alts, block_size)}')
+		logger.exception('error in mnl_d_log_likelihood_from_dataframes_blocked')
+		raise
+
+
+
+@cython.boundscheck(False)
+@cython.initializedcheck(False)
+@cython.wraparound(False)
+def mnl_logsums_from_dataframes_all_rows(
+		DataFrames dfs,
+		l4_float_t    logsum_parameter,
+		l4_float_t[:] logsums, # output
+):
+	cdef:
+		int c = 0
+		int v
+		int n_cases = dfs._n_cases()
+		int n_alts  = dfs._n_alts()
+		int n_params= dfs._n_model_params
+		l4_float_t[:] array_ch
+		l4_float_t[:] dLL_case, dLL_total
+		l4_float_t[:] raw_utility
+		l4_float_t[:] probability
+		l4_float_t[:,:] dU
+		l4_float_t*     buffer_probability
+		l4_float_t      ll = 0
+		l4_float_t*     choice
+		l4_float_t      weight = 1 # TODO
+
+	if not dfs.is_computational_ready(activate=True):
+		raise ValueError('DataFrames is not computational-ready')
+
+	if dfs._data_ch is None:
+		raise ValueError('DataFrames does not define data_ch')
+
+	try:
+		raw_utility = numpy.zeros([n_alts], dtype=l4_float_dtype)
+		probability = numpy.zeros([n_alts], dtype=l4_float_dtype)
+
+		buffer_probability = &probability[0]
+
+		dU = numpy.zeros([n_alts, n_params], dtype=l4_float_dtype)
+		dLL_case  = numpy.zeros([n_params], dtype=l4_float_dtype)
+		dLL_total = numpy.zeros([n_params], dtype=l4_float_dtype)
+
+		if logsum_parameter == 1:
+			for c in range(n_cases):
+				dfs._compute_utility_onecase(c,raw_utility,n_alts)
+				_mnl_logsum_from_utility(
+					n_alts,
+					&raw_utility[0],     # input
+					&logsums[c], # output
+				)
+		else:
+
+			for c in range(n_cases):
+				dfs._compute_utility_onecase(c,raw_utility,n_alts)
+				_mnl_logsum_from_utility_MU(
+					n_alts,
+					&raw_utility[0],     # input
+					&logsums[c], # output
+					logsum_parameter,
+				)
+
+	except:
+		logger.error(f'c={c}')
+		logger.error(f'n_cases, n_alts={(n_cases, n_alts)}')
+		logger.exception('error in mnl_logsums_from_dataframes_all_rows')
+		raise
+
+
+
+
+@cython.boundscheck(False)
+@cython.initializedcheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def mnl_latent_class_d_log_likelihood(
+		DataFrames  membership_dfs,
+		class_dfs,
+		int         num_threads=1,
+		bint        return_dll=True,
+		bint        return_bhhh=False,
+		int         start_case=0,
+		int         stop_case=-1,
+		int         step_case=1,
+		bint        return_probability=False,
+		bint        probability_only=False,
+):
+	"""
+	Compute the log likelihood of a latent class model of MNL models, and its gradient.
+
+	The class membership probabilities, the within-class probabilities, and the
+	gradient of the mixed log likelihood are computed case by case, so that the
+	derivatives of the probabilities with respect to the parameters are never
+	stored for more than one case per thread.
+
+	Parameters
+	----------
+	membership_dfs : DataFrames
+		The data for the class membership model, linked to that model, with
+		one alternative per class.
+	class_dfs : Sequence[DataFrames]
+		The data for each class model, linked to that model, in the same order
+		as the alternatives of the class membership model.  The class membership
+		model and all class models must share the same parameters, in the same order.
+	num_threads : int, default 1
+		Number of OpenMP threads.
+	return_dll, return_bhhh : bool
+		Whether to compute the gradient and the BHHH matrix.
+	start_case, stop_case, step_case : int
+		The cases to include.
+	return_probability : bool, default False
+		Include the mixed probabilities in the result.
+	probability_only : bool, default False
+		Compute only the mixed probabilities.
+
+	Returns
+	-------
+	dictx
+	"""
+	cdef:
+		int c = 0
+		int c_local = 0
+		int a, j, k, v, v2
+		int n_cases = membership_dfs._n_cases()
+		int n_cases_local
+		int n_classes = len(class_dfs)
+		int n_alts
+		int n_params = membership_dfs._n_model_params
+		int thread_number = 0
+		DataFrames dk
+		l4_float_t[:,:] pi             # [n_cases_local, n_classes]
+		l4_float_t[:,:,:] pk           # [n_classes, n_cases_local, n_alts]
+		l4_float_t[:,:] pr             # [n_cases_local, n_alts]
+		l4_float_t[:,:] ch             # [n_cases_local, n_alts]
+		l4_float_t[:,:] G              # [n_cases_local, n_params]
+		l4_float_t[:] wt               # [n_cases_local]
+		l4_float_t[:,:] U, expU        # [num_threads, n_alts]
+		l4_float_t[:,:] V, expV        # [num_threads, n_classes]
+		l4_float_t[:,:,:] dU           # [num_threads, n_alts, n_params]
+		l4_float_t[:,:,:] dV           # [num_threads, n_classes, n_params]
+		l4_float_t[:,:] dbar           # [num_threads, n_params]
+		l4_float_t ll = 0
+		l4_float_t ll_temp, coef, weight
+
+	if n_classes == 0:
+		raise ValueError('no class models')
+	if membership_dfs._n_alts() != n_classes:
+		raise ValueError(f'class membership model has {membership_dfs._n_alts()} alternatives for {n_classes} classes')
+	if not membership_dfs._is_computational_ready(activate=True):
+		raise ValueError('class membership DataFrames is not computational-ready')
+	for dk in class_dfs:
+		if not dk._is_computational_ready(activate=True):
+			raise ValueError('class model DataFrames is not computational-ready')
+		if dk._n_model_params != n_params:
+			raise ValueError('class models do not share parameters with the class membership model')
+		if dk._n_cases() != n_cases:
+			raise ValueError('class models do not have the same cases as the class membership model')
+		if dk._data_ch is None and not probability_only:
+			raise ValueError('DataFrames does not define data_ch')
+	dk = class_dfs[0]
+	n_alts = dk._n_alts()
+
+	if num_threads <= 0:
+		num_threads = 1
+	if stop_case < 0:
+		stop_case = n_cases
+	if step_case <= 0:
+		raise NotImplementedError('non-positive step')
+	if return_bhhh:
+		return_dll = True
+
+	try:
+		n_cases_local = ((stop_case - start_case) // step_case) + (1 if (stop_case - start_case) % step_case else 0)
+
+		pi = numpy.zeros([n_cases_local, n_classes], dtype=l4_float_dtype)
+		pk = numpy.zeros([n_classes, n_cases_local, n_alts], dtype=l4_float_dtype)
+		pr = numpy.zeros([n_cases_local, n_alts], dtype=l4_float_dtype)
+		U = numpy.zeros([num_threads, n_alts], dtype=l4_float_dtype)
+		expU = numpy.zeros([num_threads, n_alts], dtype=l4_float_dtype)
+		V = numpy.zeros([num_threads, n_classes], dtype=l4_float_dtype)
+		expV = numpy.zeros([num_threads, n_classes], dtype=l4_float_dtype)
+		if dk._array_wt is not None:
+			wt = numpy.asarray(dk._array_wt)[start_case:stop_case:step_case].astype(l4_float_dtype)
+		else:
+			wt = numpy.ones([n_cases_local], dtype=l4_float_dtype)
+
+		# class membership probabilities
+		with nogil, parallel(num_threads=num_threads):
+			thread_number = threadid()
+			for c in prange(start_case, stop_case, step_case):
+				c_local = (c-start_case)//step_case
+				membership_dfs._compute_utility_onecase(c, V[thread_number], n_classes)
+				_mnl_probability_from_utility(
+					n_classes,
+					&V[thread_number,0],
+					&expV[thread_number,0],
+					&pi[c_local,0],
+				)
+
+		# within class probabilities, and the mixture
+		for k in range(n_classes):
+			dk = class_dfs[k]
+			with nogil, parallel(num_threads=num_threads):
+				thread_number = threadid()
+				for c in prange(start_case, stop_case, step_case):
+					c_local = (c-start_case)//step_case
+					dk._compute_utility_onecase(c, U[thread_number], n_alts)
+					_mnl_probability_from_utility(
+						n_alts,
+						&U[thread_number,0],
+						&expU[thread_number,0],
+						&pk[k,c_local,0],
+					)
+					for a in range(n_alts):
+						pr[c_local,a] += pi[c_local,k] * pk[k,c_local,a]
+
+		from ..util import dictx
+		result = dictx()
+		if return_probability or probability_only:
+			result.probability = pr.base
+		if probability_only:
+			result.ll = numpy.nan
+			return result
+
+		dk = class_dfs[0]
+		ch = numpy.zeros([n_cases_local, n_alts], dtype=l4_float_dtype)
+		for c_local in range(n_cases_local):
+			c = start_case + c_local * step_case
+			dk._copy_choice_onecase(c, ch[c_local])
+			ll_temp = _mnl_log_likelihood_from_probability_stride(
+				n_alts,
+				pr[c_local],
+				ch[c_local],
+			)
+			ll += ll_temp * wt[c_local]
+		result.ll = ll
+
+		if not return_dll:
+			return result
+
+		# The gradient for each case is the posterior-weighted sum of the
+		# gradients of log(class probability) and log(class membership),
+		# accumulated one class at a time.
+		G = numpy.zeros([n_cases_local, n_params], dtype=l4_float_dtype)
+		dU = numpy.zeros([num_threads, n_alts, n_params], dtype=l4_float_dtype)
+		dV = numpy.zeros([num_threads, n_classes, n_params], dtype=l4_float_dtype)
+		dbar = numpy.zeros([num_threads, n_params], dtype=l4_float_dtype)
+
+		for k in range(n_classes):
+			dk = class_dfs[k]
+			with nogil, parallel(num_threads=num_threads):
+				thread_number = threadid()
+				for c in prange(start_case, stop_case, step_case):
+					c_local = (c-start_case)//step_case
+					if pi[c_local,k] == 0:
+						continue
+					dk._compute_d_utility_onecase(c, U[thread_number], dU[thread_number], n_alts)
+					for v in range(n_params):
+						dbar[thread_number,v] = 0
+					for j in range(n_alts):
+						if pk[k,c_local,j]:
+							for v in range(n_params):
+								dbar[thread_number,v] += pk[k,c_local,j] * dU[thread_number,j,v]
+					for a in range(n_alts):
+						if ch[c_local,a] == 0 or pr[c_local,a] <= 0 or pk[k,c_local,a] == 0:
+							continue
+						coef = ch[c_local,a] * pi[c_local,k] * pk[k,c_local,a] / pr[c_local,a]
+						for v in range(n_params):
+							G[c_local,v] += coef * (dU[thread_number,a,v] - dbar[thread_number,v])
+
+		dk = class_dfs[0]
+		with nogil, parallel(num_threads=num_threads):
+			thread_number = threadid()
+			for c in prange(start_case, stop_case, step_case):
+				c_local = (c-start_case)//step_case
+				membership_dfs._compute_d_utility_onecase(c, V[thread_number], dV[thread_number], n_classes)
+				for v in range(n_params):
+					dbar[thread_number,v] = 0
+				for j in range(n_classes):
+					for v in range(n_params):
+						dbar[thread_number,v] += pi[c_local,j] * dV[thread_number,j,v]
+				for j in range(n_classes):
+					coef = 0
+					for a in range(n_alts):
+						if ch[c_local,a] == 0 or pr[c_local,a] <= 0:
+							continue
+						coef = coef + ch[c_local,a] * pi[c_local,j] * pk[j,c_local,a] / pr[c_local,a]
+					if coef == 0:
+						continue
+					for v in range(n_params):
+						G[c_local,v] += coef * (dV[thread_number,j,v] - dbar[thread_number,v])
+
+		G_ = G.base
+		wt_ = wt.base
+		result.dll = pandas.Series(
+			data=wt_ @ G_,
+			index=membership_dfs._model_param_names,
+		)
+		if return_bhhh:
+			result.bhhh = (G_ * wt_[:,None]).T @ G_
+		return result
+
+	except:
+		logger.error(f'c={c}')
+		logger.error(f'n_cases, n_cases_local, n_alts, n_classes={(n_cases, n_cases_local, n_alts, n_classes)}')
+		logger.exception('error in mnl_latent_class_d_log_likelihood')
+		raise
+
 
 ############
 
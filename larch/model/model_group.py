@@ -1,12 +1,51 @@
 
 
+import os
+import numpy
 from .abstract_model import AbstractChoiceModel
 from . import persist_flags
 from ..exceptions import ParameterNotInModelWarning
 from .constraints import ParametricConstraintList
 from collections.abc import MutableSequence
+import warnings
+import weakref
+
+# Model groups evaluated in worker processes, keyed by id.  The workers are
+# forked from the process that owns the group, so they find it here and share
+# its data arrays (copy-on-write) instead of receiving copies.
+_parallel_groups = weakref.WeakValueDictionary()
+
+
+def _parallel_group_initializer(group_id):
+	for k in _parallel_groups[group_id]._k_models:
+		# each segment runs in its own process, and OpenMP thread pools
+		# do not survive the fork
+		k.n_threads = 1
+
+
+def _parallel_group_worker(args):
+	group_id, i, vals, method, persist, kwargs = args
+	k = _parallel_groups[group_id]._k_models[i]
+	with warnings.catch_warnings():
+		warnings.simplefilter("ignore", category=ParameterNotInModelWarning)
+		k.set_values(**vals)
+	return getattr(k, method)(persist=persist, **kwargs)
+
 
 class ModelGroup(AbstractChoiceModel, MutableSequence):
+	"""
+	A group of models, which are estimated jointly with a shared set of parameters.
+
+	Parameters
+	----------
+	models : list of AbstractChoiceModel
+		The models in this group.  The log likelihood of the group is the
+		sum of the log likelihoods of these models.
+	n_jobs : int, default 1
+		The number of worker processes used to evaluate the log likelihood
+		of the grouped models concurrently.  Set to -1 to use one process
+		per model.  See `n_jobs` for details.
+	"""
 
 	constraints = ParametricConstraintList()
 
@@ -19,6 +58,7 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 			title=None,
 			dataservice=None,
 			constraints=None,
+			n_jobs=1,
 	):
 		super().__init__(
 			parameters=parameters,
@@ -30,6 +70,15 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 		self._dataframes = None
 		self._mangled = True
 		self.constraints = constraints
+		self._pool = None
+		self._pool_signature = None
+		self.n_jobs = n_jobs
+
+	def __del__(self):
+		try:
+			self.close_pool()
+		except Exception:
+			pass
 
 	def __getitem__(self, x):
 		return self._k_models[x]
@@ -37,9 +86,11 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 	def __setitem__(self, i, value):
 		assert isinstance(value, AbstractChoiceModel)
 		self._k_models[i] = value
+		self.close_pool()
 
 	def __delitem__(self, x):
 		del self._k_models[x]
+		self.close_pool()
 
 	def __len__(self):
 		return len(self._k_models)
@@ -47,6 +98,97 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 	def insert(self, i, value):
 		assert isinstance(value, AbstractChoiceModel)
 		self._k_models.insert(i,value)
+		self.close_pool()
+
+	@property
+	def n_jobs(self):
+		"""int : Number of worker processes used to evaluate the grouped models.
+
+		When greater than 1 (or -1, for one process per model), the log
+		likelihood and its derivatives for the grouped models are computed
+		concurrently in a pool of worker processes, and then summed.  The
+		workers are forked from this process when first needed, so they share
+		the already-loaded data arrays of every grouped model in memory, and
+		only the parameter values and results are passed between processes.
+		Each worker evaluates its models single-threaded.
+
+		The pool is rebuilt if the dataframes attached to any grouped model
+		are replaced, but other changes to the grouped models (e.g. to the
+		utility functions) are not seen by existing workers; call
+		`close_pool` after making such changes.  Forking is not available
+		on all platforms, in which case the models are evaluated serially.
+		"""
+		return self._n_jobs
+
+	@n_jobs.setter
+	def n_jobs(self, value):
+		value = int(value)
+		if value == 0:
+			raise ValueError('n_jobs cannot be zero')
+		self._n_jobs = value
+		self.close_pool()
+
+	@property
+	def n_threads(self):
+		"""int : Number of threads used by each grouped model."""
+		return max(k.n_threads for k in self._k_models)
+
+	@n_threads.setter
+	def n_threads(self, value):
+		for k in self._k_models:
+			k.n_threads = value
+
+	def close_pool(self):
+		"""Shut down the worker processes used to evaluate the grouped models, if any."""
+		pool = getattr(self, '_pool', None)
+		if pool is not None:
+			if self._pool_owner == os.getpid():
+				# a process forked from the owner (e.g. for bootstrap) only drops its reference
+				pool.terminate()
+				pool.join()
+			self._pool = None
+			self._pool_signature = None
+		_parallel_groups.pop(id(self), None)
+
+	def _worker_pool(self):
+		"""Get a pool of forked worker processes sharing the data of the grouped models, or None."""
+		import multiprocessing
+		n_jobs = self._n_jobs
+		if n_jobs < 0:
+			n_jobs = len(self._k_models)
+		n_jobs = min(n_jobs, len(self._k_models))
+		if n_jobs <= 1 or multiprocessing.current_process().daemon:
+			# already in a worker process (e.g. for cross validation), which cannot have its own
+			return None
+		try:
+			context = multiprocessing.get_context('fork')
+		except ValueError:
+			return None
+		signature = tuple(id(getattr(k, '_dataframes', None)) for k in self._k_models)
+		if self._pool is not None and self._pool_signature != signature:
+			self.close_pool()
+		if self._pool is None:
+			_parallel_groups[id(self)] = self
+			self._pool = context.Pool(
+				n_jobs,
+				initializer=_parallel_group_initializer,
+				initargs=(id(self),),
+			)
+			self._pool_owner = os.getpid()
+			self._pool_signature = signature
+		return self._pool
+
+	def _map_models(self, method, persist=0, **kwargs):
+		"""Call `method` on each grouped model, concurrently if `n_jobs` allows."""
+		pool = self._worker_pool()
+		if pool is None:
+			return [getattr(k, method)(persist=persist, **kwargs) for k in self._k_models]
+		vals = dict(self.pf.value)
+		return pool.map(
+			_parallel_group_worker,
+			[(id(self), i, vals, method, persist, kwargs) for i in range(len(self._k_models))],
+			chunksize=1,
+		)
 
 	@property
 	def dataframes(self):
@@ -67,6 +209,24 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 		"""
 		return sum(k.total_weight() for k in self._k_models)
 
+	def _scale_case_weights(self, factor):
+		# the cases of the grouped models, in order, make up the cases of the group
+		factor = numpy.asarray(factor)
+		bounds = numpy.cumsum([0] + [k.n_cases for k in self._k_models])
+		saved = [
+			k._scale_case_weights(factor[bounds[i]:bounds[i+1]])
+			for i, k in enumerate(self._k_models)
+		]
+		self.close_pool()
+		self.clear_best_loglike()
+		return saved
+
+	def _restore_case_weights(self, saved):
+		for k, k_saved in zip(self._k_models, saved):
+			k._restore_case_weights(k_saved)
+		self.close_pool()
+		self.clear_best_loglike()
+
 	def unmangle(self):
 		super().unmangle()
 		for k in self._k_models:
@@ -83,18 +243,19 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 		if x is not None:
 			self.set_values(x)
 		vals = self.pf.value
-		import warnings
 		with warnings.catch_warnings():
 			warnings.simplefilter("ignore", category=ParameterNotInModelWarning)
 			for k in self._k_models:
 				k.set_values(**vals)
 
-	def load_data(self, dataservice=None, autoscale_weights=True, log_warnings=True):
+	def load_data(self, dataservice=None, autoscale_weights=True, log_warnings=True, float_dtype=numpy.float64):
+		self.close_pool()
 		for k in self._k_models:
 			k.load_data(
 				dataservice=dataservice,
 				autoscale_weights=autoscale_weights,
 				log_warnings=log_warnings,
+				float_dtype=float_dtype,
 			)
 
 	def loglike(
@@ -118,6 +279,11 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 		----------
 		x : {'null', 'init', 'best', array-like, dict, scalar}, optional
 			Values for the parameters.  See :ref:`set_values` for details.
+		leave_out, keep_only, subsample : int, optional
+			Settings for cross validation calculations, applied to each
+			grouped model.  The row numbers are counted separately within
+			each grouped model, so every model contributes cases to each
+			fold.
 
 		Returns
 		-------
@@ -133,21 +299,18 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 			raise NotImplementedError('stop_case != -1')
 		if step_case != 1:
 			raise NotImplementedError('step_case != 1')
-		if leave_out != -1:
-			raise NotImplementedError('leave_out != -1')
-		if keep_only != -1:
-			raise NotImplementedError('keep_only != -1')
-		if subsample != -1:
-			raise NotImplementedError('subsample != -1')
 		if probability_only:
 			raise NotImplementedError('probability_only != False')
 
 		from ..util import dictx
 		self.__prep_for_compute(x)
-		ll2_parts = [m.loglike(persist=persist) for m in self._k_models]
+		subsample_kwargs = dict(leave_out=leave_out, keep_only=keep_only, subsample=subsample)
+		full_data = leave_out == -1 and keep_only == -1
+		ll2_parts = self._map_models('loglike', persist=persist, **subsample_kwargs)
 		if not persist:
 			result = sum(ll2_parts)
-			self._check_if_best(result)
+			if full_data:
+				self._check_if_best(result)
 			return result
 		ll2 = dictx(
 			ll=sum(y.ll for y in ll2_parts),
@@ -157,7 +320,8 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 		for key in ll2_parts[0].keys():
 			if key != 'll':
 				ll2[key] = list(y[key] for y in ll2_parts)
-		self._check_if_best(ll2.ll)
+		if full_data:
+			self._check_if_best(ll2.ll)
 		return ll2
 
 
@@ -183,6 +347,11 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 		----------
 		x : {'null', 'init', 'best', array-like, dict, scalar}, optional
 			Values for the parameters.  See :ref:`set_values` for details.
+		leave_out, keep_only, subsample : int, optional
+			Settings for cross validation calculations, applied to each
+			grouped model.  The row numbers are counted separately within
+			each grouped model, so every model contributes cases to each
+			fold.
 
 		Returns
 		-------
@@ -198,18 +367,14 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 			raise NotImplementedError('stop_case != -1')
 		if step_case != 1:
 			raise NotImplementedError('step_case != 1')
-		if leave_out != -1:
-			raise NotImplementedError('leave_out != -1')
-		if keep_only != -1:
-			raise NotImplementedError('keep_only != -1')
-		if subsample != -1:
-			raise NotImplementedError('subsample != -1')
 		if probability_only:
 			raise NotImplementedError('probability_only != False')
 
 		from ..util import dictx
 		self.__prep_for_compute(x)
-		ll2_parts = [m.loglike2(persist=persist) for m in self._k_models]
+		subsample_kwargs = dict(leave_out=leave_out, keep_only=keep_only, subsample=subsample)
+		full_data = leave_out == -1 and keep_only == -1
+		ll2_parts = self._map_models('loglike2', persist=persist, **subsample_kwargs)
 		dll = ll2_parts[0].dll
 		for y in ll2_parts[1:]:
 			dll = dll.add(y.dll, fill_value=0)
@@ -221,5 +386,19 @@ class ModelGroup(AbstractChoiceModel, MutableSequence):
 		for key in ll2_parts[0].keys():
 			if key not in {'ll','dll'}:
 				ll2[key] = list(y[key] for y in ll2_parts)
-		self._check_if_best(ll2.ll)
+		if full_data:
+			self._check_if_best(ll2.ll)
 		return ll2
+
+	def maximize_loglike_stochastic(self, *args, **kwargs):
+		"""
+		Not available for a ModelGroup.
+
+		The stochastic optimizer works on blocks of cases, but the models
+		in a group cannot compute the log likelihood on a subset of cases.
+
+		Raises
+		------
+		NotImplementedError
+		"""
+		raise NotImplementedError('maximize_loglike_stochastic is not available for a ModelGroup')
@@ -159,9 +159,14 @@ cdef void _nl_d_probability_from_d_utility(
 		l4_float_t[:]   alpha_param_values,         # input  [n_edges]
 		l4_float_t[:]   logalpha_param_values,      # input  [n_edges]
 		l4_float_t[:]   array_ch,                   # input/output  [n_nodes]
+		bint            has_alpha_params,           # input
+		int[:]          param_slot_of_alpha,        # input  [n_edges]
+		int[:]          edges_by_dn,                # input  [n_edges]
+		int[:]          first_edge_for_dn,          # input  [n_nodes]
+		int[:]          n_edges_for_dn,             # input  [n_nodes]
 ) nogil:
 	cdef:
-		int        parent, child, edge, reversi_edge, param
+		int        parent, child, edge, reversi_edge, param, n, sibling
 		l4_float_t sum_expU = 0
 		l4_float_t x
 		l4_float_t multiplier
@@ -194,6 +199,16 @@ cdef void _nl_d_probability_from_d_utility(
 					if alpha_param_values[edge] != 1.0:
 						scratch[param_slot_of_mu[parent]] -= logalpha_param_values[edge] / mu_parent
 
+				if has_alpha_params:
+					# d log(alpha[edge]) / d theta[sibling], for the logit over the edges into child
+					for n in range(n_edges_for_dn[child]):
+						sibling = edges_by_dn[first_edge_for_dn[child]+n]
+						if param_slot_of_alpha[sibling] >= 0:
+							if sibling == edge:
+								scratch[param_slot_of_alpha[sibling]] += 1 - alpha_param_values[sibling]
+							else:
+								scratch[param_slot_of_alpha[sibling]] -= alpha_param_values[sibling]
+
 				multiplier = probability[parent]/mu_parent
 			else:
 				multiplier = 0
@@ -274,6 +289,7 @@ def d_loglike_from_d_probability(
 		int n_alts = probability.shape[1]
 		int n_params = d_probability.shape[2]
 		l4_float_t[:] d_LL_temp
+		l4_float_t[:] d_LL_scratch
 		l4_float_t[:] d_LL_cum
 		l4_float_t[:,:] bhhh_temp
 		l4_float_t[:,:] bhhh_cum
@@ -284,6 +300,7 @@ def d_loglike_from_d_probability(
 			raise ValueError(f"probabilities.shape ~= choices.shape {probability.shape} != {array_ch.shape}")
 
 		d_LL_temp = numpy.zeros(n_params, dtype=l4_float_dtype)
+		d_LL_scratch = numpy.zeros(n_params, dtype=l4_float_dtype)
 		d_LL_cum = numpy.zeros(n_params, dtype=l4_float_dtype)
 		if return_bhhh:
 			bhhh_cum = numpy.zeros([n_params, n_params], dtype=l4_float_dtype)
@@ -308,7 +325,7 @@ def d_loglike_from_d_probability(
 					return_bhhh,
 					d_LL_cum,
 					bhhh_cum,
-					&d_LL_temp[0],
+					&d_LL_scratch[0],
 			)
 
 		if return_bhhh:
@@ -336,9 +353,14 @@ cdef void _nl_d_utility_upstream_v2(
 		l4_float_t[:,:] dU,           # input/output  [n_nodes, n_params]
 		int[:]          ups,                        # input  [n_edges]
 		int[:]          dns,                        # input  [n_edges]
+		bint            has_alpha_params,           # input
+		int[:]          param_slot_of_alpha,        # input  [n_edges]
+		int[:]          edges_by_dn,                # input  [n_edges]
+		int[:]          first_edge_for_dn,          # input  [n_nodes]
+		int[:]          n_edges_for_dn,             # input  [n_nodes]
 ) nogil:
 	cdef:
-		int parent, p, e, child
+		int parent, p, e, child, n, sibling
 		l4_float_t  cond_logprob, cond_prob
 
 	for parent in range(n_elemental_alts, n_nodes):
@@ -349,23 +371,36 @@ cdef void _nl_d_utility_upstream_v2(
 		parent = ups[e]
 		child = dns[e]
 		cond_logprob = conditional_logprobability[e]
+
+		if child >= n_elemental_alts and edges_by_dn[first_edge_for_dn[child]] == e:
+			# finish the derivative of the child nest w.r.t. its own mu, once,
+			# when the first edge into the child is visited
+			if param_slot_of_mu[child] >= 0:
+				dU[child,param_slot_of_mu[child]] += utility[child]
+				dU[child,param_slot_of_mu[child]] /= mu[child]
+
 		if cond_logprob > -INFINITY32:
 			cond_prob = exp(cond_logprob)
 
-			if child >= n_elemental_alts:
-				if param_slot_of_mu[child] >= 0:
-					dU[child,param_slot_of_mu[child]] += utility[child]
-					dU[child,param_slot_of_mu[child]] /= mu[child]
-
 			if param_slot_of_mu[parent] >= 0:
 				if alpha[e] == 1.0:
 					dU[parent, param_slot_of_mu[parent]] -= cond_prob * (utility[child])
 				else:
-					dU[parent, param_slot_of_mu[parent]] -= cond_prob * (utility[child] + mu[child]*logalpha[e])
+					dU[parent, param_slot_of_mu[parent]] -= cond_prob * (utility[child] + logalpha[e])
 
 			for p in range(n_params):
 				dU[parent, p] += cond_prob * dU[child, p]
 
+			if has_alpha_params:
+				# d log(alpha[e]) / d theta[sibling], for the logit over the edges into child
+				for n in range(n_edges_for_dn[child]):
+					sibling = edges_by_dn[first_edge_for_dn[child]+n]
+					if param_slot_of_alpha[sibling] >= 0:
+						if sibling == e:
+							dU[parent, param_slot_of_alpha[sibling]] += cond_prob * (1 - alpha[sibling])
+						else:
+							dU[parent, param_slot_of_alpha[sibling]] -= cond_prob * alpha[sibling]
+
 
 cdef void _nl_total_probability_from_conditional_logprobability(
 		int             n_nodes,
@@ -447,6 +482,7 @@ def nl_d_log_likelihood_from_dataframes_all_rows(
 		int n_alts  = dfs._n_alts()
 		int n_params= dfs._n_model_params
 		l4_float_t[:,:] array_ch_wide  # thread-local
+		l4_float_t[:,:] array_ch       # thread-local
 		l4_float_t[:]   LL_case
 		l4_float_t[:,:] dLL_case
 		l4_float_t[:,:] dLL_total # thread-local
@@ -488,7 +524,7 @@ def nl_d_log_likelihood_from_dataframes_all_rows(
 	if dfs._data_ch is None and not probability_only:
 		raise ValueError('DataFrames does not define data_ch')
 
-	if dfs._data_av is None:
+	if dfs._data_av is None and not probability_only:
 		raise ValueError('DataFrames does not define data_av')
 
 	if step_case <= 0:
@@ -525,7 +561,9 @@ def nl_d_log_likelihood_from_dataframes_all_rows(
 		total_probability   = numpy.zeros([storage_size_P, tree.n_nodes], dtype=l4_float_dtype)
 
 		array_ch_wide = numpy.zeros([num_threads, tree.n_nodes], dtype=l4_float_dtype)
-		choice_width = dfs._array_ch.shape[1]
+		array_ch = numpy.zeros([num_threads, tree.n_nodes], dtype=l4_float_dtype)
+		# idce choices are stored by data_ce row, and copied out for each case
+		choice_width = dfs._array_ch.shape[1] if dfs._array_ch is not None else n_alts
 		if not (choice_width == n_alts or choice_width == tree.n_nodes):
 			raise ValueError("choice_width ({}) must be n_alts ({}) or n_nodes ({})".format(choice_width, n_alts, tree.n_nodes))
 
@@ -606,10 +644,12 @@ def nl_d_log_likelihood_from_dataframes_all_rows(
 				else:
 					weight = 1
 
+				dfs._copy_choice_onecase(c, array_ch[thread_number])
+
 				ll_temp = _mnl_log_likelihood_from_probability_stride(
 					choice_width,
 					total_probability[store_number_P,:],        # input [n_alts]
-					dfs._array_ch[c,:],                       # input [n_alts]
+					array_ch[thread_number],                  # input [n_alts]
 				) * weight
 				LL_case[store_number_LLc] += ll_temp
 				ll += ll_temp
@@ -621,14 +661,19 @@ def nl_d_log_likelihood_from_dataframes_all_rows(
 						raw_utility[store_number_U,:],          # input [n_nodes]
 						tree.model_mu_param_values,           # input [n_nodes]  elemental alternatives are ignored
 						tree.model_mu_param_slots,
-						tree.edge_alpha_values,               # input [n_nodes,n_nodes]
-						tree.edge_logalpha_values,            # input [n_nodes,n_nodes]
+						tree.edge_alpha_values,               # input [n_edges]
+						tree.edge_logalpha_values,            # input [n_edges]
 						cond_logprobability[store_number_CP,:],  # input [n_edges]
 						tree.n_edges,
 						n_params,
 						dU[store_number_dU],                    # input/output  [n_nodes, n_params]
 						tree.edge_up,                         # input  [n_edges]
 						tree.edge_dn,                         # input  [n_edges]
+						tree.has_alpha_params,                # input
+						tree.edge_alpha_param_slots,          # input  [n_edges]
+						tree.edges_by_dn,                     # input  [n_edges]
+						tree.first_edge_for_dn,               # input  [n_nodes]
+						tree.n_edges_for_dn,                  # input  [n_nodes]
 					)
 
 					dfs._copy_choice_onecase(c, array_ch_wide[thread_number])
@@ -649,6 +694,11 @@ def nl_d_log_likelihood_from_dataframes_all_rows(
 						tree.edge_alpha_values,               # input  [n_edges]
 						tree.edge_logalpha_values,            # input  [n_edges]
 						array_ch_wide[thread_number],         # in-out [n_nodes]
+						tree.has_alpha_params,                # input
+						tree.edge_alpha_param_slots,          # input  [n_edges]
+						tree.edges_by_dn,                     # input  [n_edges]
+						tree.first_edge_for_dn,               # input  [n_nodes]
+						tree.n_edges_for_dn,                  # input  [n_nodes]
 					)
 
 					if weight:
@@ -658,7 +708,7 @@ def nl_d_log_likelihood_from_dataframes_all_rows(
 							total_probability[store_number_P,:],  # input  [n_nodes]
 							dP[store_number_dP],                  # input  [n_nodes, n_params]
 							dLL_case[store_number_dLLc,:],           # output [n_params]
-							dfs._array_ch[c,:],                 # input  [n_nodes]
+							array_ch[thread_number],            # input  [n_nodes]
 							weight,
 
 							return_bhhh,
@@ -13,5 +13,6 @@ cpdef enum:
 
 	PERSIST_BHHH = 0x100
 	PERSIST_PARTS = 0x200
+	PERSIST_D2_LOGLIKE = 0x400
 
 	PERSIST_ALL = 0xFFFF
@@ -12,6 +12,7 @@ __all__ = (
 	"PERSIST_D_LOGLIKE_CASEWISE",
 	"PERSIST_BHHH",
 	"PERSIST_PARTS",
+	"PERSIST_D2_LOGLIKE",
 	"PERSIST_ALL",
 )
 
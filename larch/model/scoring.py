@@ -0,0 +1,278 @@
+import numpy
+import pandas
+
+from ..dataframes import DataFrames
+
+
+class Scorer:
+	"""
+	Apply a model with fixed parameter values to data.
+
+	A scorer computes probabilities, logsums and simulated choices only,
+	for applying an estimated model, e.g. in microsimulation.  Unlike the model's own
+	`probability` and `logsums` methods, the data need not include choices
+	or weights, no likelihood or derivative buffers are allocated, and the
+	data need not be attached to the model.  Data from a DataService is
+	read and scored in chunks of cases, so the whole population never needs
+	to be held in memory at once.
+
+	Parameters
+	----------
+	model : Model
+		The model to apply.  Its structure (utility functions and nesting)
+		should not be changed while the scorer is in use.
+	x : {'null', 'init', 'best', array-like, dict, scalar}, optional
+		Values for the parameters, see :ref:`set_values`.  The current
+		values of the model are used if not given.  The values are copied
+		when the scorer is created.
+	"""
+
+	def __init__(self, model, x=None):
+		if x is not None:
+			prior = model.pvals.copy()
+			model.set_values(x)
+			self.values = model.pvals.copy()
+			model.set_values(prior)
+		else:
+			model.unmangle()
+			self.values = model.pvals.copy()
+		self.model = model
+
+	@property
+	def pf(self):
+		"""pandas.Series : The parameter values used by this scorer."""
+		return pandas.Series(self.values, index=self.model.pnames, name='value')
+
+	def _required_data(self):
+		req_data = self.model.required_data()
+		for key in ('choice_ca', 'choice_co', 'choice_co_code', 'weight_co'):
+			req_data.pop(key, None)
+		return req_data
+
+	def iter_chunks(
+			self,
+			data=None,
+			*,
+			chunk_size=100_000,
+			probability=True,
+			logsums=False,
+			n_draws=0,
+			seed=0,
+			n_threads=None,
+			float_dtype=numpy.float64,
+			prefetch=True,
+	):
+		"""
+		Score data in chunks of cases.
+
+		Parameters
+		----------
+		data : DataFrames or DataService, optional
+			The data to score.  DataFrames are scored in place, a range of
+			cases at a time.  From a DataService, the data required by the
+			model (other than choices and weights) is loaded one chunk at a
+			time.  Defaults to the dataframes, or if there are none, the
+			dataservice, of the model.
+		chunk_size : int, default 100_000
+			The number of cases in each chunk.
+		probability, logsums : bool
+			What to compute.
+		n_draws : int, default 0
+			The number of simulated choices to draw for each case.
+		seed : int, default 0
+			The seed for the simulated choices.  Each case has its own
+			random stream, numbered by its position in `data`, so the
+			draws do not depend on `chunk_size` or `n_threads`.
+		n_threads : int, optional
+			The number of threads, defaulting to `n_threads` of the model.
+		float_dtype : dtype, default float64
+			The dtype used for the idca and idco data of chunks loaded from
+			a DataService.
+		prefetch : bool, default True
+			Load the next chunk from a DataService in the background while
+			the current chunk is scored.
+
+		Yields
+		------
+		dictx
+			With the case index of the chunk as 'caseindex', and
+			'probability' (an array of shape [n_cases, n_alts]),
+			'logsums' (an array of shape [n_cases]) and/or 'choices'
+			(an array of shape [n_cases, n_draws], giving the positions
+			of the chosen alternatives, or -1 if none is available).
+		"""
+		from ..util import dictx
+		if data is None:
+			data = self.model.dataframes
+		if data is None:
+			data = self.model.dataservice
+		if data is None:
+			raise ValueError('no data to score')
+		if n_threads is None:
+			n_threads = self.model.n_threads
+
+		if isinstance(data, DataFrames):
+			caseindex = data.caseindex
+			n_cases = data.n_cases
+			for start in range(0, n_cases, chunk_size):
+				stop = min(start + chunk_size, n_cases)
+				pr, ls, ch = self.model._score_dataframes(
+					data, self.values, start, stop,
+					return_probability=probability,
+					return_logsums=logsums,
+					n_threads=n_threads,
+					n_draws=n_draws,
+					seed=seed,
+					case_offset=start,
+				)
+				yield self._chunk_result(dictx(caseindex=caseindex[start:stop]), pr, ls, ch)
+		else:
+			from ..data_services.streaming import iter_dataframes
+			case_offset = 0
+			for chunk in iter_dataframes(
+					data,
+					self._required_data(),
+					chunk_size,
+					float_dtype=float_dtype,
+					prefetch=prefetch,
+			):
+				if chunk.n_cases == 0:
+					continue
+				pr, ls, ch = self.model._score_dataframes(
+					chunk, self.values,
+					return_probability=probability,
+					return_logsums=logsums,
+					n_threads=n_threads,
+					n_draws=n_draws,
+					seed=seed,
+					case_offset=case_offset,
+				)
+				case_offset += chunk.n_cases
+				yield self._chunk_result(dictx(caseindex=chunk.caseindex), pr, ls, ch)
+
+	@staticmethod
+	def _chunk_result(result, pr, ls, ch):
+		if pr is not None:
+			result.probability = pr
+		if ls is not None:
+			result.logsums = ls
+		if ch is not None:
+			result.choices = ch
+		return result
+
+	def _alternative_codes(self, data):
+		if isinstance(data, DataFrames):
+			return data.alternative_codes()
+		if data is None:
+			data = self.model.dataframes if self.model.dataframes is not None else self.model.dataservice
+		return data.alternative_codes()
+
+	def probability(self, data=None, *, chunk_size=100_000, return_dataframe=False, **kwargs):
+		"""
+		Compute probabilities.
+
+		Parameters
+		----------
+		data : DataFrames or DataService, optional
+			See `iter_chunks`.
+		chunk_size : int, default 100_000
+			The number of cases scored at a time.
+		return_dataframe : bool, default False
+			Return a DataFrame indexed by case, with a column for each
+			alternative code, instead of an array.
+		**kwargs
+			Other arguments are passed to `iter_chunks`.
+
+		Returns
+		-------
+		ndarray or pandas.DataFrame
+		"""
+		parts = list(self.iter_chunks(data, chunk_size=chunk_size, probability=True, **kwargs))
+		if not parts:
+			raise ValueError('no cases to score')
+		arr = numpy.concatenate([p.probability for p in parts])
+		if return_dataframe:
+			return pandas.DataFrame(
+				arr,
+				index=parts[0].caseindex.append([p.caseindex for p in parts[1:]]),
+				columns=self._alternative_codes(data),
+			)
+		return arr
+
+	def logsums(self, data=None, *, chunk_size=100_000, return_series=False, **kwargs):
+		"""
+		Compute logsums.
+
+		Parameters
+		----------
+		data : DataFrames or DataService, optional
+			See `iter_chunks`.
+		chunk_size : int, default 100_000
+			The number of cases scored at a time.
+		return_series : bool, default False
+			Return a Series indexed by case, instead of an array.
+		**kwargs
+			Other arguments are passed to `iter_chunks`.
+
+		Returns
+		-------
+		ndarray or pandas.Series
+		"""
+		parts = list(self.iter_chunks(data, chunk_size=chunk_size, probability=False, logsums=True, **kwargs))
+		if not parts:
+			raise ValueError('no cases to score')
+		arr = numpy.concatenate([p.logsums for p in parts])
+		if return_series:
+			return pandas.Series(
+				arr,
+				index=parts[0].caseindex.append([p.caseindex for p in parts[1:]]),
+				name='logsums',
+			)
+		return arr
+
+	def simulate_choices(self, data=None, n_draws=1, seed=0, *, chunk_size=100_000, return_dataframe=True, **kwargs):
+		"""
+		Simulate choices by Monte Carlo draws from the model probabilities.
+
+		See `Model.simulate_choices`.
+
+		Parameters
+		----------
+		data : DataFrames or DataService, optional
+			See `iter_chunks`.
+		n_draws : int, default 1
+			The number of simulated choices for each case.
+		seed : int, default 0
+			The random seed.
+		chunk_size : int, default 100_000
+			The number of cases scored at a time.
+		return_dataframe : bool, default True
+			Return a DataFrame indexed by case, with a column for each
+			draw, giving the codes of the chosen alternatives, instead of
+			an array of their positions.
+		**kwargs
+			Other arguments are passed to `iter_chunks`.
+
+		Returns
+		-------
+		pandas.DataFrame or ndarray
+		"""
+		if n_draws < 1:
+			raise ValueError('n_draws must be positive')
+		parts = list(self.iter_chunks(
+			data, chunk_size=chunk_size, probability=False, n_draws=n_draws, seed=seed, **kwargs,
+		))
+		if not parts:
+			raise ValueError('no cases to score')
+		arr = numpy.concatenate([p.choices for p in parts])
+		if not return_dataframe:
+			return arr
+		codes = numpy.asarray(self._alternative_codes(data))
+		result = pandas.DataFrame(
+			codes[arr],
+			index=parts[0].caseindex.append([p.caseindex for p in parts[1:]]),
+			columns=pandas.RangeIndex(n_draws, name='draw'),
+		)
+		if (arr < 0).any():
+			result = result.where(arr >= 0)
+		return result
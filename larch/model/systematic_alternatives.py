@@ -500,7 +500,7 @@ def magic_nesting(model, sys_alts=None, mu_parameters=None, mu_prefix='MU_'):
 
 
 
-def magic_ogev_nesting(model, ogev_coverage, sys_alts=None, mu_parameters=None, mu_prefix='MU_', ):
+def magic_ogev_nesting(model, ogev_coverage, sys_alts=None, mu_parameters=None, mu_prefix='MU_', alpha_prefix=None):
 	"""
 	Automatically build an OGEV model based on categories used for idce.
 
@@ -521,6 +521,13 @@ def magic_ogev_nesting(model, ogev_coverage, sys_alts=None, mu_parameters=None,
 		the list is created with `mu_prefix` and `sys_alts.groupby`.
 	mu_prefix : str, optional
 		A prefix to append to each item in `sys_alts.groupby` if `mu_parameters` is omitted.
+	alpha_prefix : str, optional
+		If given, the allocation of each node to its ordered cross-nests is
+		estimable: the link to the cross-nest at offset `t` (for `t` of 1 or
+		more) gets an alpha parameter named with this prefix, the groupby
+		level and `t`, e.g. 'ALPHA_dest_1', and the link at offset 0 is the
+		reference.  If not given, each node is allocated evenly among its
+		cross-nests.
 
 	"""
 	if sys_alts is None:
@@ -539,6 +546,12 @@ def magic_ogev_nesting(model, ogev_coverage, sys_alts=None, mu_parameters=None,
 		raise ValueError('cannot find sys_alts')
 
 	groupby = sys_alts.groupby
+
+	def _alpha(level, each_t):
+		if alpha_prefix is None:
+			return {}
+		return dict(alpha=f'{alpha_prefix}{groupby[level]}_{each_t+1}')
+
 	masks = sys_alts.masks
 	unique_alt_codes = sys_alts.altcodes
 	prev_level_mask = 0
@@ -572,7 +585,7 @@ def magic_ogev_nesting(model, ogev_coverage, sys_alts=None, mu_parameters=None,
 				model.graph.add_edge(nestcode & prev_level_mask, nestcode)
 				if prev_t > 0:
 					for each_t in range(prev_t):
-						model.graph.add_edge((nestcode+prev_mask_1*(each_t+1)) & prev_level_mask, nestcode)
+						model.graph.add_edge((nestcode+prev_mask_1*(each_t+1)) & prev_level_mask, nestcode, **_alpha(level-1, each_t))
 
 		prev_level_mask = level_mask
 		prev_mask_1 = mask_1
@@ -586,7 +599,7 @@ def magic_ogev_nesting(model, ogev_coverage, sys_alts=None, mu_parameters=None,
 
 		if prev_t > 0:
 			for each_t in range(prev_t):
-				model.graph.add_edge((altcode + prev_mask_1 * (each_t+1)) & prev_level_mask, altcode)
+				model.graph.add_edge((altcode + prev_mask_1 * (each_t+1)) & prev_level_mask, altcode, **_alpha(len(groupby)-1, each_t))
 
 	# Strip nesting nodes with no successors
 	# Not actually needed; only required nodes are added in the first place...
@@ -61,8 +61,8 @@ class NestingTree(TouchNotify,nx.DiGraph):
 		NestingTree.elementals.invalidate(self, 'elementals')
 		NestingTree.standard_competitive_edge_list.invalidate(self, 'standard_competitive_edge_list')
 		NestingTree.standard_competitive_edge_list_2.invalidate(self, 'standard_competitive_edge_list_2')
-		self._predecessor_slots = {}
-		self._successor_slots = {}
+		NestingTree.standard_edge_arrays.invalidate(self, 'standard_edge_arrays')
+		NestingTree.standard_edge_arrays_by_dn.invalidate(self, 'standard_edge_arrays_by_dn')
 		self.touch()
 
 	def add_edge(self, u, v, implied=False, **kwarg):
@@ -88,7 +88,12 @@ class NestingTree(TouchNotify,nx.DiGraph):
 		self._clear_caches()
 		return result
 
-	def add_node(self, code, *, children=(), parent=None, parents=None, phi_parameters=None, **kwarg):
+	def remove_node(self, n):
+		result = super().remove_node(n)
+		self._clear_caches()
+		return result
+
+	def add_node(self, code, *, children=(), parent=None, parents=None, phi_parameters=None, alpha_parameters=None, **kwarg):
 		"""
 		Add a single node `code` and update node attributes.
 
@@ -116,6 +121,13 @@ class NestingTree(TouchNotify,nx.DiGraph):
 			node, used in network GEV models. The keys of this mapping
 			indicate the node at the other end of the link, and the
 			values are parameter names.
+		alpha_parameters : Mapping
+			Set allocation parameters on graph links from parent nodes
+			to this node, used in cross-nested logit models.  The keys of
+			this mapping are parent node codes, and the values are
+			parameter names.  The share of this node allocated to each
+			parent is a logit over these parameters, with a value of zero
+			for links without a parameter.
 		kwarg : other keyword arguments, optional
 			Set or change node attributes using key=value.
 		"""
@@ -140,6 +152,12 @@ class NestingTree(TouchNotify,nx.DiGraph):
 					self.edges[k, code]['parameter'] = str(parametername)
 				else:
 					raise ValueError(f"connected node {k} from phi_parameters not found")
+		if alpha_parameters is not None:
+			for k, parametername in alpha_parameters.items():
+				if (k, code) in self.edges:
+					self.edges[k, code]['alpha'] = str(parametername)
+				else:
+					raise ValueError(f"parent node {k} from alpha_parameters not found")
 		self._clear_caches()
 
 	def new_node(self, *, code=None, **kwarg):
@@ -208,11 +226,8 @@ class NestingTree(TouchNotify,nx.DiGraph):
 		# 	if not out_degree:
 		# 		self._topological_sorted_no_elementals.remove(code)
 		# return self._topological_sorted_no_elementals
-		result = self.topological_sorted.copy()
-		for code, out_degree in self.out_degree:
-			if not out_degree:
-				result.remove(code)
-		return result
+		elementals = set(self.__elementals_iter())
+		return [code for code in self.topological_sorted if code not in elementals]
 
 	@lazy
 	def standard_sort(self):
@@ -235,23 +250,81 @@ class NestingTree(TouchNotify,nx.DiGraph):
 	def standard_slot_map(self):
 		return {i:n for n,i in enumerate(self.standard_sort)}
 
+	@lazy
+	def standard_edge_arrays(self):
+		"""
+		The edges of the tree in compressed sparse row form.
+
+		Edges are grouped by their upstream node, with the groups in the
+		order of `standard_sort`, and the edges within each group in the
+		order of the successors of that node.  Only the edges are stored,
+		so the size of these arrays is linear in the number of edges, and
+		not quadratic in the number of nodes.  The arrays are built once and
+		cached until the structure of the tree is changed, and must not be
+		modified.
+
+		Returns
+		-------
+		up, dn : ndarray[int32] of shape [n_edges]
+			The slots (positions in `standard_sort`) of the upstream and
+			downstream node of each edge.
+		n_edges_for_up : ndarray[int32] of shape [n_nodes]
+			The number of edges with each node upstream.
+		first_edge_for_up : ndarray[int32] of shape [n_nodes]
+			The position of the first edge with each node upstream, or -1
+			for nodes without successors.
+		"""
+		slot_map = self.standard_slot_map
+		n_nodes = len(slot_map)
+		up = numpy.empty(self.n_edges, dtype=numpy.int32)
+		dn = numpy.empty(self.n_edges, dtype=numpy.int32)
+		num = numpy.zeros(n_nodes, dtype=numpy.int32)
+		start = numpy.full(n_nodes, -1, dtype=numpy.int32)
+		n = 0
+		succ = self._succ
+		for upslot, upcode in enumerate(self.standard_sort):
+			children = succ[upcode]
+			if children:
+				start[upslot] = n
+				num[upslot] = len(children)
+				for dncode in children:
+					up[n] = upslot
+					dn[n] = slot_map[dncode]
+					n += 1
+		return up, dn, num, start
+
+	@lazy
+	def standard_edge_arrays_by_dn(self):
+		"""
+		The edges of the tree grouped by their downstream node.
+
+		Returns
+		-------
+		edges : ndarray[int32] of shape [n_edges]
+			Positions in `standard_edge_arrays`, grouped by the downstream
+			node in the order of `standard_sort`.
+		n_edges_for_dn : ndarray[int32] of shape [n_nodes]
+			The number of edges with each node downstream.
+		first_edge_for_dn : ndarray[int32] of shape [n_nodes]
+			The position in `edges` of the first edge with each node
+			downstream.
+		"""
+		up, dn, num, start = self.standard_edge_arrays
+		edges = numpy.argsort(dn, kind='stable').astype(numpy.int32)
+		n_for_dn = numpy.bincount(dn, minlength=len(num)).astype(numpy.int32)
+		first_for_dn = numpy.zeros_like(n_for_dn)
+		numpy.cumsum(n_for_dn[:-1], out=first_for_dn[1:])
+		return edges, n_for_dn, first_for_dn
+
 	def predecessor_slots(self, code):
-		if code in self._predecessor_slots:
-			return self._predecessor_slots[code]
-		s = numpy.empty(self.in_degree(code), dtype=numpy.int32)
-		for n,i in enumerate( self.predecessors(code) ):
-			s[n] = self.standard_slot_map[i]
-		self._predecessor_slots[code] = s
-		return s
+		slot = self.standard_slot_map[code]
+		edges, num, start = self.standard_edge_arrays_by_dn
+		return self.standard_edge_arrays[0][edges[start[slot]:start[slot]+num[slot]]]
 
 	def successor_slots(self, code):
-		if code in self._successor_slots:
-			return self._successor_slots[code]
-		s = numpy.empty(self.out_degree(code), dtype=numpy.int32)
-		for n,i in enumerate( self.successors(code) ):
-			s[n] = self.standard_slot_map[i]
-		self._successor_slots[code] = s
-		return s
+		slot = self.standard_slot_map[code]
+		up, dn, num, start = self.standard_edge_arrays
+		return dn[start[slot]:start[slot]+num[slot]]
 
 	def __elementals_iter(self):
 		for code, out_degree in self.out_degree:
@@ -296,18 +369,12 @@ class NestingTree(TouchNotify,nx.DiGraph):
 
 	def edge_slot_arrays(self, alpha_locator=None):
 		s = self.n_edges
-		up = numpy.zeros(s, dtype=numpy.int32)
-		dn = numpy.zeros(s, dtype=numpy.int32)
+		up, dn, _, _ = self.standard_edge_arrays
+		up = up.copy()
+		dn = dn.copy()
 		first_visit = numpy.zeros(s, dtype=numpy.int32)
 		alloc_slot = numpy.full_like(first_visit, -1)
-		n = s
 		first_visit_found = set()
-		for upcode in reversed(self.standard_sort):
-			upslot = self.standard_slot_map[upcode]
-			for dnslot in reversed(self.successor_slots(upcode)):
-				n -= 1
-				up[n] = upslot
-				dn[n] = dnslot
 		for n in range(s):
 			if dn[n] not in first_visit_found:
 				first_visit[n] = 1
@@ -354,8 +421,8 @@ class NestingTree(TouchNotify,nx.DiGraph):
 			'standard_slot_map',
 			#'_standard_elemental_sort',
 			'elementals',
-			'_predecessor_slots',
-			'_successor_slots',
+			'standard_edge_arrays',
+			'standard_edge_arrays_by_dn',
 			'_TouchNotify__touch_callback',
 			'node_dict_factory',
 
@@ -367,8 +434,6 @@ class NestingTree(TouchNotify,nx.DiGraph):
 
 	def __setstate__(self, state):
 		self.__dict__ = state.copy()
-		self._predecessor_slots = {}
-		self._successor_slots = {}
 		self.set_touch_callback(None)
 
 	def __xml__(self, use_viz=True, use_dot=True, output='svg', figsize=None, **format):
@@ -673,41 +738,60 @@ class NestingTree(TouchNotify,nx.DiGraph):
 			for i in tier:
 				next_tier.extend(self.successors(i))
 
+	def edge_alpha_parameters(self):
+		"""
+		The names of the allocation parameters on the edges.
+
+		Returns
+		-------
+		list
+			The name of the 'alpha' parameter of each edge, or None if it
+			has no such parameter, in the order of `standard_edge_arrays`.
+		"""
+		result = []
+		succ = self._succ
+		for upcode in self.standard_sort:
+			for edgedata in succ[upcode].values():
+				pname = edgedata.get('alpha', None)
+				result.append(None if pname is None else str(pname))
+		return result
+
 	def _get_simple_mu_and_alpha(self, model, holdfast_invalidates=True):
-		alpha = numpy.zeros([len(self), len(self)], dtype=numpy.float64)
+		"""
+		Collect the nesting parameters for the likelihood kernels.
+
+		The share of a node allocated to each of its parents (alpha) is a
+		logit over the edges into that node, using as the utility of each
+		edge the value of the parameter named by its 'alpha' attribute, or
+		zero if it has no such attribute.  Without any alpha parameters,
+		each node is allocated evenly among its parents, and a node with a
+		single parent is always fully allocated to it.
+		"""
 		mu    = numpy.ones ([len(self),          ], dtype=numpy.float64)
 		muslots= numpy.full([len(self),          ], -1, dtype=numpy.int32)
+		nodes = self._node
 		for child, childcode in enumerate(self.standard_sort):
-			for parent in self.predecessor_slots(childcode):
-				alpha[parent, child] = 1
-			pname = self.nodes[childcode].get('parameter', None)
+			pname = nodes[childcode].get('parameter', None)
 			mu[child] = model.get_value(pname, default=1.0)
 			muslots[child] = model.get_slot_x(pname, holdfast_invalidates)
 
-		s = self.n_edges
-		up = numpy.zeros(s, dtype=numpy.int32)
-		dn = numpy.zeros(s, dtype=numpy.int32)
-		val = numpy.zeros(s, dtype=numpy.float64)
-		num = numpy.zeros(len(self.nodes), dtype=numpy.int32)
-		start = numpy.full(len(self.nodes), -1, dtype=numpy.int32)
-		#first_visit = numpy.zeros(s, dtype=numpy.int32)
-		n = s
-		#first_visit_found = set()
-		for upcode in reversed(self.standard_sort):
-			upslot = self.standard_slot_map[upcode]
-			for dnslot in reversed(self.successor_slots(upcode)):
-				n -= 1
-				up[n] = upslot
-				dn[n] = dnslot
-				num[upslot] += 1
-				start[upslot] = n
-				val[n] = 1/len(self.predecessor_slots(self.standard_sort[dnslot])) # TODO make not always constant fraction
-		# for n in range(s):
-		# 	if dn[n] not in first_visit_found:
-		# 		first_visit[n] = 1
-		# 		first_visit_found.add(dn[n])
+		up, dn, num, start = self.standard_edge_arrays
+		edges, n_for_dn, first_for_dn = self.standard_edge_arrays_by_dn
+		alphaslots = numpy.full(len(dn), -1, dtype=numpy.int32)
+		theta = numpy.zeros(len(dn), dtype=numpy.float64)
+		for e, pname in enumerate(self.edge_alpha_parameters()):
+			if pname is not None:
+				theta[e] = model.get_value(pname, default=0.0)
+				alphaslots[e] = model.get_slot_x(pname, holdfast_invalidates)
+		if len(dn):
+			theta_max = numpy.full(len(n_for_dn), -numpy.inf)
+			numpy.maximum.at(theta_max, dn, theta)
+			val = numpy.exp(theta - theta_max[dn])
+			val /= numpy.bincount(dn, weights=val, minlength=len(n_for_dn))[dn]
+		else:
+			val = theta
 
-		return mu, muslots, alpha, up, dn, num, start, val
+		return mu, muslots, up, dn, num, start, val, alphaslots
 
 def graph_to_figure(graph, output_format='svg', **format):
 
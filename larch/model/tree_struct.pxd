@@ -9,7 +9,6 @@ cdef class TreeStructure:
 		int             n_nodes
 		int             n_elementals
 		l4_float_t[:]   model_mu_param_values     # [n_nodes]
-		l4_float_t[:,:] model_alpha_param_values  # [n_nodes, n_nodes]
 		int[:]          model_mu_param_slots      # [n_nodes]
 
 		int           n_edges
@@ -19,3 +18,8 @@ cdef class TreeStructure:
 		l4_float_t[:] edge_logalpha_values # [n_edges]
 		int[:]        first_edge_for_up    # [n_nodes] index of first edge where this node is the up
 		int[:]        n_edges_for_up       # [n_nodes] n edge where this node is the up
+		int[:]        edge_alpha_param_slots # [n_edges] slot of the alpha parameter, or -1
+		bint          has_alpha_params
+		int[:]        edges_by_dn          # [n_edges] edges grouped by the dn
+		int[:]        first_edge_for_dn    # [n_nodes] index in edges_by_dn of first edge where this node is the dn
+		int[:]        n_edges_for_dn       # [n_nodes] n edge where this node is the dn
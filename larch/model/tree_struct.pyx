@@ -7,10 +7,9 @@ cdef class TreeStructure:
 	def __init__(self, model, graph):
 		self.n_nodes = len(graph)
 		self.n_elementals = graph.n_elementals()
-		mu, muslots, alpha, up, dn, num, start, val = graph._get_simple_mu_and_alpha(model)
+		mu, muslots, up, dn, num, start, val, alphaslots = graph._get_simple_mu_and_alpha(model)
 		self.model_mu_param_values = mu        # [n_nodes]
 		self.model_mu_param_slots = muslots    # [n_nodes]
-		self.model_alpha_param_values = alpha  # [n_nodes,n_nodes]
 		self.n_edges               = dn.shape[0]    #
 		self.edge_dn               = dn             # [n_edges]
 		self.edge_up               = up             # [n_edges]
@@ -18,3 +17,9 @@ cdef class TreeStructure:
 		self.edge_logalpha_values  = numpy.log(val) # [n_edges]
 		self.first_edge_for_up     = start          # [n_nodes] index of first edge where this node is the up
 		self.n_edges_for_up        = num            # [n_nodes] n edge where this node is the up
+		self.edge_alpha_param_slots = alphaslots    # [n_edges]
+		self.has_alpha_params      = bool((alphaslots >= 0).any())
+		edges, n_for_dn, first_for_dn = graph.standard_edge_arrays_by_dn
+		self.edges_by_dn           = edges          # [n_edges] edges grouped by the dn
+		self.first_edge_for_dn     = first_for_dn   # [n_nodes] index in edges_by_dn of first edge where this node is the dn
+		self.n_edges_for_dn        = n_for_dn       # [n_nodes] n edge where this node is the dn
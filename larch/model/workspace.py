@@ -0,0 +1,60 @@
+import numpy
+
+
+class KernelWorkspace:
+	"""
+	Scratch buffers for the likelihood kernels, kept between calls.
+
+	Each call to a casewise likelihood kernel needs per-thread scratch
+	arrays (utility, probability, and accumulators for the gradient and
+	BHHH matrix).  Allocating these anew on every call costs noticeable
+	time for large models, as every iteration of an optimizer touches fresh
+	memory.  A workspace holds the arrays by name, and hands back the same
+	array (zeroed) on the next request with the same shape and dtype.
+
+	Buffers from a workspace are only valid until the next request for the
+	same name, so they must not be returned to the user, and a workspace
+	must not be shared by computations running concurrently.
+	"""
+
+	def __init__(self):
+		self._buffers = {}
+
+	def zeros(self, name, shape, dtype=numpy.float64):
+		"""
+		Get a zeroed scratch array.
+
+		Parameters
+		----------
+		name : str
+			Identifies the buffer.
+		shape : tuple of int
+		dtype : dtype, default float64
+
+		Returns
+		-------
+		ndarray
+		"""
+		shape = tuple(int(i) for i in shape)
+		arr = self._buffers.get(name)
+		if arr is None or arr.shape != shape or arr.dtype != dtype:
+			arr = numpy.zeros(shape, dtype=dtype)
+			self._buffers[name] = arr
+		else:
+			arr.fill(0)
+		return arr
+
+	def clear(self):
+		"""Release all buffers."""
+		self._buffers.clear()
+
+	@property
+	def nbytes(self):
+		"""int : Total size of the buffers held."""
+		return sum(arr.nbytes for arr in self._buffers.values())
+
+	def __len__(self):
+		return len(self._buffers)
+
+	def __repr__(self):
+		return f"<larch.model.workspace.KernelWorkspace with {len(self)} buffers, {self.nbytes} bytes>"
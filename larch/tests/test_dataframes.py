@@ -245,3 +245,53 @@ def test_co_only():
 	all(d.data_av == 1)
 
 
+
+
+def test_dump_mmap(tmp_path):
+	from .. import example
+	m = example(1)
+	m.load_data()
+	m.set_values({
+		'ASC_BIKE': -0.85,
+		'ASC_SR2': -0.52,
+		'hhinc#2': -0.001,
+		'totcost': -0.0013,
+		'tottime': -0.018,
+	})
+	ll0 = m.loglike()
+	dfs = m.dataframes
+	dfs.dump_mmap(tmp_path / "ca")
+	dfs2 = DataFrames.load(tmp_path / "ca")
+	assert all(dfs2.data_ch.columns == dfs.alternative_codes())
+
+	def assert_memory_mapped(d):
+		# the arrays the model computes with are views on the mapped files
+		for frame, array in (
+				(d.data_ca, d.array_ca()),
+				(d.data_co, d.array_co()),
+				(d.data_av, d.array_av()),
+				(d.data_ch, d.array_ch()),
+		):
+			arr = frame.values
+			while not isinstance(arr, numpy.memmap):
+				assert arr.base is not None
+				arr = arr.base
+			assert numpy.shares_memory(array, arr)
+
+	m.dataframes = dfs2
+	assert m.loglike() == approx(ll0)
+	assert_memory_mapped(m.dataframes)
+	m.load_data(dataservice=dfs2)
+	assert m.loglike() == approx(ll0)
+	assert_memory_mapped(m.dataframes)
+
+	sampled = dfs.sample_alternatives(2, seed=1)
+	sampled.dump_mmap(tmp_path / "ce")
+	sampled2 = DataFrames.load_mmap(tmp_path / "ce")
+	assert sampled2.sampling_correction.values == approx(sampled.sampling_correction.values)
+	m.dataframes = sampled
+	ll1 = m.loglike()
+	m.dataframes = sampled2
+	assert m.loglike() == approx(ll1)
+	with raises(ValueError):
+		DataFrames.load_mmap(tmp_path / "ce", mmap_mode='r')
@@ -1,4 +1,4 @@
-from pytest import approx
+from pytest import approx, raises
 
 import larch
 import pandas
@@ -110,3 +110,135 @@ def test_latent_class():
 	# 	'W_OTHER': 1.0943806549385064,
 	# })
 	#
+
+
+def _swissmetro_latent_class():
+
+	raw_df = pandas.read_csv(data_warehouse.example_file('swissmetro.csv.gz'))
+	raw_df['CAR_AV_SP'] = raw_df.eval("CAR_AV * (SP!=0)")
+	raw_df['TRAIN_AV_SP'] = raw_df.eval("TRAIN_AV * (SP!=0)")
+	keep = raw_df.eval("PURPOSE in (1,3) and CHOICE != 0")
+	dfs = larch.DataFrames(raw_df[keep], alt_codes=[1,2,3])
+
+	m1 = larch.Model(dataservice=dfs)
+	m1.availability_co_vars = {1: "TRAIN_AV_SP", 2: "SM_AV", 3: "CAR_AV_SP"}
+	m1.choice_co_code = 'CHOICE'
+	m1.utility_co[1] = P("ASC_TRAIN") + X("TRAIN_CO*(GA==0)") * P("B_COST")
+	m1.utility_co[2] = X("SM_CO*(GA==0)") * P("B_COST")
+	m1.utility_co[3] = P("ASC_CAR") + X("CAR_CO") * P("B_COST")
+
+	m2 = larch.Model(dataservice=dfs)
+	m2.availability_co_vars = {1: "TRAIN_AV_SP", 2: "SM_AV", 3: "CAR_AV_SP"}
+	m2.choice_co_code = 'CHOICE'
+	m2.utility_co[1] = P("ASC_TRAIN") + X("TRAIN_TT") * P("B_TIME") + X("TRAIN_CO*(GA==0)") * P("B_COST")
+	m2.utility_co[2] = X("SM_TT") * P("B_TIME") + X("SM_CO*(GA==0)") * P("B_COST")
+	m2.utility_co[3] = P("ASC_CAR") + X("CAR_TT") * P("B_TIME") + X("CAR_CO") * P("B_COST")
+
+	km = larch.Model()
+	km.utility_co[2] = P.W_OTHER + P.W_INC * X("INCOME")
+
+	from larch.model.latentclass import LatentClassModel
+	m = LatentClassModel(km, {1:m1, 2:m2})
+	m.load_data()
+	m.set_values(ASC_CAR=0.125, ASC_TRAIN=-0.398, B_COST=-.0126, B_TIME=-0.028, W_OTHER=1.095, W_INC=-0.1)
+	return m
+
+
+def test_latent_class_fused_kernel():
+	import numpy
+	from larch.model import persist_flags
+	from larch.model.latentclass import LatentClassModel
+
+	m = _swissmetro_latent_class()
+	assert m._fused_mnl_ready()
+	fused = m.loglike2_bhhh(persist=persist_flags.PERSIST_PROBABILITY)
+	fused_part = m.loglike2(start_case=5, stop_case=2000, step_case=3)
+
+	m._fused_mnl_ready = lambda: False
+	general = m.loglike2_bhhh(persist=persist_flags.PERSIST_PROBABILITY)
+	general_part = m.loglike2(start_case=5, stop_case=2000, step_case=3)
+	del m._fused_mnl_ready
+
+	assert fused.ll == approx(general.ll)
+	assert numpy.asarray(fused.dll) == approx(numpy.asarray(general.dll))
+	assert fused.bhhh == approx(general.bhhh)
+	assert fused.probability == approx(general.probability)
+	assert fused_part.ll == approx(general_part.ll)
+	assert numpy.asarray(fused_part.dll) == approx(numpy.asarray(general_part.dll))
+	assert m.check_d_loglike().data.similarity.min() > 4
+
+
+def test_latent_class_em():
+	import numpy
+
+	m = _swissmetro_latent_class()
+	ll0 = m.loglike()
+	h = m.class_posterior_probability()
+	assert h.shape == (m.n_cases, 2)
+	assert h.sum(1).values == approx(1.0)
+
+	result = m.estimate_em(maxiter=4, m_step_maxiter=20, responsibilities=h)
+	assert result.iterations == 4
+	assert len(result.history) == 5
+	assert result.history.iloc[0] == approx(ll0)
+	assert numpy.all(numpy.diff(result.history.values) > -1e-6)
+	assert result.loglike == approx(result.history.iloc[-1])
+	assert result.loglike > ll0 + 10
+	# the weights and choices used in the M-step are removed afterwards
+	assert m.dataframes.data_wt is None
+	for k_model in m._k_models.values():
+		assert k_model.dataframes.data_wt is None
+	assert m._k_membership.dataframes.data_ch.values.sum() == 0
+
+
+def test_latent_class_nested_class_gradient():
+	import numpy
+	from larch.model.nl import d_loglike_from_d_probability
+
+	m = _swissmetro_latent_class()
+	m._k_models[2].graph.new_node(parameter='MU_RAIL', children=[1, 2], name='rail')
+	m.load_data()
+	m.set_values(ASC_CAR=0.125, ASC_TRAIN=-0.398, B_COST=-.0126, B_TIME=-0.028, W_OTHER=1.095, W_INC=-0.1, MU_RAIL=0.7)
+	assert not m._fused_mnl_ready()
+
+	y = m.loglike2_bhhh()
+	ch = m.dataframes.array_ch()
+	dll, bhhh = d_loglike_from_d_probability(m.probability(), m.d_probability(), ch, None, True)
+	assert y.ll == approx(m.loglike())
+	assert numpy.asarray(y.dll) == approx(dll)
+	assert y.bhhh == approx(bhhh)
+	assert m.check_d_loglike().data.similarity.min() > 4
+
+	part = m.loglike2(start_case=5, stop_case=2000, step_case=3)
+	dll_part = d_loglike_from_d_probability(
+		m.probability(start_case=5, stop_case=2000, step_case=3),
+		m.d_probability(start_case=5, stop_case=2000, step_case=3),
+		ch[5:2000:3], None, False,
+	)
+	assert numpy.asarray(part.dll) == approx(dll_part)
+
+	# the choices and weights of the component models are restored
+	assert m._k_membership.dataframes.data_ch.values.sum() == 0
+	assert m._k_models[2].dataframes.data_ch.values == approx(ch)
+	assert m._k_models[2].dataframes.data_wt is None
+
+
+def test_latent_class_cross_validation_folds():
+	import numpy
+	m = _swissmetro_latent_class()
+	assert m._fused_mnl_ready()
+	full = m.loglike2()
+	keep = m.loglike2(keep_only=1, subsample=3)
+	drop = m.loglike2(leave_out=1, subsample=3)
+	assert keep.ll + drop.ll == approx(full.ll)
+	assert numpy.asarray(keep.dll) + numpy.asarray(drop.dll) == approx(numpy.asarray(full.dll))
+	assert m.loglike(leave_out=1, subsample=3) == approx(drop.ll)
+	assert m.loglike() == approx(full.ll)
+	with raises(ValueError):
+		m.loglike2(leave_out=0)
+	with raises(ValueError):
+		m.loglike(keep_only=0)
+	ll_cv = m.cross_validate(cv=3, n_jobs=3, method='slsqp')
+	assert numpy.isfinite(ll_cv)
+	assert ll_cv < m.loglike()
+	assert 'cv_002' in m.pf.columns
@@ -4965,3 +4965,632 @@ def test_linear_component_scale():
 		'nonmotorized_time': -101752.27351325999,
 		'totcost': 59215.91013275611,
 	})
+
+
+def test_mnl_blocked_engine():
+	from ..model.persist_flags import PERSIST_ALL, PERSIST_D_PROBABILITY
+	from .. import example
+	m = example(1)
+	m.load_data()
+	m.set_values({
+		'ASC_BIKE': -0.85,
+		'ASC_SR2': -0.52,
+		'hhinc#2': -0.001,
+		'totcost': -0.0013,
+		'tottime': -0.018,
+	})
+	m.set_value('ASC_WALK', holdfast=1, value=0.05)
+	persist = PERSIST_ALL & ~PERSIST_D_PROBABILITY
+	r0 = m.loglike2_bhhh(persist=persist)
+	m.mnl_block_size = 1000
+	r1 = m.loglike2_bhhh(persist=persist)
+	assert r1.ll == approx(r0.ll)
+	assert r1.dll.values == approx(r0.dll.values)
+	assert r1.bhhh == approx(r0.bhhh)
+	assert r1.probability == approx(r0.probability)
+	assert r1.dll_casewise.values == approx(r0.dll_casewise.values)
+
+	m.mnl_block_size = 0
+	a = m.loglike2(start_case=3, stop_case=4000, step_case=7, leave_out=1, subsample=3)
+	m.mnl_block_size = 512
+	b = m.loglike2(start_case=3, stop_case=4000, step_case=7, leave_out=1, subsample=3)
+	assert b.ll == approx(a.ll)
+	assert b.dll.values == approx(a.dll.values)
+
+
+def test_mnl_analytic_hessian():
+	from ..model.persist_flags import PERSIST_D2_LOGLIKE
+	from ..math.optimize import approx_fprime
+	from .. import example
+	m = example(1)
+	m.load_data()
+	m.set_values({
+		'ASC_BIKE': -0.85,
+		'ASC_SR2': -0.52,
+		'hhinc#2': -0.001,
+		'totcost': -0.0013,
+		'tottime': -0.018,
+	})
+	m.set_value('ASC_WALK', holdfast=1, value=0.05)
+	assert 'd2ll' in m.loglike2(persist=PERSIST_D2_LOGLIKE)
+	h = m.d2_loglike()
+	fd = approx_fprime(m.pvals, lambda y: m.d_loglike(y))
+	assert h == approx(fd, rel=1e-4, abs=1e-2)
+	m.mnl_block_size = 1000
+	assert m.d2_loglike() == approx(h, rel=1e-5)
+
+
+def test_nl_parallel_finite_difference_hessian():
+	from .. import example
+	m = example(22)
+	m.load_data()
+	m.set_values({
+		'ASC_BIKE': -0.85,
+		'ASC_SR2': -0.52,
+		'totcost': -0.0013,
+		'tottime': -0.018,
+		'MU_motor': 0.7,
+	})
+	x0 = m.pvals
+	h0 = m.d2_loglike()
+	assert m.pvals == approx(x0)
+	h1 = m.d2_loglike(n_jobs=2)
+	assert h1 == approx(h0)
+	h2 = m.d2_loglike(n_jobs=2, central=True)
+	assert h2 == approx(h0, rel=1e-4, abs=1e2)
+	assert h2 == approx(h2.T, rel=1e-5, abs=1e1)
+	assert m.pvals == approx(x0)
+
+
+def test_float32_storage():
+	from .. import example
+	m = example(1)
+	m.load_data()
+	m.set_values({
+		'ASC_BIKE': -0.85,
+		'ASC_SR2': -0.52,
+		'hhinc#2': -0.001,
+		'totcost': -0.0013,
+		'tottime': -0.018,
+	})
+	r0 = m.loglike2_bhhh()
+	m.load_data(float_dtype=numpy.float32)
+	assert all(m.dataframes.data_ca.dtypes == numpy.float32)
+	assert all(m.dataframes.data_co.dtypes == numpy.float32)
+	assert all(m.dataframes.data_ch.dtypes == numpy.float64)
+	r1 = m.loglike2_bhhh()
+	assert r1.ll == approx(r0.ll, rel=1e-7)
+	assert r1.dll.values == approx(r0.dll.values, rel=1e-4, abs=1e-2)
+	assert r1.bhhh == approx(r0.bhhh, rel=1e-4)
+	m.mnl_block_size = 500
+	r2 = m.loglike2_bhhh()
+	assert r2.ll == approx(r1.ll)
+	assert r2.dll.values == approx(r1.dll.values)
+
+
+def test_mnl_ce_engine():
+	from ..data_warehouse import example_file
+	from ..dataframes import DataFrames
+	from ..model.mnl import (
+		_mnl_ce_engine_available,
+		mnl_d_log_likelihood_from_dataframes_all_rows,
+	)
+	from ..model.persist_flags import PERSIST_ALL, PERSIST_D_PROBABILITY
+	df = pandas.read_csv(example_file("MTCwork.csv.gz"))
+	df.set_index(['casenum', 'altnum'], inplace=True)
+	m = Model(dataservice=DataFrames.from_idce(df, choice='chose', crack=True))
+	m.utility_co[2] = P("ASC_SR2") + P("hhinc#2") * X("hhinc")
+	m.utility_co[3] = P("ASC_SR3P") + P("hhinc#3") * X("hhinc")
+	m.utility_co[4] = P("ASC_TRAN") + P("hhinc#4") * X("hhinc")
+	m.utility_co[5] = P("ASC_BIKE")
+	m.utility_co[6] = P("ASC_WALK")
+	m.utility_ca = P("tottime") * X("tottime") + P("totcost") * X("totcost")
+	m.choice_ca_var = 'chose'
+	m.load_data()
+	assert _mnl_ce_engine_available(m.dataframes)
+	assert m.dataframes.array_ce_caseptr[-1] == 22033
+	m.set_values({
+		'ASC_BIKE': -0.85,
+		'ASC_SR2': -0.52,
+		'hhinc#2': -0.001,
+		'totcost': -0.0013,
+		'tottime': -0.018,
+	})
+	persist = PERSIST_ALL & ~PERSIST_D_PROBABILITY
+	r0 = m.loglike2_bhhh(persist=persist)
+	r1 = mnl_d_log_likelihood_from_dataframes_all_rows(m.dataframes, return_bhhh=True, persist=persist)
+	assert r0.ll == approx(-6414.466996096928)
+	assert r0.ll == approx(r1.ll)
+	assert r0.dll.values == approx(r1.dll.values)
+	assert r0.bhhh == approx(r1.bhhh)
+	assert r0.d2ll == approx(r1.d2ll)
+	assert r0.probability == approx(r1.probability)
+	assert r0.ll_casewise == approx(r1.ll_casewise)
+	r2 = m.loglike2(start_case=3, stop_case=4000, step_case=7, leave_out=1, subsample=3)
+	r3 = mnl_d_log_likelihood_from_dataframes_all_rows(
+		m.dataframes, start_case=3, stop_case=4000, step_case=7, leave_out=1, subsample=3,
+	)
+	assert r2.ll == approx(r3.ll)
+	assert r2.dll.values == approx(r3.dll.values)
+	assert m.dataframes.array_ce_reversemap[2, 4] == -1
+	assert m.dataframes.data_av_as_ce().shape == (22033, 1)
+	# choices and availability are stored by data_ce row, and widened on access
+	dfs = m.dataframes
+	assert dfs.data_ch.shape == (5029, 6)
+	assert dfs.data_ch.values.sum() == approx(5029)
+	assert dfs.data_av.values.sum() == 22033
+	assert dfs.data_ch_as_ce().shape == (22033, 1)
+	dense = DataFrames(
+		co=dfs.data_co,
+		ca=dfs.data_ce.unstack().stack(dropna=False).fillna(0),
+		av=dfs.data_av,
+		ch=dfs.data_ch,
+	)
+	m.dataservice = dense
+	m.load_data()
+	r4 = m.loglike2()
+	assert r4.ll == approx(r0.ll)
+	assert r4.dll.values == approx(r0.dll.values)
+
+
+def test_sample_alternatives():
+	from .. import example
+	from ..model.persist_flags import PERSIST_UTILITY
+	for n in (1, 22):
+		m = example(n)
+		m.load_data()
+		m.set_values({
+			'ASC_BIKE': -0.85,
+			'ASC_SR2': -0.52,
+			'hhinc#2': -0.001,
+			'totcost': -0.0013,
+			'tottime': -0.018,
+		})
+		r0 = m.loglike2()
+		dfs = m.dataframes
+		# uniform sampling of every available alternative only adds a
+		# constant to the utilities of each case
+		m.sample_alternatives(10, seed=0, replace=False)
+		assert m.dataframes.data_ce.shape[0] == 22033
+		r1 = m.loglike2()
+		assert r1.ll == approx(r0.ll)
+		assert r1.dll.values == approx(r0.dll.values)
+		m.dataframes = dfs
+
+	size = pandas.Series([1., 2., 3., 4., 5., 6.], index=dfs.alternative_codes())
+	m.sample_alternatives(2, importance=size, seed=3)
+	d = m.dataframes
+	assert d.data_ce.shape[0] < 22033
+	assert (d.data_ch.values * d.data_av.values).sum() == approx(d.data_ch.values.sum())
+	u0 = m.loglike2(persist=PERSIST_UTILITY).utility
+	correction = d.sampling_correction.values
+	d.sampling_correction = None
+	u1 = m.loglike2(persist=PERSIST_UTILITY).utility
+	cases = d.array_ce_caseindexes
+	alts = numpy.asarray(d.array_ce_altindexes)
+	assert (u0 - u1)[cases, alts] == approx(correction)
+	assert dfs.sample_alternatives(2, importance=size, seed=3).sampling_correction.values == approx(correction)
+	# without replacement, the correction uses the approximate inclusion probability
+	d = dfs.sample_alternatives(2, importance=size, seed=3, replace=False)
+	w = dfs.data_av.values * size.values
+	q = (w / w.sum(axis=1, keepdims=True))[d.array_ce_caseindexes, numpy.asarray(d.array_ce_altindexes)]
+	assert d.sampling_correction.values == approx(-numpy.log(1 - (1 - q) ** 2))
+
+
+def test_utility_cache():
+	from .. import example
+	m = example(1)
+	m.load_data()
+	values = {
+		'ASC_BIKE': -0.85,
+		'ASC_SR2': -0.52,
+		'hhinc#2': -0.001,
+		'totcost': -0.0013,
+		'tottime': -0.018,
+		'ASC_WALK': 0.0,
+	}
+	m.set_values(values)
+	ll0 = m.loglike()
+	m.utility_cache = True
+	assert m.dataframes._utility_cache_is_available()
+	assert m.loglike() == approx(ll0)
+	m.set_value('tottime', -0.02)
+	m.set_value('ASC_WALK', 0.1)
+	ll1 = m.loglike()
+	assert m.dataframes._utility_cache_updates == 1
+	m.utility_cache = False
+	assert ll1 == approx(m.loglike())
+	assert ll1 != approx(ll0)
+	m.utility_cache = True
+	m.set_values(values)
+	assert m.loglike() == approx(ll0)
+	for v in numpy.linspace(-0.0005, -0.003, 70):
+		m.set_value('totcost', v)
+		ll2 = m.loglike()
+	m.utility_cache = False
+	assert ll2 == approx(m.loglike(), rel=1e-10)
+	m.utility_cache = True
+	m.utility_co[2] = P("ASC_SR2") + P("hhinc#2") * X("hhinc") + P("hhinc#2") * X("hhinc")
+	m.load_data()
+	ll3 = m.loglike()
+	m.utility_cache = False
+	assert ll3 == approx(m.loglike())
+	assert m.loglike2().ll == approx(ll3)
+
+
+def test_maximize_loglike_stochastic():
+	from .. import example
+	m = example(1)
+	m.load_data()
+	target = m.maximize_loglike(quiet=True).loglike
+	for method in ('bhhh', 'adam', 'svrg'):
+		m.set_values('null')
+		r = m.maximize_loglike_stochastic(method, n_batches=5, epochs=3, seed=0, polish=False)
+		assert r.method == f'stochastic-{method}'
+		assert 0 <= r.stochastic_rejected_steps < r.stochastic_steps
+		h = r.stochastic_history.loglike
+		assert len(h) == 4
+		assert h.iloc[-1] > h.iloc[0]
+		assert r.loglike == approx(m.loglike())
+	m.set_values('null')
+	r = m.maximize_loglike_stochastic('svrg', batch_size=1000, epochs=2, seed=0)
+	assert r.method.startswith('stochastic-svrg|')
+	assert r.loglike == approx(target)
+	# interleaved blocks partition the cases
+	assert sum(
+		m.loglike(start_case=b, stop_case=m.n_cases, step_case=5)
+		for b in range(5)
+	) == approx(m.loglike())
+	# a block emptied by the subsampling is skipped
+	m.set_values('null')
+	r = m.maximize_loglike_stochastic(
+		'bhhh', n_batches=5, epochs=1, seed=0, polish=False,
+		leave_out=0, subsample=5,
+	)
+	assert r.stochastic_steps == 4
+
+
+def test_maximize_loglike_multistart():
+	from .. import example
+	m = example(1)
+	m.load_data()
+	target = m.maximize_loglike(quiet=True).loglike
+	m.set_values('null')
+	r = m.maximize_loglike_multistart(4, scale=0.1, seed=0, n_jobs=2, prune=None)
+	assert r.loglike == approx(target)
+	assert m.loglike() == approx(target)
+	assert len(r.multistart_runs) == 4
+	assert (r.multistart_runs.status == 'converged').all()
+	assert len(r.optima) == 1
+	assert r.optima.n_runs.iloc[0] == 4
+	assert r.optima.loglike.iloc[0] == approx(target)
+	# the serial path, with one start far enough from the optimum to be pruned
+	m.set_values('null')
+	starts = numpy.zeros([2, len(m.pf)])
+	starts[0] = r.x
+	starts[1, m.pf.index.get_loc('tottime')] = 0.5
+	r2 = m.maximize_loglike_multistart(starts=starts, n_jobs=1, prune=0.001, prune_after=1)
+	assert r2.loglike == approx(target)
+	assert r2.multistart_runs.status.tolist() == ['converged', 'dominated']
+
+
+def test_kernel_workspace_and_autotune():
+	from .. import example
+	from ..model.persist_flags import PERSIST_PROBABILITY
+	m = example(1)
+	m.load_data()
+	m.set_values({'ASC_BIKE': -0.85, 'tottime': -0.018, 'totcost': -0.0013})
+	m.n_threads = 2
+	y0 = m.loglike2_bhhh()
+	buffers = dict(m._workspace._buffers)
+	assert 'bhhh_total' in buffers
+	y1 = m.loglike2_bhhh()
+	assert all(m._workspace._buffers[k] is v for k, v in buffers.items())
+	assert y1.ll == approx(y0.ll)
+	assert y1.dll.values == approx(y0.dll.values)
+	assert y1.bhhh == approx(y0.bhhh)
+	p0 = m.loglike2(persist=PERSIST_PROBABILITY).probability
+	p1 = m.loglike2(persist=PERSIST_PROBABILITY).probability
+	assert p0 is not p1
+	assert p0 == approx(p1)
+	for chunk in (1, 7, 500):
+		m.mnl_chunksize = chunk
+		y = m.loglike2_bhhh()
+		assert y.ll == approx(y0.ll)
+		assert y.dll.values == approx(y0.dll.values)
+		assert y.bhhh == approx(y0.bhhh)
+	timings = m.autotune_threads(max_threads=2, chunksizes=(0, 64), repeats=1)
+	assert len(timings) == 4
+	assert (m.n_threads, m.mnl_chunksize) == timings.seconds.idxmin()
+	assert m.loglike() == approx(y0.ll)
+	m2 = example(1)
+	m2.load_data()
+	assert m2.autotune_threads(max_threads=2, chunksizes=(0, 64)) is None
+	assert (m2.n_threads, m2.mnl_chunksize) == (m.n_threads, m.mnl_chunksize)
+
+
+def test_scorer():
+	from .. import example
+	from ..dataframes import DataFrames
+	from ..data_services.examples import MTC as MTC_H5
+	m = example(1)
+	m.load_data()
+	values = {'ASC_BIKE': -0.85, 'ASC_SR2': -0.52, 'tottime': -0.018, 'totcost': -0.0013, 'hhinc#2': -0.001}
+	m.set_values(values)
+	pr = m.probability()
+	ls = m.logsums()
+	scorer = m.scorer()
+	m.set_values('null')
+	# without choices, and without availability
+	d = m.dataframes
+	assert scorer.probability(d, chunk_size=1000) == approx(pr)
+	assert scorer.logsums(d, chunk_size=777) == approx(ls)
+	dfs = DataFrames(co=d.data_co, ca=d.data_ca, av=d.data_av, alt_codes=d.alternative_codes())
+	assert dfs.data_ch is None
+	pr_dfs = scorer.probability(dfs, chunk_size=1000, return_dataframe=True)
+	assert list(pr_dfs.index) == list(d.caseindex)
+	assert list(pr_dfs.columns) == list(d.alternative_codes())
+	assert pr_dfs.values == approx(pr)
+	dfs = DataFrames(co=d.data_co, ca=d.data_ca, alt_codes=d.alternative_codes())
+	assert scorer.probability(dfs).sum(1) == approx(1.0)
+	assert dfs.data_av is None
+	# scoring the dataframes of another model leaves that model unchanged
+	ll_null = m.loglike()
+	other = example(1)
+	other.set_values(values)
+	assert other.scorer().probability(d) == approx(pr)
+	assert m.loglike() == approx(ll_null)
+	# streamed from a dataservice
+	scorer2 = m.scorer(values)
+	assert scorer2.pf['tottime'] == -0.018
+	chunks = list(scorer2.iter_chunks(MTC_H5(), chunk_size=2000, logsums=True))
+	assert len(chunks) == 3
+	assert numpy.concatenate([c.probability for c in chunks]) == approx(pr)
+	assert numpy.concatenate([c.logsums for c in chunks]) == approx(ls)
+	# nested logit, via the general engine
+	m.set_values(values)
+	m.graph.new_node(parameter='mu', children=[1, 2, 3], name='Auto')
+	m.set_value('mu', 0.7)
+	m.load_data()
+	pr_nl = m.probability()
+	scorer_nl = m.scorer()
+	m.set_values('null')
+	assert scorer_nl.probability(chunk_size=1500) == approx(pr_nl)
+	assert scorer_nl.probability(dfs).sum(1) == approx(1.0)
+	assert dfs.data_av is None
+	assert m.loglike() == approx(m.loglike('null'))
+	other.load_data()
+	ll_other = other.loglike()
+	scorer_nl.probability(other.dataframes)
+	assert other.loglike() == approx(ll_other)
+
+
+def test_simulate_choices():
+	from .. import example
+	from ..data_services.examples import MTC as MTC_H5
+	m = example(1)
+	m.load_data()
+	m.set_values({'ASC_BIKE': -0.85, 'ASC_SR2': -0.52, 'tottime': -0.018, 'totcost': -0.0013, 'hhinc#2': -0.001})
+	pr = m.probability()
+	av = m.dataframes.data_av.values.astype(bool)
+	sim = m.simulate_choices(20, seed=123, n_threads=1)
+	assert sim.shape == (m.n_cases, 20)
+	assert list(sim.index) == list(m.dataframes.caseindex)
+	# identical whatever the threads, chunking or data source
+	assert (m.simulate_choices(20, seed=123, n_threads=4, chunk_size=1000).values == sim.values).all()
+	assert (m.simulate_choices(20, seed=123, data=MTC_H5(), chunk_size=2000).values == sim.values).all()
+	assert not (m.simulate_choices(20, seed=124).values == sim.values).all()
+	pos = m.simulate_choices(20, seed=123, return_dataframe=False)
+	assert pos.dtype == numpy.int64
+	assert (numpy.asarray(m.dataframes.alternative_codes())[pos] == sim.values).all()
+	assert av[numpy.arange(m.n_cases)[:, None], pos].all()
+	shares = numpy.stack([(pos == j).mean() for j in range(pr.shape[1])])
+	assert shares == approx(pr.mean(0), abs=0.005)
+	# nested logit
+	m.graph.new_node(parameter='mu', children=[1, 2, 3], name='Auto')
+	m.set_value('mu', 0.7)
+	m.load_data()
+	pr = m.probability()
+	pos = m.simulate_choices(20, seed=5, return_dataframe=False, n_threads=2)
+	assert (m.simulate_choices(20, seed=5, return_dataframe=False, n_threads=1, chunk_size=700) == pos).all()
+	shares = numpy.stack([(pos == j).mean() for j in range(pr.shape[1])])
+	assert shares == approx(pr.mean(0), abs=0.005)
+
+
+def test_loglike_streaming(tmp_path):
+	from .. import example
+	from ..data_services.examples import MTC as MTC_H5
+	from ..dataframes import DataFrames
+	m = example(1)
+	m.load_data()
+	m.set_values({
+		'ASC_BIKE': -0.85,
+		'ASC_SR2': -0.52,
+		'hhinc#2': -0.001,
+		'totcost': -0.0013,
+		'tottime': -0.018,
+	})
+	r0 = m.loglike2_bhhh()
+	dfs = m.dataframes
+	dfs.dump_mmap(tmp_path / "mtc")
+	for source in (MTC_H5(), DataFrames.load_mmap(tmp_path / "mtc")):
+		for prefetch in (True, False):
+			r1 = m.loglike2_streaming(chunk_size=700, return_bhhh=True, dataservice=source, prefetch=prefetch)
+			assert r1.n_cases == 5029
+			assert r1.ll == approx(r0.ll)
+			assert r1.dll.values == approx(r0.dll.values)
+			assert r1.bhhh == approx(r0.bhhh)
+	assert m.dataframes is dfs
+
+	m.set_values('null')
+	r2 = m.maximize_loglike_streaming(chunk_size=2000, dataservice=MTC_H5())
+	assert r2.loglike == approx(-3626.18625551293)
+	assert r2.n_cases == 5029
+	assert m.loglike() == approx(r2.loglike)
+
+
+def test_threaded_pod_loading(monkeypatch):
+	from ..data_services.examples import MTC as MTC_H5
+	from ..data_services.io_scheduler import IOScheduler
+	from ..data_services.h5.h5pod import generic
+	ds = MTC_H5()
+	names = ('totcost', 'tottime', 'tottime/60+totcost', '_avail_')
+	a0 = ds.idca.get_data_items(names, selector=slice(100, 2100))
+	a1 = ds.idca.get_data_items(names, selector=slice(100, 2100), n_threads=3)
+	assert a1 == approx(a0)
+	# without a thread-safe HDF5 library, all threads share the locked handle
+	monkeypatch.setattr(generic, '_HDF5_THREADSAFE', False)
+	a2 = ds.idca.get_data_items(names, selector=slice(100, 2100), n_threads=3)
+	assert a2 == approx(a0)
+	monkeypatch.undo()
+	b0 = ds.idco.get_data_items(('hhinc', 'numveh', 'hhinc+numveh'))
+	b1 = numpy.zeros_like(b0)
+	ds.idco.load_data_items(('hhinc', 'numveh', 'hhinc+numveh'), result=b1, n_threads=2)
+	assert b1 == approx(b0)
+	with IOScheduler(2) as io:
+		out = list(io.prefetch((lambda i=i: i*i) for i in range(5)))
+	assert out == [0, 1, 4, 9, 16]
+
+
+def test_nesting_tree_edge_arrays():
+	from ..model.tree import NestingTree
+	g = NestingTree()
+	g.add_nodes([1, 2, 3, 4])
+	a = g.new_node(parameter='mu_a', children=[1, 2])
+	b = g.new_node(parameter='mu_b', children=[2, 3])
+	up, dn, num, start = g.standard_edge_arrays
+	assert len(up) == len(dn) == g.n_edges == 7
+	sort = g.standard_sort
+	assert sorted((sort[u], sort[d]) for u, d in zip(up, dn)) == sorted(g.edges)
+	for slot, code in enumerate(sort):
+		assert list(g.successor_slots(code)) == [g.standard_slot_map[c] for c in g.successors(code)]
+		assert sorted(g.predecessor_slots(code)) == sorted(g.standard_slot_map[c] for c in g.predecessors(code))
+		if num[slot]:
+			assert (up[start[slot]:start[slot]+num[slot]] == slot).all()
+		else:
+			assert start[slot] == -1
+
+	m = Model(graph=g)
+	m.set_value('mu_a', 0.5)
+	mu, muslots, up, dn, num, start, val, alphaslots = g._get_simple_mu_and_alpha(m)
+	assert mu[g.standard_slot_map[a]] == 0.5
+	assert mu[g.standard_slot_map[b]] == 1.0
+	assert val[dn == g.standard_slot_map[2]] == approx([0.5, 0.5])
+	assert val[dn == g.standard_slot_map[1]] == approx([1.0])
+
+	# the cached arrays are rebuilt when the structure changes
+	g.add_edge(a, 4)
+	assert len(g.standard_edge_arrays[0]) == 7
+	g.remove_node(3)
+	assert len(g.standard_edge_arrays[0]) == g.n_edges == 6
+
+	# memory is linear in the size of a large tree
+	big = NestingTree()
+	codes = list(range(1, 20001))
+	big.add_nodes(codes)
+	for i in range(0, 20000, 10):
+		big.new_node(parameter="mu", children=codes[i:i+10])
+	mu, muslots, up, dn, num, start, val, alphaslots = big._get_simple_mu_and_alpha(Model(graph=big))
+	assert len(up) == 22000
+	assert len(mu) == len(big) == 22001
+
+
+def test_cross_nested_alpha_parameters():
+	from .. import example
+	m = example(1)
+	a = m.graph.new_node(parameter='muA', children=[1, 2, 3], name='A')
+	b = m.graph.new_node(parameter='muB', children=[3, 4, 5], name='B', alpha_parameters={})
+	c = m.graph.new_node(parameter='muC', children=[a, b], name='C')
+	d = m.graph.new_node(parameter='muD', children=[b, 6], name='D', alpha_parameters={})
+	m.graph.add_node(3, alpha_parameters={b: 'alpha_B3'})
+	m.graph.add_edge(d, b, alpha='alpha_DB')
+	m.load_data()
+	assert 'alpha_B3' in m.pf.index
+	assert m.pf.loc['alpha_DB', 'value'] == 0
+
+	# with all alpha parameters at zero, allocations are even
+	mu, muslots, up, dn, num, start, val, alphaslots = m.graph._get_simple_mu_and_alpha(m)
+	slot_map = m.graph.standard_slot_map
+	assert val[dn == slot_map[3]] == approx([0.5, 0.5])
+	assert val[dn == slot_map[1]] == approx([1.0])
+	assert (alphaslots >= 0).sum() == 2
+
+	numpy.random.seed(0)
+	x = {}
+	for name in m.pnames:
+		if name.startswith('mu'):
+			x[name] = 0.6 + numpy.random.rand() * 0.3
+		elif name.startswith('alpha'):
+			x[name] = numpy.random.randn()
+		else:
+			x[name] = numpy.random.randn() * 0.01
+	m.set_values(**x)
+	mu, muslots, up, dn, num, start, val, alphaslots = m.graph._get_simple_mu_and_alpha(m)
+	expected_B3 = 1 / (1 + numpy.exp(-x['alpha_B3']))
+	assert val[(dn == slot_map[3]) & (up == slot_map[b])] == approx([expected_B3])
+	assert val[(dn == slot_map[3]) & (up == slot_map[a])] == approx([1 - expected_B3])
+
+	check = m.check_d_loglike(stylize=False)
+	assert check.similarity.min() > 4
+	assert check.loc['alpha_B3', 'analytic'] != 0
+	assert check.loc['alpha_DB', 'analytic'] != 0
+
+	m.set_values('null')
+	r = m.maximize_loglike(quiet=True)
+	assert r.loglike > -3626.19
+	assert m.d_loglike()['alpha_DB'] == approx(0, abs=1e-2)
+
+
+def test_cross_validate_parallel():
+	from .. import example
+	from ..model.model_group import ModelGroup
+	m = example(1)
+	m.load_data()
+	ll_serial = m.cross_validate(cv=3, n_jobs=1)
+	assert m.loglike() == approx(-3626.186255)
+	assert m.most_recent_estimation_result.loglike == approx(-3626.186255)
+	folds = m.pf[['cv_000', 'cv_001', 'cv_002']].copy()
+	ll_parallel = m.cross_validate(cv=3, n_jobs=3)
+	assert ll_parallel == approx(ll_serial)
+	assert m.pf[['cv_000', 'cv_001', 'cv_002']].values == approx(folds.values, rel=1e-4)
+	assert m.loglike(keep_only=1, subsample=3) + m.loglike(leave_out=1, subsample=3) == approx(m.loglike())
+
+	m2 = example(1)
+	m2.load_data()
+	g = ModelGroup([m, m2], n_jobs=2)
+	try:
+		assert g.loglike(keep_only=0, subsample=3) + g.loglike(leave_out=0, subsample=3) == approx(g.loglike())
+		assert g.cross_validate(cv=3, n_jobs=3) == approx(2 * ll_serial, rel=1e-4)
+	finally:
+		g.close_pool()
+
+
+def test_bootstrap_and_jackknife():
+	from .. import example
+	m = example(1)
+	m.load_data()
+	# the parent runs a multi-thread OpenMP team before the workers are forked
+	m.n_threads = 2
+	m.maximize_loglike(quiet=True)
+	m.calculate_parameter_covariance()
+	b = m.bootstrap(8, seed=0, n_jobs=1)
+	b2 = m.bootstrap(8, seed=0, n_jobs=2)
+	assert b.n_failed == 0
+	assert b.replicates.shape == (8, len(m.pf) + 1)
+	assert b2.replicates.values == approx(b.replicates.values, rel=1e-6)
+	assert (b.std_err / m.pf['std err']).between(0.3, 3).all()
+	assert m.pf['bootstrap std err'].values == approx(b.std_err.values)
+	# the model is left as estimated on the full data
+	assert m.dataframes.data_wt is None
+	assert m.loglike() == approx(-3626.186255)
+	assert m.most_recent_estimation_result.loglike == approx(-3626.186255)
+
+	j = m.jackknife(10, n_jobs=2)
+	assert j.replicates.shape[0] == 10
+	assert (j.std_err / m.pf['std err']).between(0.3, 3).all()
+
+	clusters = numpy.arange(m.n_cases) // 4
+	jc = m.jackknife(clusters=clusters % 5, n_jobs=1)
+	assert jc.replicates.shape[0] == 5
+	bc = m.bootstrap(4, clusters=clusters, seed=0, n_jobs=2)
+	assert bc.n_failed == 0
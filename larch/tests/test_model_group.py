@@ -1,7 +1,7 @@
 import larch
 import pandas as pd
 from larch import P,X,PX
-from pytest import approx
+from pytest import approx, raises
 from larch.data_warehouse import example_file
 
 def test_simple_model_group():
@@ -83,3 +83,50 @@ def test_simple_model_group():
 	mg2.append(m1)
 	mg2.append(m2)
 	assert mg2.loglike() == approx(-3620.697667552756)
+
+	with raises(NotImplementedError):
+		mg2.maximize_loglike_stochastic()
+
+
+def test_parallel_model_group():
+
+	df = pd.read_csv(example_file("MTCwork.csv.gz"))
+	df.set_index(['casenum','altnum'], inplace=True)
+	d = larch.DataFrames.from_idce(df, choice='chose', crack=True)
+
+	segments = []
+	for seg in ("hhinc < 30", "(hhinc >= 30) & (hhinc < 60)", "hhinc >= 60"):
+		m = larch.Model(dataservice=d.selector_co(seg))
+		m.utility_co[2] = P("ASC_SR2")  + P("hhinc#2") * X("hhinc")
+		m.utility_co[3] = P("ASC_SR3P") + P("hhinc#3") * X("hhinc")
+		m.utility_co[4] = P("ASC_TRAN") + P("hhinc#4") * X("hhinc")
+		m.utility_co[5] = P("ASC_BIKE") + P("hhinc#5") * X("hhinc")
+		m.utility_co[6] = P("ASC_WALK") + P("hhinc#6") * X("hhinc")
+		m.utility_ca = P("tottime")*X("tottime") + P("totcost")*X("totcost")
+		m.load_data()
+		segments.append(m)
+
+	from larch.model.model_group import ModelGroup
+
+	mg = ModelGroup(segments)
+	mg.set_values(ASC_SR2=-2.0, tottime=-0.05, totcost=-0.004)
+	serial = mg.loglike2()
+	serial_ll = mg.loglike()
+
+	mg.n_jobs = -1
+	try:
+		parallel = mg.loglike2()
+		assert mg._pool is not None
+		assert parallel.ll == approx(serial.ll)
+		pd.testing.assert_series_equal(parallel.dll, serial.dll)
+		assert mg.loglike() == approx(serial_ll)
+		# values set in the parent are passed through to the workers
+		assert mg.loglike(x={'ASC_SR2': -1.0}) == approx(mg.loglike2(x={'ASC_SR2': -1.0}).ll)
+		mg.n_jobs = 1
+		assert mg._pool is None
+		mg.n_jobs = 2
+		result = mg.maximize_loglike(method='slsqp', quiet=True)
+	finally:
+		mg.close_pool()
+	mg.n_jobs = 1
+	assert mg.loglike(result.x) == approx(result.loglike)
@@ -33,3 +33,58 @@ def test_periodize():
 	assert p[18] == 'PM'
 	assert p[19] == 'PM'
 	assert p[20] == 'OP'
+
+
+def test_compiled_expressions():
+	from larch.util.dataframe import columnize
+	from larch.util.expression import compile_expression, evaluate_expressions
+	from larch.data_warehouse import example_file
+	df = pandas.read_csv(example_file("MTCwork.csv.gz"), index_col=['casenum', 'altnum'])
+	exprs = [
+		'ivtt',
+		'piece(ivtt,None,30)*(hhinc<50)',
+		'log1p(ovtt)/dist',
+		'altnum in (1,2)',
+		'normalize(hhinc)',
+		'fmax(ivtt, ovtt) + pi',
+		'ivtt.clip(5, 40)',
+	]
+	legacy = pandas.concat(
+		[columnize(df, e, inplace=False).astype(numpy.float64) for e in exprs],
+		axis=1,
+	)
+	assert compile_expression('ivtt.clip(5, 40)').code is None
+	assert not compile_expression('normalize(hhinc)').chunkable
+	assert compile_expression('log1p(ovtt)/dist') is compile_expression('log1p(ovtt)/dist')
+	result = evaluate_expressions(
+		df, exprs, chunk_size=1000,
+		fallback=lambda e: columnize(df, e, inplace=False).astype(numpy.float64),
+	)
+	assert list(result.columns) == exprs
+	assert result.values == approx(legacy.values, nan_ok=True)
+	assert columnize(df, exprs, inplace=False, dtype=numpy.float64).values == approx(legacy.values, nan_ok=True)
+
+
+def test_expression_cse():
+	from larch.util.dataframe import columnize
+	from larch.util.expression import plan_expressions, evaluate_expressions
+	from larch.data_warehouse import example_file
+	df = pandas.read_csv(example_file("MTCwork.csv.gz"), index_col=['casenum', 'altnum'])
+	exprs = (
+		'log(dist)',
+		'log(dist)*femdum',
+		'piece(log(dist),1,3)',
+		'(ivtt+ovtt)/dist',
+		'(ivtt+ovtt)/dist*(hhinc<50)',
+		'hhinc<50',
+	)
+	plan = plan_expressions(exprs)
+	# log(dist), ivtt+ovtt, (ivtt+ovtt)/dist and hhinc<50 are each computed once
+	assert len(plan.steps) == 4
+	assert plan.names == ('dist', 'femdum', 'hhinc', 'ivtt', 'ovtt')
+	legacy = pandas.concat(
+		[columnize(df, e, inplace=False).astype(numpy.float64) for e in exprs],
+		axis=1,
+	)
+	result = evaluate_expressions(df, list(exprs), chunk_size=777)
+	assert result.values == approx(legacy.values, nan_ok=True)
@@ -120,10 +120,15 @@ def chosen_but_not_available(dfs, repair=None, verbose=3):
 			if chosen_but_not_available_sum[colname] > 0:
 				diagnosis.loc[colname, 'example rows'] = ", ".join(str(j) for j in i1[i2 == colnum][:verbose])
 
+		# reassign the repaired data, as idce data is not stored in this wide format
 		if repair == '+':
-			dfs.data_av.values[chosen_but_not_available] = 1
+			av = dfs.data_av
+			av.values[chosen_but_not_available] = 1
+			dfs.data_av = av
 		elif repair == '-':
-			dfs.data_ch.values[chosen_but_not_available] = 0
+			data_ch = dfs.data_ch
+			data_ch.values[chosen_but_not_available] = 0
+			dfs.data_ch = data_ch
 
 	if m is None:
 		return dfs, diagnosis
@@ -197,7 +202,9 @@ def chosen_but_zero_quantity(dfs, repair=None, verbose=3):
 					diagnosis.loc[colname, 'example rows'] = ", ".join(str(j) for j in i1[i2 == colnum][:verbose])
 
 			if repair == '-':
-				dfs.data_ch.values[chosen_but_zero_quantity] = 0
+				data_ch = dfs.data_ch
+				data_ch.values[chosen_but_zero_quantity] = 0
+				dfs.data_ch = data_ch
 
 	if m is None:
 		return dfs, diagnosis
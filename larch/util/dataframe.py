@@ -86,7 +86,7 @@ def columnize_with_joinable_backing(df, name, inplace=True, dtype=None, debug=Fa
 	try:
 		return columnize(df, name, inplace=inplace, dtype=dtype, debug=debug)
 	except NameError:
-		if not inplace:
+		if not inplace and backing is not None:
 			return columnize(df.join(backing), name, inplace=False, dtype=dtype, debug=debug)
 		else:
 			raise
@@ -110,6 +110,16 @@ def columnize(df, name, inplace=True, dtype=None, debug=False, backing=None):
 				return
 			else:
 				return pandas.DataFrame(index=df.index)
+		if not inplace and dtype is not None and numpy.issubdtype(numpy.dtype(dtype), numpy.floating):
+			# evaluate compiled expressions on numpy arrays in one pass over the rows,
+			# falling back to this function for anything else
+			from .expression import evaluate_expressions
+			return evaluate_expressions(
+				df,
+				datanames,
+				dtype=dtype,
+				fallback=lambda _: columnize_with_joinable_backing(df, _, False, dtype, backing=backing),
+			)
 		df1 = pandas.concat([
 			columnize_with_joinable_backing(df, _, False, dtype, backing=backing)
 			for _ in datanames
@@ -0,0 +1,331 @@
+"""
+Compiled evaluation of data expressions.
+
+Data expressions such as ``"piece(ivtt,None,30)*(hhinc<50)"`` are parsed once
+into an AST and compiled, and the compiled form is cached by expression text.
+Evaluation binds the names in the expression to plain numpy arrays taken from
+the columns (or index levels) of a DataFrame, so no intermediate pandas
+Series are created, and all of the requested expressions are evaluated
+together in a single pass over chunks of rows, so that the temporary arrays
+for each intermediate result are only chunk-sized.  Within that pass, each
+base column is read once, and subexpressions shared by several of the
+requested expressions are computed once (see `ExpressionPlan`).
+"""
+
+import ast
+import copy
+import functools
+import numpy
+import pandas
+from numpy import log, exp, log1p, absolute, fabs, sqrt, isnan, isfinite, logaddexp, \
+	fmin, fmax, nan_to_num, sin, cos, pi
+
+from .aster import AstWrapper, inXd
+from .data_expansion import piece
+
+import logging
+from ..log import logger_name
+logger = logging.getLogger(logger_name+'.data')
+
+
+def _boolean(x):
+	from .common_functions import boolean
+	return boolean(x)
+
+
+def _normalize(x, std_div=1):
+	from .common_functions import normalize
+	return normalize(x, std_div=std_div)
+
+
+# Functions that operate elementwise, so that an expression using only these
+# can be evaluated on any chunk of rows independently.
+_ELEMENTWISE_FUNCTIONS = dict(
+	log=log, exp=exp, log1p=log1p, absolute=absolute, fabs=fabs, sqrt=sqrt,
+	isnan=isnan, isfinite=isfinite, logaddexp=logaddexp, fmin=fmin, fmax=fmax,
+	nan_to_num=nan_to_num, sin=sin, cos=cos, piece=piece, boolean=_boolean,
+	inXd=inXd,
+)
+
+# Functions that need the whole column at once.
+_COLUMN_FUNCTIONS = dict(
+	normalize=_normalize,
+)
+
+_CONSTANTS = dict(
+	pi=pi,
+)
+
+_NAMESPACE = dict(**_ELEMENTWISE_FUNCTIONS, **_COLUMN_FUNCTIONS, **_CONSTANTS)
+
+# AST node types that evaluate correctly with numpy arrays in place of Series.
+_SUPPORTED_NODES = (
+	ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.keyword,
+	ast.Name, ast.Constant, ast.Tuple, ast.List, ast.Load,
+	ast.operator, ast.unaryop, ast.cmpop,
+)
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+class CompiledExpression:
+	"""
+	A data expression, parsed and compiled once.
+
+	Attributes
+	----------
+	text : str
+		The expression.
+	code : code or None
+		The compiled expression, or None if the expression uses syntax that
+		is not supported for evaluation on numpy arrays (e.g. attribute
+		access or subscripts), in which case it must be evaluated with
+		pandas by `columnize`.
+	names : tuple of str
+		The data names used in the expression, which must be resolved to
+		columns or index levels.
+	chunkable : bool
+		Whether the expression is elementwise, so that it can be evaluated
+		on chunks of rows independently.
+	tree : ast.Expression
+		The parsed expression.
+	"""
+
+	__slots__ = ('text', 'code', 'names', 'chunkable', 'tree')
+
+	def __init__(self, text):
+		self.text = text
+		supported = True
+		chunkable = True
+		names = set()
+		try:
+			tree = ast.parse(str(text).strip(), mode='eval')
+		except SyntaxError:
+			# leave it to `columnize` to report
+			tree = ast.Expression(body=ast.Constant(value=None))
+			supported = False
+		tree = AstWrapper().visit(tree)
+		ast.fix_missing_locations(tree)
+		for node in (ast.walk(tree) if supported else ()):
+			if not isinstance(node, _SUPPORTED_NODES):
+				supported = False
+				break
+			if isinstance(node, ast.Call):
+				if not isinstance(node.func, ast.Name) or node.func.id not in _NAMESPACE:
+					supported = False
+					break
+				if node.func.id in _COLUMN_FUNCTIONS:
+					chunkable = False
+			elif isinstance(node, ast.Name) and node.id not in _NAMESPACE:
+				names.add(node.id)
+		self.names = tuple(sorted(names))
+		self.chunkable = supported and chunkable
+		self.tree = tree
+		self.code = compile(tree, f"<expression {text}>", "eval") if supported else None
+
+	def __repr__(self):
+		return f"<CompiledExpression {self.text!r}>"
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_expression(text):
+	"""
+	Parse and compile a data expression, caching the result by text.
+
+	Parameters
+	----------
+	text : str
+
+	Returns
+	-------
+	CompiledExpression
+	"""
+	return CompiledExpression(text)
+
+
+# Node types that are candidates for common-subexpression elimination.
+_CSE_NODES = (ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call)
+
+
+class _ReplaceShared(ast.NodeTransformer):
+	"""Replace shared subexpressions with the names of their temporaries."""
+
+	def __init__(self, shared, keep_root=None):
+		self.shared = shared
+		self.keep_root = keep_root
+
+	def visit(self, node):
+		if isinstance(node, _CSE_NODES) and node is not self.keep_root:
+			tmp = self.shared.get(ast.dump(node))
+			if tmp is not None:
+				return ast.copy_location(ast.Name(id=tmp, ctx=ast.Load()), node)
+		return super().visit(node)
+
+
+class ExpressionPlan:
+	"""
+	A plan to evaluate a set of elementwise expressions together.
+
+	The expressions are treated as one DAG: every subexpression (an operation
+	or function call) that appears more than once, within or across the
+	expressions, is evaluated once into a temporary, and reused wherever it
+	appears.  For example, given `log(dist)`, `log(dist)*female` and
+	`piece(log(dist),1,3)`, the logarithm is computed once.
+
+	Attributes
+	----------
+	steps : list of (str, code)
+		The shared subexpressions, as a temporary name and the compiled code
+		to compute it, in an order where each only depends on the data and
+		on earlier temporaries.
+	codes : list of code
+		The compiled expressions, using the temporaries.
+	names : tuple of str
+		The data names used by any of the expressions.
+	"""
+
+	def __init__(self, texts):
+		exprs = [compile_expression(t) for t in texts]
+		counts = {}
+		order = []
+		for expr in exprs:
+			# post-order, so inner subexpressions come before the outer ones using them
+			for node in _post_order(expr.tree.body):
+				if isinstance(node, _CSE_NODES):
+					key = ast.dump(node)
+					if key not in counts:
+						counts[key] = 0
+						order.append((key, node))
+					counts[key] += 1
+		shared = {}
+		self.steps = []
+		for key, node in order:
+			if counts[key] > 1:
+				body = _ReplaceShared(shared, keep_root=node).visit(copy.deepcopy(node))
+				tmp = f"_cse{len(shared)}_"
+				self.steps.append((tmp, _compile_node(body, f"<subexpression {tmp}>")))
+				shared[key] = tmp
+		self.codes = [
+			_compile_node(_ReplaceShared(shared).visit(copy.deepcopy(expr.tree.body)), f"<expression {expr.text}>")
+			for expr in exprs
+		]
+		self.names = tuple(sorted(set().union(*(expr.names for expr in exprs))))
+
+
+def _post_order(node):
+	for child in ast.iter_child_nodes(node):
+		yield from _post_order(child)
+	yield node
+
+
+def _compile_node(node, filename):
+	tree = ast.Expression(body=node)
+	ast.fix_missing_locations(tree)
+	return compile(tree, filename, "eval")
+
+
+@functools.lru_cache(maxsize=256)
+def plan_expressions(texts):
+	"""
+	Build (or get from cache) the evaluation plan for a tuple of expressions.
+
+	Parameters
+	----------
+	texts : tuple of str
+		Elementwise expressions, see `CompiledExpression.chunkable`.
+
+	Returns
+	-------
+	ExpressionPlan
+	"""
+	return ExpressionPlan(texts)
+
+
+def _bind_names(df, names):
+	"""
+	Resolve names to numpy arrays from the columns or index levels of a DataFrame.
+
+	Returns None if any name cannot be resolved to a plain numpy array.
+	"""
+	arrays = {}
+	for name in names:
+		if name in df.columns:
+			col = df[name]
+			if isinstance(col, pandas.DataFrame) or not isinstance(col.dtype, numpy.dtype):
+				return None
+			arrays[name] = col.values
+		elif name in df.index.names:
+			level = df.index.get_level_values(name)
+			if not isinstance(level.dtype, numpy.dtype):
+				return None
+			arrays[name] = level.values
+		else:
+			return None
+	return arrays
+
+
+def evaluate_expressions(df, expressions, dtype=numpy.float64, fallback=None, chunk_size=None):
+	"""
+	Evaluate a set of data expressions over the rows of a DataFrame.
+
+	Parameters
+	----------
+	df : pandas.DataFrame
+		The data.  Names in the expressions are resolved first against its
+		columns and then against the names of its index levels.
+	expressions : sequence of str
+		The expressions to evaluate.
+	dtype : dtype, default float64
+		The dtype of the result.
+	fallback : callable, optional
+		Called with the text of any expression that cannot be evaluated
+		here (because it uses unsupported syntax, or names that are not
+		columns or index levels of `df`), and should return a pandas
+		Series aligned with `df`.  If not given, such expressions raise
+		a NameError or ValueError.
+	chunk_size : int, optional
+		The number of rows evaluated at a time.
+
+	Returns
+	-------
+	pandas.DataFrame
+		With one column for each expression, in the same order.
+	"""
+	if chunk_size is None:
+		chunk_size = DEFAULT_CHUNK_SIZE
+	n_rows = len(df)
+	out = numpy.empty([n_rows, len(expressions)], dtype=dtype)
+
+	namespace = dict(_NAMESPACE)
+	chunked = []
+	arrays = {}
+	for k, text in enumerate(expressions):
+		expr = compile_expression(text)
+		expr_arrays = _bind_names(df, expr.names) if expr.code is not None else None
+		if expr_arrays is None:
+			if fallback is None:
+				raise NameError(f"cannot evaluate expression {text!r}")
+			out[:, k] = numpy.asarray(fallback(text))
+		elif expr.chunkable:
+			chunked.append(k)
+			arrays.update(expr_arrays)
+		else:
+			with numpy.errstate(all='ignore'):
+				out[:, k] = eval(expr.code, namespace, expr_arrays)
+
+	if not chunked:
+		return pandas.DataFrame(out, index=df.index, columns=list(expressions))
+
+	# evaluate all the elementwise expressions in one pass over chunks of rows,
+	# reading each base column once and computing each shared subexpression once
+	plan = plan_expressions(tuple(str(expressions[k]) for k in chunked))
+	with numpy.errstate(all='ignore'):
+		for start in range(0, n_rows, chunk_size):
+			stop = min(start + chunk_size, n_rows)
+			local = {name: arr[start:stop] for name, arr in arrays.items()}
+			for tmp, code in plan.steps:
+				local[tmp] = eval(code, namespace, local)
+			for k, code in zip(chunked, plan.codes):
+				out[start:stop, k] = eval(code, namespace, local)
+
+	return pandas.DataFrame(out, index=df.index, columns=list(expressions))